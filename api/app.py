@@ -1,31 +1,42 @@
 from contextlib import asynccontextmanager
-from typing import Dict, Any, Optional, List
+from typing import Dict, Optional
 import json
 import os
 
-from fastapi import FastAPI, status, HTTPException, Query
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, status, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 
-from .schemas import RenarrateRequest, EnqueueResponse, StatusResponse
-from .jobs import JobStore, JobParams
+from .schemas import RenarrateRequest, FanoutRenarrateRequest, EnqueueResponse, StatusResponse
+from .conditional import conditional_json, etag_for, not_modified
+from .events import EventBroker, sse_response
+from .jobs import JobStore, JobParams, BranchParams, job_list_changes, job_list_page
 from .queue import Worker
+from flow.utils.metrics import QUEUE_DEPTH, render_metrics
+from settings import JOBS_PAGE_MAX, JOBS_PAGE_SIZE
 
 
 # Global singletons for dev host mode (single process)
 job_store = JobStore(persist=True)
-worker = Worker(store=job_store)
+events = EventBroker()
+job_store.add_listener(events.publish_job)
+worker = Worker(store=job_store, on_progress=events.publish_progress)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    events.start()
     job_store.load()
     await worker.start()
+    # Jobs queued or interrupted when the server last stopped resume from their checkpoints.
+    for job_id in job_store.unfinished_ids():
+        await worker.enqueue(job_id)
     try:
         yield
     finally:
         # Shutdown
+        events.close()
         await worker.stop()
         job_store.dump()
 
@@ -59,6 +70,31 @@ async def post_renarrate(body: RenarrateRequest):
     return EnqueueResponse(job_id=job.id, status="PENDING")
 
 
+@app.post(
+    "/renarrate/fanout",
+    response_model=EnqueueResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Enqueue a multi-language renarration job",
+    tags=["jobs"],
+)
+async def post_renarrate_fanout(body: FanoutRenarrateRequest):
+    branches = [
+        BranchParams(target_language=lang, tts_provider=body.tts_provider, voice_name=voice)
+        for lang in body.target_languages
+        for voice in (body.voice_names or [None])
+    ]
+    params = JobParams(
+        yt_video_url=str(body.yt_video_url),
+        target_language=", ".join(body.target_languages),
+        tts_provider=body.tts_provider,
+        branches=branches,
+        multitrack=body.multitrack,
+    )
+    job = job_store.create(params)
+    await worker.enqueue(job.id)
+    return EnqueueResponse(job_id=job.id, status="PENDING")
+
+
 @app.get(
     "/status/{job_id}",
     response_model=StatusResponse,
@@ -66,11 +102,30 @@ async def post_renarrate(body: RenarrateRequest):
     summary="Get job status",
     tags=["jobs"],
 )
-async def get_status(job_id: str):
+async def get_status(job_id: str, request: Request):
     job = job_store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return StatusResponse(job=job.to_public_dict())
+    # 304 while the job is unchanged since the client's last poll (If-None-Match).
+    return conditional_json(request, StatusResponse(job=job.to_public_dict()).model_dump())
+
+
+@app.post(
+    "/jobs/{job_id}/retry",
+    response_model=EnqueueResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Re-run a failed job, resuming from its last completed stage",
+    tags=["jobs"],
+)
+async def retry_job(job_id: str):
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "FAILED":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried: status={job.status}.")
+    job_store.update(job_id, status="PENDING", started_at=None, finished_at=None, result=None, error=None)
+    await worker.enqueue(job_id)
+    return EnqueueResponse(job_id=job_id, status="PENDING")
 
 
 # -------------
@@ -138,6 +193,24 @@ async def get_video(job_id: str):
     return FileResponse(path=video_path, media_type=media_type, filename=os.path.basename(video_path))
 
 
+@app.get(
+    "/video/{job_id}/{branch_key}",
+    status_code=status.HTTP_200_OK,
+    summary="Download one branch's video of a fan-out job",
+    tags=["artifacts"],
+)
+async def get_branch_video(job_id: str, branch_key: str):
+    _ensure_success_and_get_paths(job_id)
+    job = job_store.get(job_id)
+    branch = (job.branches or {}).get(branch_key) if job else None
+    if not branch or branch.status != "SUCCESS" or not branch.paths:
+        raise HTTPException(status_code=404, detail="Branch video not found.")
+    video_path = branch.paths.get("final_video_path")
+    if not video_path or not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Branch video not found.")
+    return FileResponse(path=video_path, media_type="video/mp4", filename=os.path.basename(video_path))
+
+
 # ------------------------
 # Listing endpoint for UI
 # ------------------------
@@ -145,54 +218,103 @@ async def get_video(job_id: str):
 @app.get(
     "/jobs",
     status_code=status.HTTP_200_OK,
-    summary="List jobs (optionally filter by status). Used by the web UI.",
+    summary="List jobs, newest first, a page at a time (optionally filter by status). Used by the web UI.",
     tags=["jobs"],
 )
-async def list_jobs(status_filter: Optional[str] = Query(None, alias="status")):
+async def list_jobs(
+    request: Request,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(JOBS_PAGE_SIZE, ge=1, le=JOBS_PAGE_MAX),
+    before: Optional[str] = Query(None, description="Cursor: jobs older than this (next page)."),
+    after: Optional[str] = Query(None, description="Cursor: jobs newer than this."),
+    since: Optional[int] = Query(None, ge=0, description="Change seq: only jobs changed after it (delta feed)."),
+):
     """
-    Returns a light list for the left column:
-    [
-      {
-        "job_id": "...",
-        "status": "SUCCESS",
-        "title": "Video Title",
-        "request_id": "...",
-        "video_url": "/video/{job_id}",
-        "info_url": "/video_info/{job_id}"
-      },
-      ...
-    ]
+    Returns a light list for the left column, answered from the job store alone:
+    {
+      "jobs": [
+        {
+          "job_id": "...",
+          "status": "SUCCESS",
+          "title": "Video Title",
+          "duration": 123,
+          "thumbnail": "https://...",
+          "submitted_at": "...",
+          "request_id": "...",
+          "video_url": "/video/{job_id}",
+          "info_url": "/video_info/{job_id}"
+        },
+        ...
+      ],
+      "cursors": {"before": "<older page or null>", "after": "<newer jobs>"},
+      "seq": 42
+    }
+    With ?since=<seq> (the seq of the previous response) it is a delta feed instead:
+    {"jobs": [<jobs changed since seq, any status>], "seq": 57, "reset": false, "more": false}
+    Responses carry an ETag derived from the store's change seq; a poll with a matching
+    If-None-Match gets 304 without touching the jobs table.
+    """
+    if since is not None and (before or after):
+        raise HTTPException(status_code=400, detail="since cannot be combined with before/after.")
+    if since is not None:
+        # Not keyed on since: a client that applied the last delta polls with the seq it got,
+        # so its ETag keeps matching until the store changes.
+        etag: Optional[str] = etag_for("jobs-delta", job_store.current_seq(), limit)
+    else:
+        etag = etag_for("jobs", job_store.current_seq(), str(request.query_params))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    try:
+        if since is not None:
+            payload = job_list_changes(job_store, since, limit)
+            if payload["more"]:
+                etag = None  # the client is not caught up yet: tag the body, never the current seq
+        else:
+            payload = job_list_page(job_store, limit, before=before, after=after, status=status_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional_json(request, payload, etag)
+
+
+# ------------------------
+# Live events (SSE)
+# ------------------------
+
+@app.get("/events", summary="Stream job changes and progress of every job (Server-Sent Events).", tags=["jobs"])
+async def job_events(request: Request):
     """
-    items: List[Dict[str, Any]] = []
-    # Iterate deterministically by submit time
-    jobs = list(job_store._jobs.values())  # dev-only direct access for listing
-    jobs.sort(key=lambda j: j.submitted_at)
-
-    for j in jobs:
-        if status_filter and j.status != status_filter:
-            continue
-        title = None
-        req_id = None
-        if j.status == "SUCCESS" and j.result and j.result.paths:
-            req_id = j.result.request_id
-            info_path = j.result.paths.get("video_info_path")
-            if info_path and os.path.exists(info_path):
-                try:
-                    with open(info_path, "r", encoding="utf-8") as f:
-                        info = json.load(f)
-                        title = info.get("title")
-                except Exception:
-                    title = None
-
-        items.append({
-            "job_id": j.id,
-            "status": j.status,
-            "title": title,
-            "request_id": req_id,
-            "video_url": f"/video/{j.id}",
-            "info_url": f"/video_info/{j.id}",
-        })
-    return {"jobs": items}
+    text/event-stream of "job" events (a job's list item, as in /jobs, whenever it changes)
+    and "progress" events (stage started/finished/skipped, narration cues done/total, and an
+    overall "fraction"), starting with the latest progress of every running job.
+    """
+    return sse_response(request, events)
+
+
+@app.get("/jobs/{job_id}/events", summary="Stream one job's changes and progress (Server-Sent Events).", tags=["jobs"])
+async def single_job_events(job_id: str, request: Request):
+    """
+    Like /events for one job, starting with its current list item and latest progress.
+    """
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def current():
+        job = job_store.get(job_id)
+        return [("job", job.to_list_item())] if job else []
+
+    return sse_response(request, events, job_id=job_id, initial=current)
+
+
+# ------------------------
+# Prometheus metrics
+# ------------------------
+
+@app.get("/metrics", summary="Prometheus metrics", tags=["ops"])
+async def metrics():
+    QUEUE_DEPTH.labels(queue="host").set(worker.queue.qsize())
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 # --- Static site (served at "/") ---
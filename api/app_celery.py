@@ -1,32 +1,61 @@
 from contextlib import asynccontextmanager
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 import json
 import os
 import shutil
+import uuid
 
-from fastapi import FastAPI, status, HTTPException, Query, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, status, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 
-from .schemas import RenarrateRequest, EnqueueResponse, StatusResponse
-from .jobs import JobStore, JobParams, JobResult, now_iso
-from settings import STORAGE_DIR
+from .schemas import RenarrateRequest, FanoutRenarrateRequest, EnqueueResponse, StatusResponse
+from .conditional import conditional_json, etag_for, not_modified
+from .events import EventBroker, sse_response
+from .reconciler import JobReconciler
+from .task_events import TaskEventReceiver
+from .jobs import JobStore, JobParams, BranchParams, BranchState, job_list_changes, job_list_page
+from settings import JOBS_PAGE_MAX, JOBS_PAGE_SIZE, STORAGE_DIR
+from flow.utils.metrics import QUEUE_DEPTH, render_metrics
+from flow.utils.progress import ProgressEvent
+from pipeline import resolve_voice
 
 from celery.result import AsyncResult
-from worker.celery_app import celery
-from worker.tasks import run_pipeline_task
+from worker.celery_app import PIPELINE_QUEUES, celery
+from worker.tasks import enqueue_fanout, enqueue_pipeline, resolve_branches
 
 from fastapi.middleware.cors import CORSMiddleware
 
 # Persist a job list for the web UI (lightweight index)
 job_store = JobStore(persist=True)
 
+# Live events for SSE clients: job changes from the store, stage/cue progress from the workers'
+# "task-progress" task events (see worker/tasks.py).
+events = EventBroker()
+job_store.add_listener(events.publish_job)
+
+# Job states follow the workers' task events into the store (api/reconciler.py); the endpoints
+# below only read the store.
+reconciler = JobReconciler(job_store, celery)
+
+
+def _on_task_progress(event: Dict[str, Any]) -> None:
+    events.publish_progress(event["job_id"], ProgressEvent.from_dict(event))
+
+
+task_events = TaskEventReceiver(
+    celery, {**reconciler.handlers(), "task-progress": _on_task_progress}, on_ready=reconciler.sweep,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     job_store.load()
+    events.start()
+    task_events.start()
     yield
+    task_events.stop()
+    events.close()
     job_store.dump()
 
 app = FastAPI(
@@ -53,32 +82,66 @@ app.add_middleware(
     tags=["jobs"],
 )
 async def post_renarrate(body: RenarrateRequest):
-    task = run_pipeline_task.delay(
+    try:
+        resolve_voice(body.tts_provider, body.voice_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Voice selection failed: {e}")
+    params = JobParams(
         yt_video_url=str(body.yt_video_url),
         target_language=body.target_language,
         tts_provider=body.tts_provider,
         voice_name=body.voice_name,
     )
-    params = JobParams(
+    # Stored before it is enqueued: the reconciler drops task events of jobs it does not know.
+    job_id = str(uuid.uuid4())
+    job_store.create(params, job_id=job_id)
+    enqueue_pipeline(
+        job_id,
         yt_video_url=str(body.yt_video_url),
         target_language=body.target_language,
         tts_provider=body.tts_provider,
         voice_name=body.voice_name,
     )
-    job_store.create(params, job_id=task.id)
-    return EnqueueResponse(job_id=task.id, status="PENDING")
+    return EnqueueResponse(job_id=job_id, status="PENDING")
 
 
-def _map_celery_state_to_status(state: str) -> str:
-    if state in ("PENDING", "RETRY"):
-        return "PENDING"
-    if state == "STARTED":
-        return "RUNNING"
-    if state == "SUCCESS":
-        return "SUCCESS"
-    if state in ("FAILURE", "REVOKED"):
-        return "FAILED"
-    return "PENDING"
+@app.post(
+    "/renarrate/fanout",
+    response_model=EnqueueResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Enqueue a multi-language renarration job (Celery)",
+    tags=["jobs"],
+)
+async def post_renarrate_fanout(body: FanoutRenarrateRequest):
+    branches = [
+        BranchParams(target_language=lang, tts_provider=body.tts_provider, voice_name=voice)
+        for lang in body.target_languages
+        for voice in (body.voice_names or [None])
+    ]
+    try:
+        resolved = resolve_branches([b.model_dump() for b in branches])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Voice selection failed: {e}")
+    params = JobParams(
+        yt_video_url=str(body.yt_video_url),
+        target_language=", ".join(body.target_languages),
+        tts_provider=body.tts_provider,
+        branches=branches,
+        multitrack=body.multitrack,
+    )
+    # Stored with its branches before it is enqueued (see post_renarrate).
+    job_id = str(uuid.uuid4())
+    job_store.create(params, job_id=job_id)
+    job_store.update(job_id, branches={
+        b.key: BranchState(target_language=b.target_language, voice_name=b.voice.name) for b in resolved
+    })
+    enqueue_fanout(
+        job_id,
+        yt_video_url=str(body.yt_video_url),
+        branches=[b.model_dump() for b in branches],
+        multitrack=body.multitrack,
+    )
+    return EnqueueResponse(job_id=job_id, status="PENDING")
 
 
 @app.get(
@@ -88,41 +151,51 @@ def _map_celery_state_to_status(state: str) -> str:
     summary="Get job status (Celery)",
     tags=["jobs"],
 )
-async def get_status(job_id: str):
-    res = AsyncResult(job_id, app=celery)
-    status_mapped = _map_celery_state_to_status(res.state)
-
+async def get_status(job_id: str, request: Request):
+    # A store lookup: the reconciler keeps the job's state current from its task events.
     job = job_store.get(job_id)
-    if job:
-        patch: Dict[str, Any] = {"status": status_mapped}
-        if status_mapped == "RUNNING" and not job.started_at:
-            patch["started_at"] = now_iso()
-        if status_mapped in ("SUCCESS", "FAILED") and not job.finished_at:
-            patch["finished_at"] = now_iso()
-
-        if status_mapped == "SUCCESS" and res.result:
-            try:
-                payload: Dict[str, str] = dict(res.result)
-                request_id = payload.pop("request_id", None)
-                jr = JobResult(request_id=request_id, paths=payload)
-                patch["result"] = jr
-                patch["error"] = None
-            except Exception as e:
-                patch["error"] = f"Bad result payload: {e}"
-
-        if status_mapped == "FAILED" and res.result:
-            try:
-                patch["error"] = str(res.result)
-            except Exception:
-                patch["error"] = "Task failed."
-
-        job_store.update(job_id, **patch)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    body = StatusResponse(job=job.to_public_dict())
+    # 304 while the job is unchanged since the client's last poll (If-None-Match).
+    return conditional_json(request, body.model_dump())
 
+@app.post(
+    "/jobs/{job_id}/retry",
+    response_model=EnqueueResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Re-run a failed job, resuming from its last completed stage (Celery)",
+    tags=["jobs"],
+)
+async def retry_job(job_id: str):
     job = job_store.get(job_id)
-    if job:
-        return StatusResponse(job=job.to_public_dict())
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "FAILED":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried: status={job.status}.")
+
+    # Same task id => same job directory, so the worker skips completed stages.
+    # Forget the old FAILURE first, otherwise the reconciler's next sweep would fail the job again;
+    # and reset the job before enqueueing, so it cannot overwrite the new run's first events.
+    AsyncResult(job_id, app=celery).forget()
+    job_store.update(job_id, status="PENDING", started_at=None, finished_at=None, result=None, error=None)
+    if job.params.branches:
+        enqueue_fanout(
+            job_id,
+            yt_video_url=job.params.yt_video_url,
+            branches=[b.model_dump() for b in job.params.branches],
+            multitrack=job.params.multitrack,
+        )
     else:
-        return StatusResponse(job={"id": job_id, "status": status_mapped})
+        enqueue_pipeline(
+            job_id,
+            yt_video_url=job.params.yt_video_url,
+            target_language=job.params.target_language,
+            tts_provider=job.params.tts_provider,
+            voice_name=job.params.voice_name,
+        )
+    return EnqueueResponse(job_id=job_id, status="PENDING")
+
 
 # -------------
 # Helper methods
@@ -133,25 +206,12 @@ def _ensure_success_and_get_paths(job_id: str) -> Dict[str, str]:
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    res = AsyncResult(job_id, app=celery)
-    status_mapped = _map_celery_state_to_status(res.state)
-    if status_mapped != "SUCCESS":
+    if job.status != "SUCCESS":
         raise HTTPException(
             status_code=409,
-            detail=f"Job not ready: status={status_mapped}. Try again later.",
+            detail=f"Job not ready: status={job.status}. Try again later.",
         )
-
     if not job.result or not job.result.paths:
-        try:
-            payload: Dict[str, str] = dict(res.result)
-            request_id = payload.pop("request_id", None)
-            jr = JobResult(request_id=request_id, paths=payload)
-            job_store.update(job_id, result=jr)
-        except Exception:
-            pass
-
-    job = job_store.get(job_id)
-    if not job or not job.result or not job.result.paths:
         raise HTTPException(status_code=500, detail="Job result missing paths.")
     return job.result.paths  # type: ignore[return-value]
 
@@ -190,59 +250,107 @@ async def get_video(job_id: str):
     return FileResponse(path=video_path, media_type=media_type, filename=os.path.basename(video_path))
 
 
+@app.get("/video/{job_id}/{branch_key}", tags=["artifacts"])
+async def get_branch_video(job_id: str, branch_key: str):
+    _ensure_success_and_get_paths(job_id)
+    job = job_store.get(job_id)
+    branch = (job.branches or {}).get(branch_key) if job else None
+    if not branch or branch.status != "SUCCESS" or not branch.paths:
+        raise HTTPException(status_code=404, detail="Branch video not found.")
+    video_path = branch.paths.get("final_video_path")
+    if not video_path or not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Branch video not found.")
+    return FileResponse(path=video_path, media_type="video/mp4", filename=os.path.basename(video_path))
+
+
 # ------------------------
-# Listing endpoint for UI (self-hydrates from Celery) + no-cache
+# Listing endpoint for UI (answered from the job store; no-cache)
 # ------------------------
 
 @app.get("/jobs", tags=["jobs"])
-async def list_jobs(response: Response, status_filter: Optional[str] = Query(None, alias="status")):
-    # Make sure browsers never cache this
-    response.headers["Cache-Control"] = "no-store, max-age=0"
-
-    items: List[Dict[str, Any]] = []
-    jobs = list(job_store._jobs.values())  # dev-only direct access for listing
-    jobs.sort(key=lambda j: j.submitted_at)
-
-    for j in jobs:
-        if status_filter and j.status != status_filter:
-            continue
-
-        # Hydrate result from Celery if missing
-        if not (j.result and j.result.paths):
-            res = AsyncResult(j.id, app=celery)
-            if _map_celery_state_to_status(res.state) == "SUCCESS" and res.result:
-                try:
-                    payload: Dict[str, str] = dict(res.result)
-                    request_id = payload.pop("request_id", None)
-                    jr = JobResult(request_id=request_id, paths=payload)
-                    job_store.update(j.id, result=jr, status="SUCCESS", finished_at=now_iso())
-                except Exception:
-                    pass
-
-        # After hydration, attempt to read title
-        title = None
-        req_id = None
-        jj = job_store.get(j.id)
-        if jj and jj.result and jj.result.paths:
-            req_id = jj.result.request_id
-            info_path = jj.result.paths.get("video_info_path")
-            if info_path and os.path.exists(info_path):
-                try:
-                    with open(info_path, "r", encoding="utf-8") as f:
-                        info = json.load(f)
-                        title = info.get("title")
-                except Exception:
-                    title = None
-
-        items.append({
-            "job_id": j.id,
-            "status": (jj.status if jj else j.status),
-            "title": title,
-            "request_id": req_id,
-            "video_url": f"/video/{j.id}",
-            "info_url": f"/video_info/{j.id}",
-        })
-    return {"jobs": items}
+async def list_jobs(
+    request: Request,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(JOBS_PAGE_SIZE, ge=1, le=JOBS_PAGE_MAX),
+    before: Optional[str] = Query(None, description="Cursor: jobs older than this (next page)."),
+    after: Optional[str] = Query(None, description="Cursor: jobs newer than this."),
+    since: Optional[int] = Query(None, ge=0, description="Change seq: only jobs changed after it (delta feed)."),
+):
+    # Job states are written into the store by the reconciler; no result-backend reads per listed job.
+    # Browsers revalidate every poll (no-cache + ETag from the store's change seq): unchanged -> 304.
+    if since is not None and (before or after):
+        raise HTTPException(status_code=400, detail="since cannot be combined with before/after.")
+    if since is not None:
+        # Not keyed on since: a client that applied the last delta polls with the seq it got,
+        # so its ETag keeps matching until the store changes.
+        etag: Optional[str] = etag_for("jobs-delta", job_store.current_seq(), limit)
+    else:
+        etag = etag_for("jobs", job_store.current_seq(), str(request.query_params))
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    try:
+        if since is not None:
+            payload = job_list_changes(job_store, since, limit)
+            if payload["more"]:
+                etag = None  # the client is not caught up yet: tag the body, never the current seq
+        else:
+            payload = job_list_page(job_store, limit, before=before, after=after, status=status_filter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional_json(request, payload, etag)
+
+
+# ------------------------
+# Live events (SSE)
+# ------------------------
+
+@app.get("/events", tags=["jobs"])
+async def job_events(request: Request):
+    """
+    text/event-stream of "job" events (a job's list item, whenever the API records a change)
+    and "progress" events relayed from the workers (stage started/finished/skipped, narration
+    cues done/total, overall "fraction"), starting with the latest progress of running jobs.
+    """
+    return sse_response(request, events)
+
+
+@app.get("/jobs/{job_id}/events", tags=["jobs"])
+async def single_job_events(job_id: str, request: Request):
+    """
+    Like /events for one job, starting with its current list item and latest progress.
+    """
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def current():
+        job = job_store.get(job_id)
+        return [("job", job.to_list_item())] if job else []
+
+    return sse_response(request, events, job_id=job_id, initial=current)
+
+# ------------------------
+# Prometheus metrics
+# ------------------------
+
+def _celery_queue_depth(queue: str) -> Optional[int]:
+    try:
+        with celery.connection_for_read() as conn:
+            return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except Exception:
+        return None
+
+
+@app.get("/metrics", tags=["ops"])
+def metrics():
+    # Worker-side samples (stages, TTS, retries) are merged in via PROMETHEUS_MULTIPROC_DIR.
+    for queue in PIPELINE_QUEUES:
+        depth = _celery_queue_depth(queue)
+        if depth is not None:
+            QUEUE_DEPTH.labels(queue=queue).set(depth)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 
 # ------------------------
 # Dev-only reset endpoint
@@ -251,20 +359,11 @@ async def list_jobs(response: Response, status_filter: Optional[str] = Query(Non
 @app.post("/admin/clear", tags=["admin"])
 async def admin_clear(artifacts: bool = False):
     """
-    Clear in-memory jobs and delete storage/jobs.json.
+    Delete all job records from the job store.
     If artifacts=True, also delete all job subfolders under storage/.
     """
-    # wipe memory
-    cleared = len(job_store._jobs)
-    job_store._jobs.clear()
-
-    # wipe jobs.json
-    jobs_path = os.path.join(STORAGE_DIR, "jobs.json")
-    try:
-        if os.path.exists(jobs_path):
-            os.remove(jobs_path)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to remove jobs.json: {e}")
+    # wipe job records
+    cleared = job_store.clear()
 
     # optionally wipe all artifacts
     removed_dirs = 0
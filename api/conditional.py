@@ -0,0 +1,56 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Conditional GET for the endpoints the web UI polls: every response carries a weak ETag and
+# "Cache-Control: no-cache" (revalidate each time); a request whose If-None-Match still matches
+# gets an empty 304 instead of the body.
+
+
+def etag_for(*parts: Any) -> str:
+    """
+    Weak ETag over JSON-serializable parts (a response body, or a version and the query).
+    """
+    h = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+        h.update(b"\0")
+    return f'W/"{h.hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag  # If-None-Match uses weak comparison
+
+
+def _headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    A 304 response if the request's If-None-Match matches etag, else None.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    if header.strip() == "*" or _opaque(etag) in {_opaque(t) for t in header.split(",")}:
+        return Response(status_code=304, headers=_headers(etag))
+    return None
+
+
+def conditional_json(request: Request, payload: Any, etag: Optional[str] = None) -> Response:
+    """
+    payload as JSON with its ETag, or a 304 if the client already has it.
+    Args:
+        request (Request): The incoming request (for If-None-Match).
+        payload (Any): JSON-serializable body.
+        etag (Optional[str]): Precomputed ETag; by default a hash of the payload.
+    Returns:
+        Response: 304 Not Modified, or a JSONResponse.
+    """
+    etag = etag or etag_for(payload)
+    return not_modified(request, etag) or JSONResponse(payload, headers=_headers(etag))
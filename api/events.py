@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from flow.utils.progress import ProgressEvent
+from settings import SSE_CLIENT_BUFFER, SSE_HEARTBEAT_SECS, SSE_MAX_STREAM_SECS
+from .jobs import Job
+
+# (event name, data) as sent over SSE:
+#   job       a job's list item (Job.to_list_item) whenever the job changes
+#   progress  {"job_id", "kind", "stage", "variant", "done", "total", "duration_s", "fraction"}
+SSEEvent = Tuple[str, Dict[str, Any]]
+
+_CLOSE: SSEEvent = ("", {})  # sentinel: ends a stream at shutdown
+
+
+class _Subscription:
+    def __init__(self, job_id: Optional[str], size: int) -> None:
+        self.job_id = job_id  # None: every job
+        self.queue: "asyncio.Queue[SSEEvent]" = asyncio.Queue(maxsize=size)
+
+    def offer(self, event: SSEEvent) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()  # slow client: drop its oldest event rather than block everyone
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """
+    In-process fan-out of job events to SSE clients. publish_job/publish_progress may be called
+    from any thread (job threads, TTS threads, the Celery event receiver); delivery happens on
+    the event loop given to start(). Each client has a bounded buffer, and the latest progress
+    event per job and branch is kept so that a client connecting mid-job starts from the
+    current state. Events published before start() or after close() are dropped.
+    """
+    def __init__(self, client_buffer: int = SSE_CLIENT_BUFFER) -> None:
+        self.client_buffer = client_buffer
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscriptions: Set[_Subscription] = set()
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Dict[str, Dict[str, Any]]] = {}  # job id -> branch ("" if none) -> event
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+
+    def close(self) -> None:
+        """
+        Ends every open stream (call on shutdown; open SSE responses would otherwise hold it up).
+        """
+        self._deliver(None, _CLOSE)
+        self._loop = None
+
+    def subscribe(self, job_id: Optional[str] = None) -> _Subscription:
+        subscription = _Subscription(job_id, self.client_buffer)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: _Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def publish_job(self, job: Job) -> None:
+        """
+        JobStore listener: a job was created or changed. A finished job's progress is dropped.
+        """
+        if job.status in ("SUCCESS", "FAILED"):
+            with self._lock:
+                self._progress.pop(job.id, None)
+        self._deliver(job.id, ("job", job.to_list_item()))
+
+    def publish_progress(self, job_id: str, event: ProgressEvent) -> None:
+        data = {"job_id": job_id, **event.to_dict()}
+        with self._lock:
+            self._progress.setdefault(job_id, {})[event.variant or ""] = data
+        self._deliver(job_id, ("progress", data))
+
+    def progress_snapshot(self, job_id: Optional[str] = None) -> List[SSEEvent]:
+        """
+        The latest progress events of one running job (or of every running job).
+        """
+        with self._lock:
+            jobs = [job_id] if job_id else list(self._progress)
+            return [("progress", data) for jid in jobs for data in self._progress.get(jid, {}).values()]
+
+    def _deliver(self, job_id: Optional[str], event: SSEEvent) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, job_id, event)
+        except RuntimeError:
+            pass  # loop closed meanwhile (shutdown)
+
+    def _dispatch(self, job_id: Optional[str], event: SSEEvent) -> None:
+        for subscription in list(self._subscriptions):
+            if job_id is None or subscription.job_id in (None, job_id):
+                subscription.offer(event)
+
+
+def _format(event: SSEEvent) -> str:
+    name, data = event
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_response(
+    request: Request,
+    broker: EventBroker,
+    job_id: Optional[str] = None,
+    initial: Optional[Callable[[], Iterable[SSEEvent]]] = None,
+) -> StreamingResponse:
+    """
+    text/event-stream of the broker's events for one job (or all jobs), preceded by the events
+    initial() returns (e.g. the job's current state) and the latest progress. Idle streams get a keep-alive comment every
+    SSE_HEARTBEAT_SECS; the stream ends when the client disconnects, the broker closes, or
+    after SSE_MAX_STREAM_SECS (EventSource clients reconnect and get a fresh snapshot).
+    """
+    async def stream() -> AsyncIterator[str]:
+        subscription = broker.subscribe(job_id)  # before the snapshot, so nothing falls in between
+        try:
+            yield "retry: 3000\n\n"
+            for event in [*(initial() if initial else ()), *broker.progress_snapshot(job_id)]:
+                yield _format(event)
+            deadline = time.monotonic() + SSE_MAX_STREAM_SECS
+            while not await request.is_disconnected():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=min(SSE_HEARTBEAT_SECS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is _CLOSE:
+                    break
+                yield _format(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # no proxy buffering
+    )
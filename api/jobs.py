@@ -1,12 +1,16 @@
+import base64
 import json
 import os
+import sqlite3
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, Optional, Literal, Any, TypedDict
+from typing import Callable, Dict, Iterator, List, Optional, Literal, Any, Tuple, TypedDict
 
 from pydantic import BaseModel, Field
 
-from settings import STORAGE_DIR
+from settings import JOBS_DB_PATH, STORAGE_DIR
 
 JobStatus = Literal["PENDING", "RUNNING", "SUCCESS", "FAILED"]
 
@@ -15,11 +19,29 @@ def now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+class BranchParams(BaseModel):
+    target_language: str
+    tts_provider: Literal["elevenlabs", "gemini"]
+    voice_name: Optional[str] = None
+
+
 class JobParams(BaseModel):
     yt_video_url: str
-    target_language: str
+    target_language: str  # for fan-out jobs: comma-separated summary of the branch languages
     tts_provider: Literal["elevenlabs", "gemini"]
     voice_name: Optional[str] = None
+    # Fan-out jobs only: one translate/narrate/merge branch per entry over shared download/CC.
+    branches: Optional[List[BranchParams]] = None
+    multitrack: bool = False
+
+
+class BranchState(BaseModel):
+    target_language: str
+    voice_name: Optional[str] = None
+    status: JobStatus = "PENDING"
+    stage: Optional[str] = None  # translate / narrate / merge while RUNNING
+    error: Optional[str] = None
+    paths: Optional[Dict[str, str]] = None
 
 
 class JobResult(BaseModel):
@@ -36,25 +58,207 @@ class Job(BaseModel):
     params: JobParams
     result: Optional[JobResult] = None
     error: Optional[str] = None
+    branches: Optional[Dict[str, BranchState]] = None  # fan-out jobs, keyed by branch key
+    # Copied from the video info once, at download time, so listings never read info.json.
+    title: Optional[str] = None
+    duration: Optional[float] = None  # seconds
+    thumbnail: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None  # seconds per pipeline stage, from the job manifest
 
     def to_public_dict(self) -> Dict[str, Any]:
         return self.model_dump()
 
+    def to_list_item(self) -> Dict[str, Any]:
+        """
+        Light entry for job listings (the web UI's left column).
+        """
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "title": self.title,
+            "duration": self.duration,
+            "thumbnail": self.thumbnail,
+            "submitted_at": self.submitted_at,
+            "request_id": self.result.request_id if self.result else None,
+            "video_url": f"/video/{self.id}",
+            "info_url": f"/video_info/{self.id}",
+        }
+
+
+def video_summary(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The Job fields denormalized from a video info dict (VideoInfo.to_dict / info.json).
+    """
+    return {"title": info.get("title"), "duration": info.get("duration"), "thumbnail": info.get("thumbnail")}
+
+
+def encode_cursor(job: Job) -> str:
+    """
+    Opaque pagination cursor for a job's position in submit order.
+    """
+    return base64.urlsafe_b64encode(f"{job.submitted_at}|{job.id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    (submitted_at, job id) from encode_cursor's output.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        submitted_at, job_id = raw.split("|", 1)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return submitted_at, job_id
+
+
+def job_list_page(
+    store: "JobStore",
+    limit: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    /jobs response body: a page of list items, newest first, plus the cursors to continue:
+    pass cursors.before as ?before= for the next (older) page - null when there is none -
+    and cursors.after as ?after= for anything newer than this page. seq is the change
+    sequence to poll job_list_changes with.
+    Raises:
+        ValueError: If a cursor is malformed.
+    """
+    seq = store.current_seq()  # read first: a change racing the page query is re-sent, not lost
+    jobs, has_more = store.page(limit, before=before, after=after, status=status)
+    older_exist = has_more if not after else bool(jobs)  # after=: the cursor's own job is older
+    return {
+        "jobs": [j.to_list_item() for j in jobs],
+        "cursors": {
+            "before": encode_cursor(jobs[-1]) if jobs and older_exist else None,
+            "after": encode_cursor(jobs[0]) if jobs else after,
+        },
+        "seq": seq,
+    }
+
+
+def job_list_changes(store: "JobStore", since: int, limit: int) -> Dict[str, Any]:
+    """
+    /jobs?since= response body: list items of every job changed after change sequence `since`
+    (oldest change first), the seq to send next time, and two flags:
+    reset - the client's view cannot be patched (jobs were cleared, or the seq is unknown to this
+    store): drop it and reload the first page; more - call again right away with the new seq.
+    Status filters are not applied here; the client drops items that no longer match its view.
+    """
+    jobs, seq, reset, more = store.changes(since, limit)
+    return {"jobs": [j.to_list_item() for j in jobs], "seq": seq, "reset": reset, "more": more}
+
 
 class _DumpModel(TypedDict, total=False):
     jobs: Dict[str, Dict[str, Any]]
 
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    data TEXT NOT NULL,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status_submitted ON jobs (status, submitted_at);
+CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('seq', 0), ('cleared_seq', 0);
+"""
+
+
 class JobStore:
     """
-    In-memory job registry with optional JSON persistence under storage/jobs.json.
-    NOTE: Single-process dev only. For multi-process/containers, we'll move to Redis.
+    Job registry backed by SQLite (storage/jobs.db, WAL mode): one row per job, upserted on
+    change, with indexes on status and submit time - so get/update cost the same with ten
+    jobs or ten thousand. WAL lets readers (other threads, other API processes) run
+    concurrently with the single writer. Each thread uses its own connection.
+    With persist=False the database is a private in-memory one.
+    Every write stamps the row with the next value of a store-wide change sequence, so pollers
+    can ask for just the jobs changed since the last seq they saw (changes()), and every
+    committed change is passed to the listeners registered in this process (add_listener).
+    On first load, an existing storage/jobs.json is imported (and renamed to jobs.json.migrated).
     """
-    def __init__(self, persist: bool = True) -> None:
-        self._jobs: Dict[str, Job] = {}
+    def __init__(self, persist: bool = True, path: Optional[str] = None) -> None:
         self._persist = persist
-        self._path = os.path.join(STORAGE_DIR, "jobs.json")
-        os.makedirs(STORAGE_DIR, exist_ok=True)
+        self._lock = threading.RLock()  # serializes this process's read-modify-write updates
+        self._local = threading.local()
+        self._listeners: List[Callable[[Job], None]] = []
+        self._json_path = os.path.join(STORAGE_DIR, "jobs.json")
+        if persist:
+            os.makedirs(STORAGE_DIR, exist_ok=True)
+            self._dsn, self._uri = path or JOBS_DB_PATH, False
+        else:
+            self._dsn, self._uri = f"file:jobstore-{uuid.uuid4().hex}?mode=memory&cache=shared", True
+        # Also keeps a private in-memory database alive for the store's lifetime.
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        if "seq" not in [col[1] for col in conn.execute("PRAGMA table_info(jobs)")]:
+            conn.execute("ALTER TABLE jobs ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")  # databases from before seq
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_seq ON jobs (seq)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._dsn, uri=self._uri, timeout=30, isolation_level=None, check_same_thread=False)
+            if self._persist:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        A write transaction on this thread's connection: BEGIN IMMEDIATE takes the database
+        write lock up front, which also serializes against other processes.
+        """
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def add_listener(self, listener: Callable[[Job], None]) -> None:
+        """
+        Calls listener(job) after each committed create or change of a job by this process
+        (from the writing thread).
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, job: Job) -> None:
+        for listener in self._listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"  ! Job store listener failed: {e}")
+
+    @staticmethod
+    def _next_seq(conn: sqlite3.Connection) -> int:
+        return conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'seq' RETURNING value").fetchone()[0]
+
+    def _upsert(self, conn: sqlite3.Connection, job: Job) -> None:
+        """
+        Writes a job row stamped with the next change seq (call inside _transaction).
+        """
+        conn.execute(
+            "INSERT INTO jobs (id, status, submitted_at, data, seq) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, submitted_at = excluded.submitted_at, "
+            "data = excluded.data, seq = excluded.seq",
+            (job.id, job.status, job.submitted_at, job.model_dump_json(), self._next_seq(conn)),
+        )
 
     # basic CRUD
 
@@ -65,45 +269,188 @@ class JobStore:
         """
         jid = job_id or str(uuid.uuid4())
         job = Job(id=jid, params=params)
-        self._jobs[jid] = job
-        self._dump_if_enabled()
+        with self._transaction() as conn:
+            self._upsert(conn, job)
+        self._notify(job)
         return job
 
     def get(self, job_id: str) -> Optional[Job]:
-        return self._jobs.get(job_id)
+        row = self._conn().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
 
     def update(self, job_id: str, **patch: Any) -> Optional[Job]:
-        job = self._jobs.get(job_id)
-        if not job:
-            return None
-        updated = job.model_copy(update=patch)
-        self._jobs[job_id] = updated
-        self._dump_if_enabled()
+        """
+        Patch a job. Nothing is written if the patch changes nothing (status polling re-applies
+        the same state on every request).
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if not row:
+                return None
+            job = Job.model_validate_json(row[0])
+            updated = job.model_copy(update=patch)
+            changed = updated != job
+            if changed:
+                self._upsert(conn, updated)
+        if changed:
+            self._notify(updated)
         return updated
 
+    def update_branch(self, job_id: str, branch_key: str, **patch: Any) -> Optional[Job]:
+        """
+        Patch one branch of a fan-out job (the branch must already exist in job.branches).
+        """
+        with self._lock:
+            job = self.get(job_id)
+            if not job or not job.branches or branch_key not in job.branches:
+                return None
+            branches = dict(job.branches)
+            branches[branch_key] = branches[branch_key].model_copy(update=patch)
+            return self.update(job_id, branches=branches)
+
+    def list(self, status: Optional[str] = None) -> List[Job]:
+        """
+        Jobs oldest first, optionally only those with the given status.
+        """
+        if status:
+            rows = self._conn().execute("SELECT data FROM jobs WHERE status = ? ORDER BY submitted_at, id", (status,))
+        else:
+            rows = self._conn().execute("SELECT data FROM jobs ORDER BY submitted_at, id")
+        return [Job.model_validate_json(data) for (data,) in rows]
+
+    def page(
+        self,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> Tuple[List[Job], bool]:
+        """
+        One page of jobs, newest first, answered from the (status, submitted_at) indexes.
+        Args:
+            limit (int): Max jobs to return.
+            before (Optional[str]): Cursor; only jobs submitted before it (older page).
+            after (Optional[str]): Cursor; only jobs submitted after it (newer page).
+            status (Optional[str]): Only jobs with this status.
+        Returns:
+            Tuple[List[Job], bool]: The jobs, and whether more exist beyond the page in the
+            direction of travel (older for before/no cursor, newer for after).
+        Raises:
+            ValueError: If a cursor is malformed.
+        """
+        where: List[str] = []
+        args: List[Any] = []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if before:
+            where.append("(submitted_at, id) < (?, ?)")
+            args.extend(decode_cursor(before))
+        if after:
+            where.append("(submitted_at, id) > (?, ?)")
+            args.extend(decode_cursor(after))
+        order = "ASC" if after and not before else "DESC"
+        sql = (
+            "SELECT data FROM jobs" + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY submitted_at {order}, id {order} LIMIT ?"
+        )
+        rows = self._conn().execute(sql, (*args, limit + 1)).fetchall()
+        jobs = [Job.model_validate_json(data) for (data,) in rows[:limit]]
+        if order == "ASC":
+            jobs.reverse()
+        return jobs, len(rows) > limit
+
+    def unfinished_ids(self) -> List[str]:
+        """
+        IDs of PENDING/RUNNING jobs, oldest first (to re-enqueue after a restart).
+        """
+        rows = self._conn().execute(
+            "SELECT id FROM jobs WHERE status IN ('PENDING', 'RUNNING') ORDER BY submitted_at, id"
+        )
+        return [jid for (jid,) in rows]
+
+    def current_seq(self) -> int:
+        """
+        The change seq of the latest write (0 for a store that was never written to).
+        """
+        return self._conn().execute("SELECT value FROM counters WHERE name = 'seq'").fetchone()[0]
+
+    def changes(self, since: int, limit: int) -> Tuple[List[Job], int, bool, bool]:
+        """
+        Jobs written after change seq `since`, in the order they last changed, from the seq index.
+        Args:
+            since (int): The seq returned by the client's previous call (or by a /jobs page).
+            limit (int): Max jobs to return.
+        Returns:
+            Tuple[List[Job], int, bool, bool]: The jobs; the seq to pass next time; reset - True
+            when `since` predates a clear() or is ahead of this store (the client must reload
+            instead of patching); and whether more changes are waiting beyond `limit`.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")  # one snapshot for the counters and the rows
+        try:
+            seq, cleared_seq = (
+                dict(conn.execute("SELECT name, value FROM counters")).get(k, 0) for k in ("seq", "cleared_seq")
+            )
+            if since < cleared_seq or since > seq:
+                return [], seq, True, False
+            rows = conn.execute(
+                "SELECT data, seq FROM jobs WHERE seq > ? ORDER BY seq LIMIT ?", (since, limit + 1)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        more = len(rows) > limit
+        rows = rows[:limit]
+        jobs = [Job.model_validate_json(data) for data, _ in rows]
+        return jobs, (rows[-1][1] if more else seq), False, more
+
+    def clear(self) -> int:
+        """
+        Deletes every job record; returns how many there were. Pollers holding an older change
+        seq are told to reset.
+        """
+        with self._transaction() as conn:
+            count = conn.execute("DELETE FROM jobs").rowcount
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'cleared_seq'", (self._next_seq(conn),))
+        return count
+
     # persistence
 
     def load(self) -> None:
-        if not self._persist:
+        """
+        One-time migration: imports storage/jobs.json (the previous JSON persistence) into the
+        database if it exists, then renames it so it is not imported again.
+        """
+        if not self._persist or not os.path.exists(self._json_path):
             return
         try:
-            if os.path.exists(self._path):
-                with open(self._path, "r", encoding="utf-8") as f:
-                    raw: _DumpModel = json.load(f)
-                self._jobs = {jid: Job(**payload) for jid, payload in raw.get("jobs", {}).items()}
-        except Exception:
-            self._jobs = {}
-
-    def dump(self) -> None:
-        if not self._persist:
+            with open(self._json_path, "r", encoding="utf-8") as f:
+                raw: _DumpModel = json.load(f)
+            jobs = [Job(**payload) for payload in raw.get("jobs", {}).values()]
+        except Exception as e:
+            print(f"  ! Could not migrate {self._json_path}: {e}")
             return
-        self._dump_if_enabled()
+        for i, job in enumerate(jobs):
+            if job.title is None and job.result and job.result.paths:
+                # Last read of info.json for these jobs: listings use the denormalized fields.
+                try:
+                    with open(job.result.paths.get("video_info_path") or "", "r", encoding="utf-8") as f:
+                        jobs[i] = job.model_copy(update=video_summary(json.load(f)))
+                except (OSError, ValueError):
+                    pass
+        with self._transaction() as conn:
+            for job in jobs:
+                # Rows already in the database are newer than the JSON snapshot.
+                if not conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job.id,)).fetchone():
+                    self._upsert(conn, job)
+        os.replace(self._json_path, self._json_path + ".migrated")
+        print(f"Migrated {len(jobs)} job(s) from {self._json_path} to {self._dsn}")
 
-    def _dump_if_enabled(self) -> None:
+    def dump(self) -> None:
+        """
+        Every change is committed as it happens; this only folds the WAL back into the
+        database file (e.g. on shutdown).
+        """
         if not self._persist:
             return
-        data: _DumpModel = {"jobs": {jid: j.model_dump() for jid, j in self._jobs.items()}}
-        tmp = self._path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, self._path)
+        self._conn().execute("PRAGMA wal_checkpoint(PASSIVE)")
@@ -1,44 +1,107 @@
 import asyncio
-from typing import Optional, Dict, cast
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional, Dict, cast
 
 from flow.tts.gemini_voices import select_voice_by_name as select_gemini_voice
 from flow.tts.elevenlabs_voices import select_voice_by_name as select_elevenlabs_voice
 from flow.models.voices import Voice
 from flow.utils.languages import select_language_by_name
-from pipeline import run_pipeline
-from .jobs import JobStore, JobResult, now_iso
+from flow.models import VideoInfo
+from flow.utils.metrics import JOBS_FINISHED, QUEUE_DEPTH, QUEUE_WAIT, record_timings, replay_timings
+from flow.utils.progress import ProgressCallback, ProgressEvent
+from pipeline import NarrationBranch, Stage, StageExecutor, read_stage_timings, resolve_language, resolve_voice, run_fanout_pipeline, run_pipeline
+from settings import HOST_CPU_WORKERS, HOST_IO_WORKERS, HOST_SHUTDOWN_TIMEOUT_SECS, HOST_WORKER_CONCURRENCY
+from .jobs import BranchState, Job, JobStore, JobResult, now_iso, video_summary
 
 
 class Worker:
     """
-    Simple single-consumer queue worker:
+    Multi-consumer queue worker for host mode:
       - Accepts job IDs
-      - Pulls from asyncio.Queue
-      - Runs pipeline in a thread to avoid blocking the event loop
+      - Runs up to `concurrency` jobs at once, each driven from its own thread
+      - Runs CPU-bound stages (ffmpeg extract/merge) on a shared process pool and
+        network-bound stages (download, Gemini, TTS) on a shared thread pool, so a job
+        waiting on TTS never keeps the CPU from encoding another job's video
+      - On stop, takes no new jobs and lets running ones finish (up to shutdown_timeout);
+        jobs still queued or interrupted stay PENDING for the next start to re-enqueue.
+        An interrupted job starts no further stage, but a stage already running cannot be
+        cancelled: the process exits once it returns (its output is checkpointed for the restart)
+      - Reports each job's stage and cue progress to on_progress(job_id, event), if given
     """
-    def __init__(self, store: JobStore) -> None:
+    def __init__(
+        self,
+        store: JobStore,
+        concurrency: int = HOST_WORKER_CONCURRENCY,
+        cpu_workers: int = HOST_CPU_WORKERS,
+        io_workers: int = HOST_IO_WORKERS,
+        shutdown_timeout: float = HOST_SHUTDOWN_TIMEOUT_SECS,
+        on_progress: Optional[Callable[[str, ProgressEvent], None]] = None,
+    ) -> None:
         self.store = store
+        self.on_progress = on_progress
+        self.concurrency = max(1, concurrency)
+        self.cpu_workers = max(1, cpu_workers)
+        self.io_workers = max(1, io_workers)
+        self.shutdown_timeout = shutdown_timeout
         self.queue: "asyncio.Queue[str]" = asyncio.Queue()
-        self._task: Optional[asyncio.Task] = None
+        self._enqueued_at: Dict[str, float] = {}
+        self._consumers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}  # job id -> processing task
         self._stop = asyncio.Event()
+        self._abort = threading.Event()  # set when the drain times out: job threads start no more stages
+        self._job_pool: Optional[ThreadPoolExecutor] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
 
     async def start(self) -> None:
         self._stop.clear()
-        if self._task is None or self._task.done():
-            self._task = asyncio.create_task(self._run(), name="queue-worker")
+        self._abort.clear()
+        if self._job_pool is None:
+            # One driver thread per concurrent job; it only orchestrates and waits on the pools.
+            self._job_pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job")
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="io-stage")
+            # spawn: the parent is multi-threaded, and forking it can deadlock on held locks.
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._consumers = [c for c in self._consumers if not c.done()]
+        for i in range(len(self._consumers), self.concurrency):
+            self._consumers.append(asyncio.create_task(self._run(), name=f"queue-worker-{i}"))
 
     async def stop(self) -> None:
+        """
+        Graceful shutdown: idle consumers stop at once, running jobs are drained for up to
+        shutdown_timeout seconds and then cancelled (their stages resume from checkpoints on
+        restart), and the pools are shut down. Cancelled jobs start no further stage; stages
+        still in flight are not interrupted, and Python waits for their threads at exit, so
+        the process may outlive shutdown_timeout by up to one stage per running job.
+        """
         self._stop.set()
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
-            self._task = None
+        running = list(self._running.values())
+        for consumer in self._consumers:
+            if not any(t is consumer for t in running):
+                consumer.cancel()
+        if running:
+            print(f"Draining {len(running)} running job(s) (up to {self.shutdown_timeout:.0f}s)...")
+            _, pending = await asyncio.wait(running, timeout=self.shutdown_timeout)
+            if pending:
+                self._abort.set()
+                print(f"  ! {len(pending)} job(s) interrupted; waiting for their in-flight stages to return")
+            for task in pending:
+                task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        self._consumers = []
+        for pool in (self._job_pool, self._io_pool, self._cpu_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._job_pool = self._io_pool = self._cpu_pool = None
 
     async def enqueue(self, job_id: str) -> None:
+        self._enqueued_at[job_id] = time.monotonic()
         await self.queue.put(job_id)
+        QUEUE_DEPTH.labels(queue="host").set(self.queue.qsize())
 
     async def _run(self) -> None:
         while not self._stop.is_set():
@@ -46,11 +109,72 @@ class Worker:
                 job_id = await self.queue.get()
             except asyncio.CancelledError:
                 break
+            QUEUE_DEPTH.labels(queue="host").set(self.queue.qsize())
+            enqueued_at = self._enqueued_at.pop(job_id, None)
+            if enqueued_at is not None:
+                QUEUE_WAIT.labels(queue="host").observe(time.monotonic() - enqueued_at)
+            self._running[job_id] = cast(asyncio.Task, asyncio.current_task())
             try:
                 await self._process(job_id)
+                self._record_finished(job_id)
+            except asyncio.CancelledError:
+                # Drain timed out: leave the job to the next start, which resumes it from its checkpoints.
+                self.store.update(job_id, status="PENDING", error="Interrupted by worker shutdown; will resume on restart.")
+                break
             finally:
+                self._running.pop(job_id, None)
                 self.queue.task_done()
 
+    def _execute_stage(self, stage: Stage) -> Any:
+        """
+        StageExecutor for the pipeline (called from job threads): runs the stage on the pool
+        that matches its kind and blocks until it is done. CPU stages run in child processes,
+        whose ffmpeg timings are replayed into this process's metrics.
+        """
+        if self._abort.is_set():
+            raise RuntimeError("Worker is shutting down.")
+        if stage.kind == "cpu":
+            if self._cpu_pool is None:
+                raise RuntimeError("Worker is stopped.")
+            result, observations = self._cpu_pool.submit(record_timings, stage.run).result()
+            replay_timings(observations)
+            return result
+        if self._io_pool is None:
+            raise RuntimeError("Worker is stopped.")
+        return self._io_pool.submit(stage.run).result()
+
+    def _stage_executor(self, job_id: str) -> StageExecutor:
+        """
+        _execute_stage for one job, which also copies the video's title, duration and
+        thumbnail into the job record as soon as the download stage returns them.
+        """
+        def execute(stage: Stage) -> Any:
+            result = self._execute_stage(stage)
+            if isinstance(result, VideoInfo):
+                self.store.update(job_id, **video_summary(result.to_dict()))
+            return result
+        return execute
+
+    def _progress_callback(self, job_id: str) -> Optional[ProgressCallback]:
+        return partial(self.on_progress, job_id) if self.on_progress else None
+
+    async def _in_job_thread(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._job_pool, lambda: fn(*args, **kwargs))
+
+    def _record_finished(self, job_id: str) -> None:
+        """
+        Counts the job's final state and persists its per-stage timings from the manifest.
+        """
+        job = self.store.get(job_id)
+        if job is None or job.status not in ("SUCCESS", "FAILED"):
+            return
+        JOBS_FINISHED.labels(status=job.status).inc()
+        try:
+            self.store.update(job_id, stage_timings=read_stage_timings(job_id))
+        except Exception as e:
+            print(f"  ! Could not read stage timings for job {job_id}: {e}")
+
     async def _process(self, job_id: str) -> None:
         job = self.store.get(job_id)
         if job is None:
@@ -59,6 +183,10 @@ class Worker:
         # Transition to RUNNING
         self.store.update(job_id, status="RUNNING", started_at=now_iso(), error=None)
 
+        if job.params.branches:
+            await self._process_fanout(job)
+            return
+
         # Resolve language (best-effort fuzzy)
         lang_code = job.params.target_language
         try:
@@ -93,6 +221,9 @@ class Worker:
                 target_language=lang_code,
                 voice=voice,
                 original_audio_loudness=0.13,
+                request_id=job_id,  # same directory on retry, so completed stages are skipped
+                stage_executor=self._stage_executor(job_id),
+                on_progress=self._progress_callback(job_id),
             )
             # request_id is Optional[str] in the dataclass but guaranteed set in __post_init__
             req_id = cast(str, paths.request_id)
@@ -111,8 +242,8 @@ class Worker:
             }
 
         try:
-            # Use stdlib asyncio.to_thread for portability and to satisfy Pylance
-            flattened = await asyncio.to_thread(_run_sync_pipeline)
+            # Driven from a job thread; the stages themselves run on the CPU/IO pools
+            flattened = await self._in_job_thread(_run_sync_pipeline)
             request_id = flattened.pop("request_id")
             result = JobResult(
                 request_id=request_id,
@@ -132,3 +263,47 @@ class Worker:
                 finished_at=now_iso(),
                 error=str(e),
             )
+
+    async def _process_fanout(self, job: Job) -> None:
+        """
+        Runs a fan-out job: shared stages once, then one branch per (language, voice),
+        reporting per-branch progress into job.branches.
+        """
+        try:
+            branches = [
+                NarrationBranch(target_language=resolve_language(b.target_language), voice=resolve_voice(b.tts_provider, b.voice_name))
+                for b in job.params.branches or []
+            ]
+        except Exception as e:
+            self.store.update(job.id, status="FAILED", finished_at=now_iso(), error=f"Voice selection failed: {e}")
+            return
+        self.store.update(job.id, branches={
+            b.key: BranchState(target_language=b.target_language, voice_name=b.voice.name) for b in branches
+        })
+
+        def on_branch_update(key: str, patch: Dict[str, Any]) -> None:
+            self.store.update_branch(job.id, key, **patch)
+
+        try:
+            fanout = await self._in_job_thread(
+                run_fanout_pipeline,
+                video_url=job.params.yt_video_url,
+                branches=branches,
+                original_audio_loudness=0.13,
+                multitrack=job.params.multitrack,
+                on_branch_update=on_branch_update,
+                request_id=job.id,
+                stage_executor=self._stage_executor(job.id),
+                on_progress=self._progress_callback(job.id),
+            )
+            paths = fanout.to_dict()
+            request_id = paths.pop("request_id")
+            self.store.update(
+                job.id,
+                status="SUCCESS",
+                finished_at=now_iso(),
+                result=JobResult(request_id=request_id, paths=paths),
+                error="; ".join(f"{k}: {v}" for k, v in fanout.errors.items()) or None,
+            )
+        except Exception as e:
+            self.store.update(job.id, status="FAILED", finished_at=now_iso(), error=str(e))
@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from celery import Celery
+from celery.result import AsyncResult
+
+from pipeline import read_stage_timings
+from worker.tasks import read_video_summary
+from .jobs import BranchState, JobResult, JobStore, now_iso, video_summary
+from .task_events import TaskEventHandler
+
+# Celery mode: the API never asks the result backend how a job is doing when a client reads it.
+# Job states are written into the job store as the job's task events arrive (task ids are
+# "{job_id}.{stage}[.{branch}]", the chain's last task has id job_id: see worker/tasks.py):
+#   task-sent       download of a finished job (re-enqueued by another API process) -> PENDING
+#   task-started    any stage -> RUNNING, started_at = when the first one started
+#   task-succeeded  download -> title/duration/thumbnail; the last task -> SUCCESS with its result
+#   task-failed     any task (a failed stage ends its chain) -> FAILED with the exception
+#   task-branch     (custom) a fan-out branch's status/stage/error
+# The result backend is read once per job, for the last task's result (its paths), and once
+# per unfinished job whenever the event stream (re)connects, for transitions missed meanwhile.
+
+_FINISHED = ("SUCCESS", "FAILED")
+
+
+def split_task_id(task_id: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    (job id, stage, branch key) of a pipeline task id; stage is None for the job's last task.
+    """
+    job_id, _, rest = task_id.partition(".")
+    stage, _, variant = rest.partition(".")
+    return job_id, stage or None, variant or None
+
+
+def _event_time(event: Dict[str, Any]) -> str:
+    timestamp = event.get("timestamp")
+    if not timestamp:
+        return now_iso()
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def result_patch(payload: Any) -> Dict[str, Any]:
+    """
+    Job store patch (result, plus branches and the video summary when present) from the
+    success payload of a job's last task (finish_pipeline / finish_fanout).
+    """
+    data: Dict[str, Any] = dict(payload)
+    patch: Dict[str, Any] = {}
+    branches = data.pop("branches", None)
+    if isinstance(branches, dict):
+        patch["branches"] = {key: BranchState(**state) for key, state in branches.items()}
+    video = data.pop("video", None)
+    if isinstance(video, dict):
+        patch.update(video_summary(video))
+    request_id = data.pop("request_id", None)
+    patch["result"] = JobResult(request_id=request_id, paths=data)
+    return patch
+
+
+class JobReconciler:
+    """
+    Writes Celery task events into the job store (see the module comment). handlers() go to a
+    TaskEventReceiver, and sweep() is its on_ready callback. Both run on the receiver's thread,
+    so transitions are applied one at a time, in the order they arrive.
+    """
+    def __init__(self, store: JobStore, app: Celery) -> None:
+        self.store = store
+        self.app = app
+
+    def handlers(self) -> Dict[str, TaskEventHandler]:
+        return {
+            "task-sent": self.on_sent,
+            "task-started": self.on_started,
+            "task-succeeded": self.on_succeeded,
+            "task-failed": self.on_failed,
+            "task-branch": self.on_branch,
+        }
+
+    def on_sent(self, event: Dict[str, Any]) -> None:
+        job_id, stage, _ = split_task_id(event["uuid"])
+        job = self.store.get(job_id)
+        if job and stage == "download" and job.status in _FINISHED:
+            self.store.update(job_id, status="PENDING", started_at=None, finished_at=None, result=None, error=None)
+
+    def on_started(self, event: Dict[str, Any]) -> None:
+        job_id, _, _ = split_task_id(event["uuid"])
+        job = self.store.get(job_id)
+        if not job or job.status in _FINISHED:
+            return
+        patch: Dict[str, Any] = {"status": "RUNNING"}
+        if not job.started_at:
+            patch["started_at"] = _event_time(event)
+        self.store.update(job_id, **patch)
+
+    def on_succeeded(self, event: Dict[str, Any]) -> None:
+        job_id, stage, _ = split_task_id(event["uuid"])
+        job = self.store.get(job_id)
+        if not job:
+            return
+        if stage == "download" and job.title is None:
+            video = read_video_summary(job_id)
+            if video:
+                self.store.update(job_id, **video_summary(video))
+        elif stage is None:
+            self._finish(job_id, AsyncResult(job_id, app=self.app).result, _event_time(event))
+
+    def on_failed(self, event: Dict[str, Any]) -> None:
+        job_id, _, _ = split_task_id(event["uuid"])
+        if self.store.get(job_id):
+            self._fail(job_id, event.get("exception") or "Task failed.", _event_time(event))
+
+    def on_branch(self, event: Dict[str, Any]) -> None:
+        self.store.update_branch(
+            event["job_id"], event["variant"], status=event["status"], stage=event.get("stage"), error=event.get("error"),
+        )
+
+    def sweep(self) -> None:
+        """
+        Finishes the store's PENDING/RUNNING jobs that the result backend already has as done
+        (their events were sent while this process was not listening).
+        """
+        for job_id in self.store.unfinished_ids():
+            try:
+                res = AsyncResult(job_id, app=self.app)
+                state = res.state
+                if state not in ("SUCCESS", "FAILURE"):
+                    continue
+                date_done = res.date_done
+                finished_at = date_done.replace(tzinfo=date_done.tzinfo or timezone.utc).isoformat() if date_done else now_iso()
+                if state == "SUCCESS":
+                    self._finish(job_id, res.result, finished_at)
+                else:
+                    self._fail(job_id, repr(res.result), finished_at)  # as in task-failed events
+            except Exception as e:
+                print(f"  ! Could not reconcile job {job_id}: {e}")
+
+    def _finish(self, job_id: str, payload: Any, finished_at: str) -> None:
+        patch: Dict[str, Any] = {"status": "SUCCESS", "finished_at": finished_at, "error": None}
+        try:
+            patch.update(result_patch(payload))
+        except Exception as e:
+            patch["error"] = f"Bad result payload: {e}"
+        # The worker writes the manifest into the shared storage volume.
+        self.store.update(job_id, stage_timings=read_stage_timings(job_id), **patch)
+
+    def _fail(self, job_id: str, error: str, finished_at: str) -> None:
+        self.store.update(
+            job_id, status="FAILED", finished_at=finished_at, error=error, stage_timings=read_stage_timings(job_id),
+        )
@@ -1,4 +1,4 @@
-from typing import Literal, Optional, Dict, Any
+from typing import Literal, Optional, Dict, Any, List
 from pydantic import BaseModel, HttpUrl, Field
 
 # Request models
@@ -21,6 +21,20 @@ class RenarrateRequest(BaseModel):
     voice_name: Optional[str] = Field(None, description="Voice display name for the provider")
 
 
+class FanoutRenarrateRequest(BaseModel):
+    """
+    Incoming job creation request for /renarrate/fanout: one video, several outputs.
+    Download, audio separation and transcription run once; every target language is then
+    translated, narrated and merged with every voice in voice_names (provider default if omitted).
+    - multitrack: also produce one MKV carrying all narrations as separate audio tracks
+    """
+    yt_video_url: HttpUrl = Field(..., description="YouTube video URL")
+    target_languages: List[str] = Field(..., min_length=1, description="Target language names (e.g., ['Polish', 'German'])")
+    tts_provider: TTSProvider = Field("elevenlabs", description="TTS provider to use")
+    voice_names: Optional[List[str]] = Field(None, description="Voice display names for the provider")
+    multitrack: bool = Field(True, description="Also mux all narrations into one multi-audio-track MKV")
+
+
 # Response models
 
 class EnqueueResponse(BaseModel):
@@ -0,0 +1,88 @@
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from celery import Celery
+from celery.events.receiver import EventReceiver
+
+# Handler for one event type: called with the event's fields (from the receiver thread).
+TaskEventHandler = Callable[[Dict[str, Any]], None]
+
+
+class _Receiver(EventReceiver):
+    def __init__(self, *args: Any, on_ready: Optional[Callable[[], None]] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.on_ready = on_ready
+
+    def on_consume_ready(self, connection, channel, consumers, **kwargs):
+        super().on_consume_ready(connection, channel, consumers, **kwargs)
+        if self.on_ready is not None:
+            try:
+                self.on_ready()
+            except Exception as e:
+                print(f"  ! Task event receiver on_ready failed: {e}")
+
+
+class TaskEventReceiver:
+    """
+    Consumes Celery task events (worker_send_task_events / task_send_sent_event, plus the
+    workers' custom "task-progress" events) in a background thread of the API process and
+    passes each one to the handler registered for its type. Reconnects after broker errors;
+    a failing handler is logged and does not stop the stream. on_ready, if given, is called
+    on the same thread each time the event queue is consuming again (at start and after a
+    reconnect): events sent before that moment were not received.
+    """
+    def __init__(
+        self,
+        app: Celery,
+        handlers: Dict[str, TaskEventHandler],
+        reconnect_secs: float = 5.0,
+        on_ready: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.app = app
+        self.handlers = handlers
+        self.on_ready = on_ready
+        self.reconnect_secs = reconnect_secs
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._receiver: Any = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="task-events", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        receiver = self._receiver
+        if receiver is not None:
+            receiver.should_stop = True  # checked about once a second by the consume loop
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        handler = self.handlers.get(event.get("type", ""))
+        if handler is None:
+            return
+        try:
+            handler(event)
+        except Exception as e:
+            print(f"  ! Task event handler for {event.get('type')} failed: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self.app.connection_for_read() as conn:
+                    self._receiver = _Receiver(conn, handlers={"*": self._dispatch}, app=self.app, on_ready=self.on_ready)
+                    if self._stop.is_set():
+                        break
+                    self._receiver.capture(limit=None, timeout=None, wakeup=False)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"  ! Task event receiver lost the broker ({e}); reconnecting in {self.reconnect_secs:.0f}s")
+                self._stop.wait(self.reconnect_secs)
+            finally:
+                self._receiver = None
@@ -0,0 +1,330 @@
+"""
+Local stand-ins for the external services the pipeline talks to, for offline benchmarks.
+
+- yt-dlp: `make_fake_download_video` builds a stand-in with the signature of flow.download.download_video and
+  "downloads" locally generated synthetic media (test pattern + tone bursts separated by
+  silences, so chunking at silences behaves as on speech).
+- Gemini: `FakeGeminiClient` replaces the SDK client used by flow.generate_cc,
+  flow.translate_cc and flow.tts.gemini_tts. It returns synthetic SRT for uploaded audio,
+  "translates" the TRANSLATE section of window prompts, and returns PCM for TTS prompts.
+- ElevenLabs: `FakeElevenLabsClient` replaces the SDK client used by flow.tts.elevenlabs_tts.
+
+The real flow code (chunking, SRT repair, windows, retries, rate limiting, time stretch,
+mixing, ffmpeg) runs unchanged. Every fake call goes through a `FakeProvider` with
+configurable latency, jitter, transient error rate and a requests-per-minute limit; errors
+look like SDK errors (`.code`, `Retry-After`), so flow.utils.retry classifies and backs off
+on them as it would in production.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterator, Optional
+
+import ffmpeg  # pip install ffmpeg-python
+import numpy as np
+
+from flow.models import VideoInfo
+
+TTS_SAMPLE_RATE = 24000
+_WORDS = (
+    "the quick brown fox jumps over a lazy dog while seven bright stars shine above "
+    "quiet rivers carry old stories through green valleys and busy cities every night"
+).split()
+_TRANSLATE_RE = re.compile(r"TRANSLATE:\n```srt\n(?P<srt>.*?)\n```", re.S)
+
+
+@dataclass
+class FakeProviderConfig:
+    latency_s: float = 0.05  # mean per-call latency
+    jitter_s: float = 0.0  # +/- uniform jitter around latency_s
+    error_rate: float = 0.0  # fraction of calls failing with a transient 503
+    rpm: float = 0.0  # requests per minute before 429s (0 = unlimited)
+    bandwidth_mbps: float = 0.0  # simulated transfer speed for downloads (0 = instant)
+
+
+class FakeAPIError(Exception):
+    """
+    Provider error shaped like the SDK errors flow.utils.retry inspects.
+    """
+    def __init__(self, code: int, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.status = "RESOURCE_EXHAUSTED" if code == 429 else "UNAVAILABLE"
+        self.headers = {"retry-after": f"{retry_after:.1f}"} if retry_after is not None else {}
+
+
+class FakeProvider:
+    """
+    Gatekeeper for one fake service: applies the rate limit, injects errors, sleeps the latency
+    and counts what happened.
+    """
+    def __init__(self, name: str, config: FakeProviderConfig, seed: int = 0) -> None:
+        self.name = name
+        self.config = config
+        self._rng = random.Random(f"{seed}:{name}")
+        self._lock = threading.Lock()
+        self._window: Deque[float] = deque()
+        self.stats = {"calls": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def call(self, transfer_bytes: int = 0) -> None:
+        cfg = self.config
+        with self._lock:
+            self.stats["calls"] += 1
+            now = time.monotonic()
+            if cfg.rpm > 0:
+                while self._window and now - self._window[0] >= 60.0:
+                    self._window.popleft()
+                if len(self._window) >= cfg.rpm:
+                    self.stats["rate_limited"] += 1
+                    raise FakeAPIError(429, f"{self.name}: rate limit exceeded", retry_after=60.0 - (now - self._window[0]))
+                self._window.append(now)
+            fail = self._rng.random() < cfg.error_rate
+            delay = max(0.0, cfg.latency_s + self._rng.uniform(-cfg.jitter_s, cfg.jitter_s))
+        if cfg.bandwidth_mbps > 0 and transfer_bytes:
+            delay += transfer_bytes / (cfg.bandwidth_mbps * 125_000)
+        time.sleep(delay)
+        with self._lock:
+            if fail:
+                self.stats["errors"] += 1
+            else:
+                self.stats["ok"] += 1
+        if fail:
+            raise FakeAPIError(503, f"{self.name}: simulated transient failure")
+
+
+def _seed_of(*parts: Any) -> int:
+    return int.from_bytes(hashlib.blake2b("|".join(map(str, parts)).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 9))).capitalize() + "."
+
+
+def _srt_ts(t: float) -> str:
+    ms = int(round(t * 1000))
+    return f"{ms // 3_600_000:02d}:{ms // 60_000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def _audio_duration(path: str) -> float:
+    _, stderr = ffmpeg.input(path).output("-", format="null").run(capture_stderr=True, quiet=True)
+    m = re.search(r"Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)", stderr.decode("utf-8", errors="replace"))
+    return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)) if m else 0.0
+
+
+def synthetic_srt(duration_secs: float, seed: int) -> str:
+    """
+    A cue of 2-3.5s every ~3.5-4.5s across the duration, with seeded pseudo-sentences.
+    """
+    rng = random.Random(seed)
+    blocks, t, index = [], 0.3, 1
+    while t + 1.0 < duration_secs:
+        end = min(duration_secs, t + rng.uniform(2.0, 3.5))
+        blocks.append(f"{index}\n{_srt_ts(t)} --> {_srt_ts(end)}\n{_sentence(rng)}\n")
+        index += 1
+        t = end + rng.uniform(0.5, 1.0)
+    return "\n".join(blocks)
+
+
+def synthetic_speech_pcm(text: str, seed: int, secs_per_word: float = 0.32) -> bytes:
+    """
+    Speech-length PCM (24 kHz mono s16le): a harmonic tone with a syllable-rate envelope.
+    """
+    rng = np.random.default_rng(seed % (2 ** 32))
+    duration = max(0.3, len(text.split()) * secs_per_word * rng.uniform(0.9, 1.2))
+    t = np.arange(int(duration * TTS_SAMPLE_RATE)) / TTS_SAMPLE_RATE
+    f0 = rng.uniform(100, 220)
+    voiced = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 4))
+    envelope = np.abs(np.sin(2 * np.pi * 4.0 * t))
+    return (voiced * envelope * 5000).astype("<i2").tobytes()
+
+
+class SyntheticMedia:
+    """
+    Generates and caches source videos (one per seed) so "downloads" do not pay for encoding.
+    """
+    def __init__(self, root: str, duration_secs: float, height: int = 360) -> None:
+        self.root = root
+        self.duration_secs = duration_secs
+        self.height = height
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, seed: int) -> str:
+        return os.path.join(self.root, f"source_{seed % 100000:05d}_{int(self.duration_secs)}s.mkv")
+
+    def prepare(self, seed: int) -> str:
+        path = self.path_for(seed)
+        if os.path.exists(path):
+            return path
+        d = self.duration_secs
+        width = self.height * 16 // 9
+        video = ffmpeg.input(f"testsrc2=size={width}x{self.height}:rate=25:duration={d}", f="lavfi")
+        # ~3.3s tone bursts with 0.7s silences: something for silencedetect to cut at.
+        freq = 160 + seed % 120
+        audio = ffmpeg.input(f"aevalsrc=0.3*sin(2*PI*{freq}*t)*gt(mod(t\\,4)\\,0.7):s=44100:d={d}", f="lavfi")
+        tmp = path + ".tmp.mkv"
+        (
+            ffmpeg.output(video, audio, tmp, vcodec="libx264", preset="ultrafast", acodec="aac", shortest=None)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+        os.replace(tmp, path)
+        return path
+
+
+def make_fake_download_video(provider: FakeProvider, media: SyntheticMedia):
+    """
+    Builds a stand-in for flow.download.download_video that serves synthetic media for the URL.
+    """
+    def fake_download_video(video_url: str, downloaded_video_save_path: str, video_info_save_path: str, use_cache: bool = True) -> VideoInfo:
+        seed = _seed_of(video_url)
+        source = media.prepare(seed)
+        provider.call(transfer_bytes=os.path.getsize(source))
+        os.makedirs(os.path.dirname(downloaded_video_save_path), exist_ok=True)
+        shutil.copyfile(source, downloaded_video_save_path)
+        info = VideoInfo(
+            id=f"fake{seed % 100000:05d}",
+            title=f"Synthetic video {seed % 100000:05d}",
+            description="Generated for offline benchmarks.",
+            duration=int(media.duration_secs),
+            webpage_url=video_url,
+            downloaded_file=downloaded_video_save_path,
+        )
+        with open(video_info_save_path, "w", encoding="utf-8") as f:
+            json.dump(info.to_dict(), f, ensure_ascii=False, indent=2)
+        return info
+    return fake_download_video
+
+
+@dataclass
+class _FakeFile:
+    name: str
+    path: str
+
+
+class _Obj:
+    def __init__(self, **kwargs: Any) -> None:
+        self.__dict__.update(kwargs)
+
+
+class FakeGeminiClient:
+    """
+    Duck-typed google.genai.Client: `files.upload` and `models.generate_content`.
+    """
+    def __init__(self, text: FakeProvider, tts: FakeProvider) -> None:
+        self._text = text
+        self._tts = tts
+        self.files = _Obj(upload=self._upload)
+        self.models = _Obj(generate_content=self._generate_content)
+
+    def _upload(self, file: str) -> _FakeFile:
+        self._text.call(transfer_bytes=os.path.getsize(file))
+        return _FakeFile(name=f"files/{os.path.basename(file)}", path=file)
+
+    def _generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+        if config is not None:  # TTS (audio response modality)
+            self._tts.call()
+            prompt = contents if isinstance(contents, str) else " ".join(map(str, contents))
+            text = prompt.split("\n\n", 1)[-1]
+            pcm = synthetic_speech_pcm(text, _seed_of(text))
+            part = _Obj(inline_data=_Obj(data=pcm, mime_type="audio/L16;rate=24000"))
+            return _Obj(text=None, candidates=[_Obj(content=_Obj(parts=[part]))])
+
+        self._text.call()
+        items = contents if isinstance(contents, list) else [contents]
+        uploaded = next((c for c in items if isinstance(c, _FakeFile)), None)
+        if uploaded is not None:  # transcription
+            with open(uploaded.path, "rb") as f:
+                seed = _seed_of(hashlib.blake2b(f.read(), digest_size=8).hexdigest())
+            return _Obj(text=f"```srt\n{synthetic_srt(_audio_duration(uploaded.path), seed)}\n```")
+
+        prompt = "\n".join(str(c) for c in items)
+        m = _TRANSLATE_RE.search(prompt)
+        if m:  # windowed translation: same cues, "translated" text
+            translated = re.sub(
+                r"^(?!\d+$)(?!\d{2}:)(.+)$",
+                lambda line: " ".join(w[::-1] for w in line.group(1).split()),
+                m.group("srt"),
+                flags=re.M,
+            )
+            return _Obj(text=translated)
+        # Anything else (e.g. an SRT fix request): echo the SRT in the prompt.
+        block = re.search(r"```srt\n(.*?)\n```", prompt, re.S)
+        return _Obj(text=block.group(1) if block else "")
+
+
+class FakeElevenLabsClient:
+    """
+    Duck-typed elevenlabs.client.ElevenLabs: `text_to_speech.convert` yielding PCM chunks.
+    """
+    def __init__(self, provider: FakeProvider) -> None:
+        self._provider = provider
+        self.text_to_speech = _Obj(convert=self._convert)
+
+    def _convert(self, text: str, voice_id: str, model_id: str, output_format: str) -> Iterator[bytes]:
+        self._provider.call()
+        pcm = synthetic_speech_pcm(text, _seed_of(voice_id, text))
+        return iter([pcm[i:i + 4096] for i in range(0, len(pcm), 4096)])
+
+
+@dataclass
+class FakeServices:
+    download: FakeProvider
+    gemini: FakeProvider
+    gemini_tts: FakeProvider
+    elevenlabs: FakeProvider
+    media: SyntheticMedia
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            p.name: {**p.stats, "config": asdict(p.config)}
+            for p in (self.download, self.gemini, self.gemini_tts, self.elevenlabs)
+        }
+
+
+@contextmanager
+def fake_services(
+    media: SyntheticMedia,
+    configs: Optional[Dict[str, FakeProviderConfig]] = None,
+    default: Optional[FakeProviderConfig] = None,
+    seed: int = 0,
+) -> Iterator[FakeServices]:
+    """
+    Patches the pipeline's external services with fakes for the duration of the block.
+    configs maps "download" / "gemini" / "gemini_tts" / "elevenlabs" to their settings;
+    missing ones use `default`.
+    """
+    import pipeline
+    import flow.generate_cc
+    import flow.translate_cc
+    import flow.tts.gemini_tts
+    import flow.tts.elevenlabs_tts
+
+    configs = configs or {}
+    default = default or FakeProviderConfig()
+    providers = {name: FakeProvider(name, configs.get(name, default), seed) for name in ("download", "gemini", "gemini_tts", "elevenlabs")}
+    services = FakeServices(media=media, **providers)
+    gemini_client = FakeGeminiClient(services.gemini, services.gemini_tts)
+
+    patches = [
+        (pipeline, "download_video", make_fake_download_video(services.download, media)),
+        (flow.generate_cc, "client", gemini_client),
+        (flow.translate_cc, "client", gemini_client),
+        (flow.tts.gemini_tts, "client", gemini_client),
+        (flow.tts.elevenlabs_tts, "elevenlabs", FakeElevenLabsClient(services.elevenlabs)),
+    ]
+    originals = [(module, attr, getattr(module, attr)) for module, attr, _ in patches]
+    for module, attr, fake in patches:
+        setattr(module, attr, fake)
+    try:
+        yield services
+    finally:
+        for module, attr, original in originals:
+            setattr(module, attr, original)
@@ -0,0 +1,253 @@
+"""
+Offline pipeline benchmarks: no network, no paid APIs. yt-dlp, Gemini and ElevenLabs are
+replaced by the fakes in benchmarks/fakes.py (configurable latency, error rate and rate
+limit); everything else - ffmpeg, chunking, retries, limiters, WSOLA, mixing - is real.
+
+Scenarios:
+  stages  per-stage wall time and throughput on one synthetic video
+  e2e     end-to-end run_pipeline latency for several jobs, optionally concurrent
+  api     /renarrate enqueue and /status throughput of the host-mode API under concurrent load
+
+    python -m benchmarks.pipeline --video-secs 120 --jobs 4 --job-concurrency 2 --out bench.json
+    python -m benchmarks.pipeline --only api --api-requests 500 --api-concurrency 50
+    python -m benchmarks.pipeline --latency 0.3 --error-rate 0.05 --rpm 120
+
+Storage and every cache live in a fresh temporary STORAGE_DIR (or --storage-dir), so runs
+are cold and comparable; results are written as JSON, tagged with the git commit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+SCENARIOS = ("stages", "e2e", "api")
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "max": ordered[-1],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _count_cues(srt_path: str) -> int:
+    from flow.utils.srt_utils import parse_srt
+    with open(srt_path, "r", encoding="utf-8") as f:
+        return len(parse_srt(f.read()))
+
+
+def bench_stages(args: argparse.Namespace, voice: Any) -> Dict[str, Any]:
+    """
+    Runs each stage once, in order, on one synthetic video and times it in isolation.
+    """
+    import pipeline
+    from flow.models.video_paths import VideoProcessingPaths
+    from settings import STORAGE_DIR
+
+    paths = VideoProcessingPaths(base_dir=STORAGE_DIR, create=True)
+    media_secs = args.video_secs
+    stages = pipeline._shared_stages("https://fake.example/watch?v=stages", paths) + pipeline._branch_stages(
+        paths, args.language, voice, 0.13
+    )
+    results: Dict[str, Any] = {}
+    for stage in stages:
+        start = time.perf_counter()
+        stage.run()
+        elapsed = time.perf_counter() - start
+        entry: Dict[str, Any] = {"seconds": elapsed, "media_secs_per_second": media_secs / elapsed if elapsed > 0 else None}
+        if stage.name in ("generate_cc", "translate", "narrate"):
+            srt = paths.generated_cc_path if stage.name == "generate_cc" else paths.translated_cc_path
+            cues = _count_cues(srt)
+            entry["cues"] = cues
+            entry["cues_per_second"] = cues / elapsed if elapsed > 0 else None
+        results[stage.name] = entry
+        print(f"[stages] {stage.name}: {elapsed:.2f}s")
+    return {"video_secs": media_secs, "stages": results}
+
+
+def bench_e2e(args: argparse.Namespace, voice: Any, services: Any) -> Dict[str, Any]:
+    """
+    Runs args.jobs full pipelines on distinct synthetic videos, args.job_concurrency at a time.
+    """
+    import pipeline
+    from benchmarks.fakes import _seed_of
+
+    urls = [f"https://fake.example/watch?v=e2e{i}" for i in range(args.jobs)]
+    for url in urls:  # encode the sources up front so "downloads" only cost the fake transfer
+        services.media.prepare(_seed_of(url))
+
+    def run_one(url: str) -> float:
+        start = time.perf_counter()
+        pipeline.run_pipeline(url, args.language, voice, streaming=args.streaming)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.job_concurrency), thread_name_prefix="bench-job") as pool:
+        latencies = list(pool.map(run_one, urls))
+    wall = time.perf_counter() - start
+    print(f"[e2e] {args.jobs} jobs in {wall:.2f}s")
+    return {
+        "jobs": args.jobs,
+        "concurrency": args.job_concurrency,
+        "streaming": args.streaming,
+        "video_secs": args.video_secs,
+        "wall_seconds": wall,
+        "jobs_per_minute": args.jobs / wall * 60.0 if wall > 0 else None,
+        "latency_seconds": _percentiles(latencies),
+    }
+
+
+async def _bench_api_async(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    from api.app import app
+
+    # No lifespan: the queue worker is not started, so this measures the API and job store only.
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(max(1, args.api_concurrency))
+    payload = {"yt_video_url": "https://fake.example/watch?v=api", "target_language": args.language}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def timed_request(method: str, url: str, **kwargs: Any) -> Any:
+            async with semaphore:
+                start = time.perf_counter()
+                resp = await client.request(method, url, **kwargs)
+                return time.perf_counter() - start, resp
+
+        start = time.perf_counter()
+        posted = await asyncio.gather(*(timed_request("POST", "/renarrate", json=payload) for _ in range(args.api_requests)))
+        enqueue_wall = time.perf_counter() - start
+        job_ids = [resp.json()["job_id"] for _, resp in posted if resp.status_code == 202]
+
+        start = time.perf_counter()
+        polled = await asyncio.gather(*(
+            timed_request("GET", f"/status/{job_ids[i % len(job_ids)]}") for i in range(args.api_requests)
+        )) if job_ids else []
+        status_wall = time.perf_counter() - start
+
+        start = time.perf_counter()
+        listed = await asyncio.gather(*(timed_request("GET", "/jobs") for _ in range(max(1, args.api_requests // 10))))
+        list_wall = time.perf_counter() - start
+
+    def summary(results: List[Any], wall: float, ok: int) -> Dict[str, Any]:
+        return {
+            "requests": len(results),
+            "errors": sum(1 for _, r in results if r.status_code != ok),
+            "wall_seconds": wall,
+            "requests_per_second": len(results) / wall if wall > 0 else None,
+            "latency_seconds": _percentiles([t for t, _ in results]),
+        }
+
+    return {
+        "concurrency": args.api_concurrency,
+        "enqueue": summary(posted, enqueue_wall, 202),
+        "status": summary(polled, status_wall, 200),
+        "list_jobs": summary(listed, list_wall, 200),
+    }
+
+
+def bench_api(args: argparse.Namespace) -> Dict[str, Any]:
+    result = asyncio.run(_bench_api_async(args))
+    print(f"[api] enqueue {result['enqueue']['requests_per_second']:.0f} req/s, status {result['status']['requests_per_second']:.0f} req/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(SCENARIOS), help=f"Comma-separated scenarios from {SCENARIOS}.")
+    parser.add_argument("--video-secs", type=float, default=60.0, help="Length of the synthetic source videos.")
+    parser.add_argument("--language", default="pl-PL")
+    parser.add_argument("--tts-provider", choices=("elevenlabs", "gemini"), default="elevenlabs")
+    parser.add_argument("--jobs", type=int, default=3, help="e2e: number of pipeline runs.")
+    parser.add_argument("--job-concurrency", type=int, default=1, help="e2e: pipelines running at once.")
+    parser.add_argument("--streaming", action="store_true", help="e2e: use the overlapped pipeline mode.")
+    parser.add_argument("--api-requests", type=int, default=200)
+    parser.add_argument("--api-concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake provider mean latency (s).")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Fake provider latency jitter (s).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls failing with 503.")
+    parser.add_argument("--rpm", type=float, default=0.0, help="Fake provider requests/minute before 429 (0 = unlimited).")
+    parser.add_argument("--download-mbps", type=float, default=200.0, help="Simulated download bandwidth.")
+    parser.add_argument("--provider-config", help='JSON overrides per provider, e.g. \'{"elevenlabs": {"latency_s": 0.4}}\'.')
+    parser.add_argument("--storage-dir", help="STORAGE_DIR for the run (default: a fresh temporary directory).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Path for the JSON results.")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {sorted(unknown)}")
+
+    # Everything below reads settings at import time: point storage and caches at a scratch
+    # directory and give the SDK clients dummy keys before importing the pipeline.
+    storage_dir = args.storage_dir or tempfile.mkdtemp(prefix="renarrate-bench-")
+    os.environ["STORAGE_DIR"] = storage_dir
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("ELEVENLABS_API_KEY", "offline-benchmark")
+
+    from benchmarks.fakes import FakeProviderConfig, SyntheticMedia, fake_services
+    from pipeline import resolve_voice
+
+    default = FakeProviderConfig(latency_s=args.latency, jitter_s=args.jitter, error_rate=args.error_rate, rpm=args.rpm)
+    configs = {"download": FakeProviderConfig(latency_s=args.latency, jitter_s=args.jitter, bandwidth_mbps=args.download_mbps)}
+    for name, overrides in json.loads(args.provider_config or "{}").items():
+        configs[name] = FakeProviderConfig(**{**vars(configs.get(name, default)), **overrides})
+
+    media = SyntheticMedia(os.path.join(storage_dir, "bench_media"), duration_secs=args.video_secs)
+    voice = resolve_voice(args.tts_provider)
+    results: Dict[str, Any] = {}
+    with fake_services(media, configs=configs, default=default, seed=args.seed) as services:
+        if "stages" in scenarios:
+            results["stages"] = bench_stages(args, voice)
+        if "e2e" in scenarios:
+            results["e2e"] = bench_e2e(args, voice, services)
+        if "api" in scenarios:
+            results["api"] = bench_api(args)
+        provider_stats = services.stats()
+
+    report = {
+        "benchmark": "pipeline",
+        "git_commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "storage_dir": storage_dir,
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "results": results,
+        "providers": provider_stats,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import requests
 import time
 import sys
@@ -11,7 +12,7 @@ TEST_PAYLOAD = {
     "tts_provider": "elevenlabs",
     "voice_name": "Daniel"
 }
-POLL_INTERVAL = 5  # seconds
+POLL_INTERVAL = 5  # seconds, when the event stream is unavailable
 
 
 def enqueue_job() -> str:
@@ -43,9 +44,37 @@ def poll_status(job_id: str) -> dict:
         time.sleep(POLL_INTERVAL)
 
 
+def follow_events(job_id: str) -> dict:
+    """Follow /jobs/{job_id}/events (SSE) until a terminal state; falls back to polling."""
+    url = f"{BASE_URL}/jobs/{job_id}/events"
+    try:
+        while True:  # the server ends streams periodically; reconnect like EventSource does
+            with requests.get(url, stream=True, timeout=(10, 60)) as resp:
+                resp.raise_for_status()
+                event = None
+                for line in resp.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        stamp = time.strftime('%H:%M:%S')
+                        if event == "progress":
+                            branch = f" [{data['variant']}]" if data.get("variant") else ""
+                            cues = f" {data['done']}/{data['total']} cues" if data["kind"] == "cues" else ""
+                            pct = f" ({data['fraction']:.0%})" if data.get("fraction") is not None else ""
+                            print(f"[{stamp}] {data['kind']} {data['stage']}{branch}{cues}{pct}")
+                        elif event == "job":
+                            print(f"[{stamp}] Job {job_id} status: {data['status']}")
+                            if data["status"] in ("SUCCESS", "FAILED"):
+                                return requests.get(f"{BASE_URL}/status/{job_id}").json()["job"]
+    except requests.RequestException as e:
+        print(f"Event stream unavailable ({e}); polling instead.")
+        return poll_status(job_id)
+
+
 def main():
     job_id = enqueue_job()
-    final_job = poll_status(job_id)
+    final_job = follow_events(job_id)
     print("\nFinal job record:")
     print(final_job)
 
@@ -0,0 +1,235 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from settings import DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES
+
+try:
+    import fcntl  # POSIX only; used to serialize downloads of one video across worker processes
+except ImportError:  # pragma: no cover - Windows dev hosts
+    fcntl = None
+
+VIDEO_FILENAME = "original.mkv"
+INFO_FILENAME = "info.json"
+_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+@dataclass
+class DownloadCacheEntry:
+    key: str
+    dir: str
+
+    @property
+    def video_path(self) -> str:
+        return os.path.join(self.dir, VIDEO_FILENAME)
+
+    @property
+    def info_path(self) -> str:
+        return os.path.join(self.dir, INFO_FILENAME)
+
+    @property
+    def ref_count(self) -> int:
+        """
+        Number of job directories hardlinked to this entry's video (st_nlink minus the store's own link).
+        """
+        try:
+            return max(0, os.stat(self.video_path).st_nlink - 1)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def size_bytes(self) -> int:
+        total = 0
+        for name in (VIDEO_FILENAME, INFO_FILENAME):
+            try:
+                total += os.path.getsize(os.path.join(self.dir, name))
+            except FileNotFoundError:
+                pass
+        return total
+
+    def is_complete(self) -> bool:
+        return os.path.exists(self.video_path) and os.path.exists(self.info_path)
+
+
+class DownloadCache:
+    """
+    Content store for downloaded source videos shared across jobs.
+    Entries are keyed by the canonical video id (extractor + id from yt-dlp) plus a hash of the
+    format selector, and live under root/<key>/{original.mkv, info.json}.
+    Jobs hardlink the files into their own directory, so the link count doubles as a reference
+    count: eviction (LRU by last use, bounded by max_bytes) only removes entries no job references,
+    since deleting a referenced entry would not free any space.
+    """
+    def __init__(self, root: str = DOWNLOAD_CACHE_DIR, max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(extractor: str, video_id: str, format_selector: str) -> str:
+        fmt_hash = hashlib.sha256(format_selector.encode("utf-8")).hexdigest()[:12]
+        return _SAFE_RE.sub("_", f"{extractor.lower()}-{video_id}-{fmt_hash}")
+
+    def entry(self, key: str) -> DownloadCacheEntry:
+        return DownloadCacheEntry(key=key, dir=os.path.join(self.root, key))
+
+    def lookup(self, key: str) -> Optional[DownloadCacheEntry]:
+        entry = self.entry(key)
+        if not entry.is_complete():
+            return None
+        os.utime(entry.dir, None)  # LRU clock
+        return entry
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Serializes work on one key across threads (and processes, where fcntl is available),
+        so concurrent jobs for the same video download it only once.
+        """
+        with self._thread_lock(key):
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path(key), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _try_lock(self, key: str) -> Iterator[bool]:
+        """
+        Non-blocking lock(): yields whether the key's lock was acquired (False while another
+        thread or process works on the key).
+        """
+        thread_lock = self._thread_lock(key)
+        if not thread_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            with open(self._lock_path(key), "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except OSError:
+                    locked = False
+                try:
+                    yield locked
+                finally:
+                    if locked:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    def _thread_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.root, f".{key}.lock")
+
+    def staging_dir(self, key: str) -> str:
+        """
+        Fresh directory to download into; publish it with commit().
+        """
+        path = os.path.join(self.root, f".tmp-{key}-{uuid.uuid4().hex}")
+        os.makedirs(path)
+        return path
+
+    def commit(self, key: str, staging_dir: str) -> DownloadCacheEntry:
+        """
+        Publishes a staging directory as key's entry. Call evict(keep=key) once the entry is
+        linked into the job: until then nothing references it.
+        """
+        entry = self.entry(key)
+        if os.path.exists(entry.dir):
+            shutil.rmtree(entry.dir, ignore_errors=True)
+        os.replace(staging_dir, entry.dir)
+        return entry
+
+    @staticmethod
+    def link_into(entry: DownloadCacheEntry, video_dest: str) -> None:
+        """
+        Hardlinks the cached video to video_dest (copying if the filesystem can't link).
+        """
+        os.makedirs(os.path.dirname(video_dest), exist_ok=True)
+        if os.path.exists(video_dest):
+            os.remove(video_dest)
+        try:
+            os.link(entry.video_path, video_dest)
+        except OSError:
+            shutil.copy2(entry.video_path, video_dest)
+
+    def entries(self) -> List[DownloadCacheEntry]:
+        result = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            entry = self.entry(name)
+            if os.path.isdir(entry.dir):
+                result.append(entry)
+        return result
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Drops least recently used, unreferenced entries until total size fits max_bytes.
+        Entries whose key is locked (being downloaded or linked into a job) are skipped.
+        Args:
+            keep (Optional[str]): Key never to drop (the caller's, whose lock it holds).
+        Returns:
+            int: The number of entries removed.
+        """
+        entries = self.entries()
+        total = sum(e.size_bytes for e in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        def last_used(e: DownloadCacheEntry) -> float:
+            try:
+                return os.stat(e.dir).st_mtime
+            except FileNotFoundError:
+                return time.time()
+
+        removed = 0
+        for e in sorted(entries, key=last_used):
+            if total <= self.max_bytes:
+                break
+            if e.key == keep or e.ref_count > 0:
+                continue
+            with self._try_lock(e.key) as locked:
+                if not locked or e.ref_count > 0:
+                    continue
+                size = e.size_bytes
+                shutil.rmtree(e.dir, ignore_errors=True)
+            total -= size
+            removed += 1
+            print(f"Evicted cached download {e.key} ({size / 1024 ** 2:.1f} MiB)")
+        return removed
+
+
+_cache: Optional[DownloadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_download_cache() -> DownloadCache:
+    """
+    Returns the process-wide download cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DownloadCache()
+        return _cache
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import Dict, Optional
+
+from settings import TRANSCRIPT_CACHE_DIR
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def audio_content_hash(audio_path: str) -> str:
+    """
+    Fast content hash (BLAKE2b) of an extracted audio file. Extraction is bit-exact, so the
+    same source audio always hashes the same regardless of which job produced it.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(audio_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class TranscriptCache:
+    """
+    On-disk store of validated SRT transcripts, keyed by the audio content hash and everything
+    that shapes the ASR output (model, prompt version; not the chunking, which only moves
+    window boundaries, so sequential and streaming transcription share entries). Transcripts are small, so
+    entries are kept until the cache directory is cleared.
+    """
+    def __init__(self, root: str = TRANSCRIPT_CACHE_DIR) -> None:
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_hash: str, model: str, prompt_version: str, **options: object) -> str:
+        raw = json.dumps(
+            {"audio": audio_hash, "model": model, "prompt": prompt_version, "options": options},
+            sort_keys=True,
+        ).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.srt")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                srt_text = f.read()
+        except FileNotFoundError:
+            srt_text = None
+        with self._lock:
+            if srt_text:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return srt_text or None
+
+    def put(self, key: str, srt_text: str) -> None:
+        if not srt_text.strip():
+            return
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(srt_text)
+        os.replace(tmp, path)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[TranscriptCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """
+    Returns the process-wide transcript cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache()
+        return _cache
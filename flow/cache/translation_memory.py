@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from settings import (
+    TRANSLATION_MEMORY_MAX_ENTRIES,
+    TRANSLATION_MEMORY_PATH,
+    TRANSLATION_MEMORY_TTL_DAYS,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    source_hash TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    model TEXT NOT NULL,
+    source_text TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    use_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_hash, target_lang, model)
+);
+CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used_at);
+"""
+# Run eviction every N stored entries rather than on every write.
+_EVICT_EVERY = 500
+# SQLite's default limit on bound parameters per statement is 999.
+_LOOKUP_BATCH = 400
+
+
+def normalize_source_text(text: str) -> str:
+    """
+    Normalizes a cue's source text for lookup: NFC, collapsed whitespace per line, no blank lines.
+    Line breaks are kept because translations preserve them.
+    """
+    lines = [" ".join(ln.split()) for ln in unicodedata.normalize("NFC", text).split("\n")]
+    return "\n".join(ln for ln in lines if ln)
+
+
+def _hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Persistent per-cue translation memory keyed by (normalized source text, target language, model).
+    Entries expire after ttl_days without use; beyond max_entries the least recently used go first.
+    One connection per instance, serialized with a lock; WAL lets other processes read concurrently.
+    """
+    def __init__(
+        self,
+        path: str = TRANSLATION_MEMORY_PATH,
+        ttl_days: float = TRANSLATION_MEMORY_TTL_DAYS,
+        max_entries: int = TRANSLATION_MEMORY_MAX_ENTRIES,
+    ) -> None:
+        self.path = path
+        self.ttl_secs = ttl_days * 86400.0
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._stores_since_evict = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.evict()
+
+    def lookup_many(self, texts: Iterable[str], target_lang: str, model: str) -> Dict[str, str]:
+        """
+        Returns {normalized source text: translation} for every text found in memory.
+        """
+        wanted = {normalize_source_text(t) for t in texts}
+        wanted.discard("")
+        by_hash = {_hash(t): t for t in wanted}
+        found: Dict[str, str] = {}
+        now = time.time()
+        with self._lock:
+            hashes = list(by_hash)
+            for i in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = hashes[i:i + _LOOKUP_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT source_hash, translation FROM translations "
+                    f"WHERE target_lang = ? AND model = ? AND last_used_at >= ? "
+                    f"AND source_hash IN ({','.join('?' * len(batch))})",
+                    [target_lang, model, now - self.ttl_secs, *batch],
+                ).fetchall()
+                for source_hash, translation in rows:
+                    found[by_hash[source_hash]] = translation
+            if found:
+                self._conn.executemany(
+                    "UPDATE translations SET last_used_at = ?, use_count = use_count + 1 "
+                    "WHERE source_hash = ? AND target_lang = ? AND model = ?",
+                    [(now, _hash(t), target_lang, model) for t in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+    def store_many(self, pairs: Iterable[Tuple[str, str]], target_lang: str, model: str) -> None:
+        """
+        Stores (source text, translation) pairs.
+        """
+        now = time.time()
+        rows: List[Tuple] = []
+        for source, translation in pairs:
+            normalized = normalize_source_text(source)
+            if normalized and translation.strip():
+                rows.append((_hash(normalized), target_lang, model, normalized, translation, now, now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO translations (source_hash, target_lang, model, source_text, translation, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source_hash, target_lang, model) DO UPDATE SET "
+                "translation = excluded.translation, last_used_at = excluded.last_used_at",
+                rows,
+            )
+            self._conn.commit()
+            self._stores_since_evict += len(rows)
+            should_evict = self._stores_since_evict >= _EVICT_EVERY
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Deletes expired entries, then the least recently used ones above max_entries.
+        Returns the number of deleted rows.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM translations WHERE last_used_at < ?", (time.time() - self.ttl_secs,)
+            )
+            deleted = cur.rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()
+            if count > self.max_entries:
+                cur = self._conn.execute(
+                    "DELETE FROM translations WHERE rowid IN "
+                    "(SELECT rowid FROM translations ORDER BY last_used_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                deleted += cur.rowcount
+            self._conn.commit()
+            self._stores_since_evict = 0
+        return deleted
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_memory: Optional[TranslationMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> TranslationMemory:
+    """
+    Returns the process-wide translation memory.
+    """
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = TranslationMemory()
+        return _memory
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from settings import TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES
+
+# Bump when the cached payload format changes to invalidate old entries.
+CACHE_VERSION = 1
+
+
+def normalize_tts_text(text: str) -> str:
+    """
+    Normalizes cue text so trivially different renderings (line breaks, spacing,
+    Unicode composition) share one cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TTSFragmentCache:
+    """
+    Content-addressed, size-bounded on-disk cache for synthesized PCM fragments.
+    Entries live under root/<aa>/<sha256>.pcm; file mtime is the LRU clock (touched on hit).
+    Safe for concurrent use from threads; writes are atomic so concurrent processes
+    sharing the directory never observe partial fragments.
+    """
+    def __init__(self, root: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None  # lazily computed on first write
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        voice_id: str,
+        model_id: str,
+        text: str,
+        target_secs: Optional[float],
+    ) -> str:
+        """
+        Builds the cache key from everything that influences the synthesized audio.
+        target_secs is rounded to 0.1s since pacing hints finer than that don't change the output.
+        """
+        payload = {
+            "v": CACHE_VERSION,
+            "provider": provider,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "text": normalize_tts_text(text),
+            "target_secs": round(target_secs, 1) if target_secs else None,
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pcm")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)  # mark as recently used
+        except FileNotFoundError:
+            data = None
+        with self._lock:
+            if data:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return data or None
+
+    def put(self, key: str, data: bytes) -> None:
+        if not data:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, _, size in self._scan())
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        entries: List[Tuple[float, str, int]] = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".pcm"):
+                    continue
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, p, st.st_size))
+        return entries
+
+    def _evict_locked(self) -> None:
+        """
+        Removes least recently used entries until the cache is back under 90% of max_bytes.
+        """
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, p, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except FileNotFoundError:
+                total -= size
+        self._total_bytes = total
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[TTSFragmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSFragmentCache:
+    """
+    Returns the process-wide TTS fragment cache.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSFragmentCache()
+        return _cache
@@ -1,16 +1,39 @@
 import yt_dlp
-import uuid
+import json
 import os
+import shutil
+from typing import Any, Dict
 from .models import VideoInfo
+from .cache.download_cache import INFO_FILENAME, VIDEO_FILENAME, get_download_cache
+from .utils.metrics import TRANSFER_BYTES
 
-def download_video(video_url: str, downloaded_video_save_path: str, video_info_save_path: str) -> VideoInfo:
+YDL_FORMAT = 'bv*[height=720]+ba/b[height<=720]/b'
+YDL_FORMAT_SORT = ['res:720', 'fps:30', 'vcodec:h264']
+
+
+def _ydl_opts(outtmpl: str) -> Dict[str, Any]:
+    return {
+        'format': YDL_FORMAT,
+        'format_sort': YDL_FORMAT_SORT,
+        'merge_output_format': 'mkv',
+        'outtmpl': outtmpl,
+        'noplaylist': True,
+        'prefer_ffmpeg': True,
+    }
+
+
+def download_video(video_url: str, downloaded_video_save_path: str, video_info_save_path: str, use_cache: bool = True) -> VideoInfo:
     """
     Downloads a video from the given URL and saves it to the specified path as an MKV file.
     Also saves the video info as JSON using the VideoInfo.to_dict method.
+    With use_cache, the video is fetched once per canonical video id (and format selector)
+    into the shared download cache and hardlinked into the job directory; later jobs for the
+    same video skip the download entirely.
     Args:
         video_url (str): The URL of the video to download.
         downloaded_video_save_path (str): The path where the downloaded video will be saved.
         video_info_save_path (str): The path where the video info JSON will be saved.
+        use_cache (bool): Reuse/populate the shared download cache.
     Returns:
         VideoInfo: Metadata and info about the downloaded video.
     Raises:
@@ -22,27 +45,67 @@ def download_video(video_url: str, downloaded_video_save_path: str, video_info_s
     save_dir = os.path.dirname(downloaded_video_save_path)
     print(f"Ensuring save directory exists: {save_dir}")
     os.makedirs(save_dir, exist_ok=True)
-    print(f"Downloading video from URL: {video_url}")
-    ydl_opts = {
-        'format': 'bv*[height=720]+ba/b[height<=720]/b',
-        'format_sort': ['res:720', 'fps:30', 'vcodec:h264'],
-        'merge_output_format': 'mkv',
-        'outtmpl': downloaded_video_save_path,
-        'noplaylist': True,
-        'prefer_ffmpeg': True,
-    }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(video_url, download=True)
-    if info_dict is None:
-        print(f"Failed to download or extract video info for: {video_url}")
-        raise ValueError("Failed to download or extract video info.")
-    print(f"Video downloaded and info extracted. Saving path: {downloaded_video_save_path}")
-    info_dict['downloaded_file'] = downloaded_video_save_path
-    video_info = VideoInfo.from_dict(info_dict)
+
+    if use_cache:
+        video_info = _download_via_cache(video_url, downloaded_video_save_path)
+    else:
+        print(f"Downloading video from URL: {video_url}")
+        with yt_dlp.YoutubeDL(_ydl_opts(downloaded_video_save_path)) as ydl:
+            info_dict = ydl.extract_info(video_url, download=True)
+        if info_dict is None:
+            print(f"Failed to download or extract video info for: {video_url}")
+            raise ValueError("Failed to download or extract video info.")
+        print(f"Video downloaded and info extracted. Saving path: {downloaded_video_save_path}")
+        TRANSFER_BYTES.labels(direction="download", kind="video").inc(os.path.getsize(downloaded_video_save_path))
+        info_dict['downloaded_file'] = downloaded_video_save_path
+        video_info = VideoInfo.from_dict(info_dict)
+
     # Save video info as JSON
-    import json
     with open(video_info_save_path, "w", encoding="utf-8") as f:
         json.dump(video_info.to_dict(), f, ensure_ascii=False, indent=2)
     print(f"Video info saved to: {video_info_save_path}")
     print(f"Returning VideoInfo object.")
     return video_info
+
+
+def _download_via_cache(video_url: str, downloaded_video_save_path: str) -> VideoInfo:
+    """
+    Resolves the canonical video id without downloading, then links the cached copy into
+    downloaded_video_save_path, downloading it into the cache first on a miss.
+    """
+    cache = get_download_cache()
+    print(f"Resolving video id for URL: {video_url}")
+    with yt_dlp.YoutubeDL(_ydl_opts(downloaded_video_save_path)) as ydl:
+        info_dict = ydl.extract_info(video_url, download=False)
+    if info_dict is None or not info_dict.get('id'):
+        print(f"Failed to extract video info for: {video_url}")
+        raise ValueError("Failed to download or extract video info.")
+    extractor = info_dict.get('extractor_key') or info_dict.get('extractor') or 'generic'
+    key = cache.make_key(extractor, info_dict['id'], f"{YDL_FORMAT}|{','.join(YDL_FORMAT_SORT)}")
+
+    with cache.lock(key):
+        entry = cache.lookup(key)
+        if entry is not None:
+            print(f"Download cache hit for {key}")
+        else:
+            print(f"Downloading video from URL: {video_url}")
+            staging = cache.staging_dir(key)
+            try:
+                with yt_dlp.YoutubeDL(_ydl_opts(os.path.join(staging, VIDEO_FILENAME))) as ydl:
+                    downloaded = ydl.process_ie_result(info_dict, download=True)
+                cached_info = VideoInfo.from_dict(downloaded or info_dict)
+                with open(os.path.join(staging, INFO_FILENAME), "w", encoding="utf-8") as f:
+                    json.dump(cached_info.to_dict(), f, ensure_ascii=False, indent=2)
+                entry = cache.commit(key, staging)
+                TRANSFER_BYTES.labels(direction="download", kind="video").inc(entry.size_bytes)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        cache.link_into(entry, downloaded_video_save_path)
+        cache.evict(keep=key)  # only now: the new entry is unreferenced until linked
+        with open(entry.info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+
+    print(f"Video available at: {downloaded_video_save_path} (cache entry {key}, {entry.ref_count} job reference(s))")
+    info['downloaded_file'] = downloaded_video_save_path
+    return VideoInfo.from_dict(info)
@@ -1,7 +1,16 @@
+import hashlib
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
 from dotenv import load_dotenv
 from google import genai
-from .utils.srt_utils import clean_srt_text, parse_srt
+from .utils.srt_utils import SRTCue, clean_srt_text, format_srt, offset_cues, parse_srt, renumber_cues, repair_srt, tidy_cues
+from .utils.retry import GEMINI_RETRY_POLICY, call_with_retry
+from .utils.audio_chunks import AudioChunk, cut_audio_chunk, detect_silences, plan_chunks
+from .cache.transcript_cache import TranscriptCache, audio_content_hash, get_transcript_cache
+from .utils.metrics import TRANSFER_BYTES
+from settings import CC_CHUNK_MINUTES, CC_MAX_WORKERS, STREAM_CC_CHUNK_MINUTES
 load_dotenv()
 client = genai.Client()
 
@@ -17,65 +26,241 @@ FIX_SRT_TIMESTAMP = (
     "In the following SRT file, please fix the timestamps to adhere exactly to the `HH:MM:SS,mmm --> HH:MM:SS,mmm` format. Preserve all the text, cues numbers and timestamps' timing as is, adjust only the formatting where needed. Output the entire updated SRT file drop-in replacement. SRT to fix timestamps formatting:\n```srt\n{srt_text}\n````\n"
 )
 FIXING_RETRIES = 5
+CC_MODEL = "gemini-2.5-flash"
+# Changes whenever the transcription prompts change, invalidating cached transcripts.
+CC_PROMPT_VERSION = hashlib.sha256((CREATE_CC_SRT + FIX_SRT_TIMESTAMP).encode("utf-8")).hexdigest()[:16]
 
-def generate_cc(audio_path: str, srt_save_path: str) -> None:
+def transcript_cache_key(audio_path: str) -> str:
+    """
+    Transcript cache key shared by generate_cc and stream_cc: chunking only moves the window
+    boundaries, so a transcript of the same audio, model and prompts is reused by both modes.
+    """
+    return TranscriptCache.make_key(audio_content_hash(audio_path), CC_MODEL, CC_PROMPT_VERSION)
+
+def generate_cc(
+    audio_path: str,
+    srt_save_path: str,
+    chunk_minutes: Optional[float] = CC_CHUNK_MINUTES,
+    max_workers: int = CC_MAX_WORKERS,
+    use_cache: bool = True,
+) -> None:
     """
     Generates closed captions (CC) in SRT format for the given audio file and saves them to the specified path.
+    Audio longer than ~chunk_minutes is split at silence boundaries into windows that are
+    transcribed concurrently (at most max_workers at a time), then offset and renumbered into
+    one SRT. Pass chunk_minutes=None to always transcribe in a single request.
+    With use_cache, a transcript previously produced for identical audio (same content hash,
+    model and prompts, whatever the chunking, also by stream_cc) is reused without uploading
+    or transcribing anything.
     Args:
         audio_path (str): Path to the audio file to process.
         srt_save_path (str): Path where the generated SRT file will be saved.
+        chunk_minutes (Optional[float]): Target window length for chunked transcription.
+        max_workers (int): Max concurrent chunk transcriptions.
+        use_cache (bool): Reuse/populate the transcript cache.
     Returns:
         None
     """
+    cache = get_transcript_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = transcript_cache_key(audio_path)
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"Transcript cache hit for {audio_path}")
+            print(f"Saving generated CC to: {srt_save_path}")
+            with open(srt_save_path, "w", encoding="utf-8") as f:
+                f.write(cached)
+            print("CC generation complete.")
+            return
+
+    chunks: List[AudioChunk] = []
+    if chunk_minutes:
+        duration, silences = detect_silences(audio_path)
+        chunks = plan_chunks(duration, silences, chunk_secs=chunk_minutes * 60.0)
+
+    if len(chunks) <= 1:
+        original_transcription = _transcribe_audio_file(audio_path)
+    else:
+        original_transcription = _transcribe_in_chunks(audio_path, chunks, srt_save_path, max_workers)
+
+    if cache is not None and cache_key is not None and original_transcription:
+        cache.put(cache_key, original_transcription)
+
+    print(f"Saving generated CC to: {srt_save_path}")
+    with open(srt_save_path, "w", encoding="utf-8") as f:
+        f.write(original_transcription if original_transcription is not None else "")
+    print("CC generation complete.")
+
+
+def _transcribe_audio_file(audio_path: str) -> Optional[str]:
+    """
+    Uploads one audio file to Gemini and returns its validated SRT transcription.
+    """
     print(f"Uploading audio file for Gemini transcription: {audio_path}")
-    uploaded_audio = client.files.upload(file=audio_path)
+    uploaded_audio = call_with_retry(
+        lambda: client.files.upload(file=audio_path),
+        GEMINI_RETRY_POLICY,
+        description="Audio upload",
+    )
+    TRANSFER_BYTES.labels(direction="upload", kind="asr_audio").inc(os.path.getsize(audio_path))
     print("Requesting CC generation from Gemini model...")
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[CREATE_CC_SRT, uploaded_audio],
+    response = call_with_retry(
+        lambda: client.models.generate_content(
+            model=CC_MODEL,
+            contents=[CREATE_CC_SRT, uploaded_audio],
+        ),
+        GEMINI_RETRY_POLICY,
+        description="CC generation",
     )
-    if response.text:
-        print("CC generation response received.")
-        original_transcription = clean_srt_text(response.text)
-        original_transcription = validate_and_fix_srt(original_transcription)
-        
+    if not response.text:
+        return None
+    print("CC generation response received.")
+    return validate_and_fix_srt(clean_srt_text(response.text))
+
+
+def _transcribe_chunk(audio_path: str, chunk: AudioChunk, chunks_dir: str) -> List[SRTCue]:
+    """
+    Cuts one planned chunk out of the audio, transcribes it and shifts its cues onto the
+    full timeline (numbering is left chunk-local).
+    """
+    ext = os.path.splitext(audio_path)[1] or ".flac"
+    chunk_path = cut_audio_chunk(audio_path, chunk, os.path.join(chunks_dir, f"chunk_{chunk.index:03d}{ext}"))
+    srt_text = _transcribe_audio_file(chunk_path)
+    cues = parse_srt(srt_text) if srt_text else []
+    print(f"Chunk {chunk.index} [{chunk.start:.1f}–{chunk.end:.1f}s]: {len(cues)} cues")
+    # Timestamps are chunk-relative; clamp drift past the chunk end before shifting.
+    for c in cues:
+        c.end = min(c.end, chunk.duration)
+        c.start = min(c.start, c.end)
+    return offset_cues(cues, chunk.start)
+
+
+def _transcribe_in_chunks(audio_path: str, chunks: List[AudioChunk], srt_save_path: str, max_workers: int) -> str:
+    """
+    Cuts the audio into the planned chunks, transcribes them concurrently and stitches the
+    cues back onto the full timeline.
+    """
+    chunks_dir = os.path.join(os.path.dirname(srt_save_path), "cc_chunks")
+    os.makedirs(chunks_dir, exist_ok=True)
+    print(f"Transcribing {len(chunks)} chunks of ~{chunks[0].duration / 60:.1f} min with up to {max_workers} concurrent requests...")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="cc") as pool:
+        per_chunk = list(pool.map(lambda chunk: _transcribe_chunk(audio_path, chunk, chunks_dir), chunks))
+
+    shutil.rmtree(chunks_dir, ignore_errors=True)
+    merged = renumber_cues([c for cues in per_chunk for c in cues])
+    if not merged:
+        raise RuntimeError("Chunked transcription produced no cues.")
+    return format_srt(merged)
+
+
+def stream_cc(
+    audio_path: str,
+    srt_save_path: str,
+    chunk_minutes: float = STREAM_CC_CHUNK_MINUTES,
+    max_workers: int = CC_MAX_WORKERS,
+    use_cache: bool = True,
+) -> Iterator[List[SRTCue]]:
+    """
+    Streaming variant of generate_cc: yields the cues of each audio chunk, in timeline order
+    and numbered continuously, as soon as that chunk (and every chunk before it) has been
+    transcribed, so downstream stages can start on the beginning of the video while the rest
+    is still being transcribed. All chunks are submitted up front (at most max_workers run at
+    once). The complete SRT is written to srt_save_path (and the transcript cache) once the
+    stream is exhausted; a cache hit yields every cue at once.
+    Args:
+        audio_path (str): Path to the audio file to process.
+        srt_save_path (str): Path where the generated SRT file will be saved.
+        chunk_minutes (float): Target chunk length; shorter chunks mean an earlier first batch.
+        max_workers (int): Max concurrent chunk transcriptions.
+        use_cache (bool): Reuse/populate the transcript cache.
+    Yields:
+        List[SRTCue]: The next chunk's cues.
+    """
+    cache = get_transcript_cache() if use_cache else None
+    cache_key = None
+    if cache is not None:
+        cache_key = transcript_cache_key(audio_path)
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"Transcript cache hit for {audio_path}")
+            with open(srt_save_path, "w", encoding="utf-8") as f:
+                f.write(cached)
+            yield parse_srt(cached)
+            return
+
+    duration, silences = detect_silences(audio_path)
+    chunks = plan_chunks(duration, silences, chunk_secs=chunk_minutes * 60.0)
+    chunks_dir = os.path.join(os.path.dirname(srt_save_path), "cc_chunks")
+    os.makedirs(chunks_dir, exist_ok=True)
+    print(f"Streaming transcription of {len(chunks)} chunk(s) with up to {max_workers} concurrent requests...")
+
+    transcribed: List[SRTCue] = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="cc") as pool:
+        futures = [pool.submit(_transcribe_chunk, audio_path, chunk, chunks_dir) for chunk in chunks]
+        try:
+            for fut in futures:
+                cues = fut.result()
+                for c in cues:
+                    c.index = len(transcribed) + 1
+                    transcribed.append(c)
+                if cues:
+                    yield cues
+        finally:
+            # Stop paying for chunks nobody will consume (error or abandoned generator).
+            for fut in futures:
+                fut.cancel()
+
+    shutil.rmtree(chunks_dir, ignore_errors=True)
+    if not transcribed:
+        raise RuntimeError("Streaming transcription produced no cues.")
+    srt_text = format_srt(transcribed)
+    if cache is not None and cache_key is not None:
+        cache.put(cache_key, srt_text)
     print(f"Saving generated CC to: {srt_save_path}")
     with open(srt_save_path, "w", encoding="utf-8") as f:
-        f.write(original_transcription if original_transcription is not None else "")
+        f.write(srt_text)
     print("CC generation complete.")
 
 
 def validate_and_fix_srt(srt_text: str) -> str:
     """
-    Prompts Gemini to fix SRT timestamps in the provided text.
+    Validates SRT text and repairs it, returning normalized SRT.
+    Common model mistakes (markdown fences, missing hours or indices, odd separators, short
+    milliseconds, swapped or overlapping ranges) are fixed locally by srt_utils.repair_srt.
+    Only blocks that still cannot be parsed are sent to Gemini for a timestamp fix, up to
+    FIXING_RETRIES times; provider errors are retried per GEMINI_RETRY_POLICY.
     Args:
-        srt_text (str): The SRT text to fix.   
+        srt_text (str): The SRT text to fix.
     Returns:
         str: The SRT text with fixed timestamps.
     """
     print("Validating SRT timestamps...")
+    cues, bad_blocks = repair_srt(srt_text)
     attempts = 0
-    while attempts < FIXING_RETRIES:
-        try:
-            srt_cues_list = parse_srt(srt_text)
-            if srt_cues_list:
-                return srt_text
-        except Exception as e:
-            print(f"Error parsing SRT: {e}, trying to fix with Gemini...")
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                FIX_SRT_TIMESTAMP.format(srt_text=srt_text),
-            ],
+    while bad_blocks and attempts < FIXING_RETRIES:
+        print(f"{len(bad_blocks)} SRT block(s) unparseable after local repair, trying to fix with Gemini...")
+        bad_srt = "\n\n".join(bad_blocks)
+        response = call_with_retry(
+            lambda: client.models.generate_content(
+                model=CC_MODEL,
+                contents=[
+                    FIX_SRT_TIMESTAMP.format(srt_text=bad_srt),
+                ],
+            ),
+            GEMINI_RETRY_POLICY,
+            description="SRT timestamp fix",
         )
-        fixed_srt_text = response.text 
-        if fixed_srt_text:
-            try:
-                srt_cues_list = parse_srt(fixed_srt_text)
-                if srt_cues_list:
-                    return fixed_srt_text
-            except Exception as e:
-                print(f"Error parsing SRT after Gemini fix: {e}")
+        if response.text:
+            fixed_cues, still_bad = repair_srt(response.text)
+            if fixed_cues and not still_bad:
+                cues.extend(fixed_cues)
+                bad_blocks = []
+                break
+            print(f"Gemini fix left {len(still_bad)} block(s) unparseable.")
         attempts += 1
         print(f"Retrying SRT timestamp fix ({attempts}/{FIXING_RETRIES})...")
-    raise RuntimeError("Failed to fix SRT timestamps after multiple attempts.")
+    if bad_blocks or not cues:
+        raise RuntimeError("Failed to fix SRT timestamps after multiple attempts.")
+    return format_srt(tidy_cues(cues))
@@ -1,4 +1,33 @@
-from moviepy import VideoFileClip, AudioFileClip, CompositeAudioClip
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import ffmpeg  # pip install ffmpeg-python
+
+from .utils.metrics import FFMPEG_DURATION, timed
+
+# Video codecs each output container can carry as-is (stream copy).
+# Anything else is re-encoded with the container's fallback encoder.
+_COPYABLE_VIDEO_CODECS = {
+    ".mp4": {"h264", "hevc", "av1", "vp9", "mpeg4"},
+    ".mov": {"h264", "hevc", "mpeg4", "prores"},
+    ".mkv": None,  # Matroska takes any codec
+    ".webm": {"vp8", "vp9", "av1"},
+}
+_FALLBACK_VIDEO_CODEC = {".mp4": "libx264", ".mov": "libx264", ".mkv": "libx264", ".webm": "libvpx-vp9"}
+_AUDIO_CODEC = {".mp4": "aac", ".mov": "aac", ".mkv": "aac", ".webm": "libopus"}
+
+
+def _probe_streams(path: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Returns the first video and audio stream descriptors of a media file (None if absent).
+    """
+    probe = ffmpeg.probe(path)
+    streams = probe.get("streams", [])
+    return {
+        "video": next((s for s in streams if s.get("codec_type") == "video"), None),
+        "audio": next((s for s in streams if s.get("codec_type") == "audio"), None),
+    }
+
 
 def merge_video_audio(
     original_video_path: str,
@@ -13,14 +42,17 @@ def merge_video_audio(
     Args:
         original_video_path: Path to the original video file (with its original audio).
         generated_narration_path: Path to the generated narration audio file.
-        final_video_save_path: Path where the merged video will be saved.
+        final_video_save_path: Path where the merged video will be saved. Its extension
+            (.mp4, .mkv, .mov or .webm) selects the output container.
         original_audio_volume_percentage: Linear gain for the original audio, in [0.0 .. 1.0].
             - 0.0 = mute original (full replace by narration)
             - 1.0 = keep original at its native loudness
             - e.g. 0.2 = keep 20% of original loudness (“TV-style ducking”)
 
     Behavior:
-        - Uses MoviePy v2 APIs: `with_volume_scaled`, `CompositeAudioClip`, `with_audio`.
+        - Runs a single ffmpeg pass: the video stream is copied as-is (no decode/re-encode) when
+          the container supports its codec, and the audio is mixed in one filter graph
+          (`volume` on the original + `amix` with the narration), then encoded once.
         - If original_audio_volume_percentage <= 0 or original audio is missing, narration replaces it.
     """
     # Clamp to [0, 1] and warn if out of range.
@@ -31,33 +63,88 @@ def merge_video_audio(
         )
         original_audio_volume_percentage = max(0.0, min(1.0, original_audio_volume_percentage))
 
+    ext = os.path.splitext(final_video_save_path)[1].lower()
+    if ext not in _COPYABLE_VIDEO_CODECS:
+        raise ValueError(f"Unsupported output container {ext!r} for {final_video_save_path}")
+
     print(f"Merging (ducked original {original_audio_volume_percentage*100:.0f}%): {original_video_path} + VO {generated_narration_path}")
 
-    # Load video and its original audio (if any)
-    video_clip = VideoFileClip(original_video_path)
-    base_audio = video_clip.audio
+    streams = _probe_streams(original_video_path)
+    if streams["video"] is None:
+        raise ValueError(f"No video stream found in {original_video_path}")
+    video_codec = streams["video"].get("codec_name")
+    copyable = _COPYABLE_VIDEO_CODECS[ext]
+    vcodec = "copy" if copyable is None or video_codec in copyable else _FALLBACK_VIDEO_CODEC[ext]
+    if vcodec != "copy":
+        print(f"  - {video_codec} cannot be stream-copied into {ext}; re-encoding with {vcodec}")
 
-    # Load the generated narration at its native loudness
-    narration_audio = AudioFileClip(generated_narration_path)
+    video_in = ffmpeg.input(original_video_path)
+    narration_in = ffmpeg.input(generated_narration_path)
 
     # Build the final mixed track
-    if base_audio is not None and original_audio_volume_percentage > 0.0:
-        ducked = base_audio.with_volume_scaled(original_audio_volume_percentage)
-        mixed_audio = CompositeAudioClip([ducked, narration_audio])
+    if streams["audio"] is not None and original_audio_volume_percentage > 0.0:
+        ducked = video_in.audio.filter("volume", original_audio_volume_percentage)
+        # normalize=0 sums the inputs (same loudness as before); duration follows the original track.
+        mixed_audio = ffmpeg.filter([ducked, narration_in.audio], "amix", inputs=2, duration="first", dropout_transition=0, normalize=0)
     else:
         # Replace original audio entirely
-        mixed_audio = narration_audio
+        mixed_audio = narration_in.audio
 
-    # Attach mixed audio back to the video and write file
-    out_clip = video_clip.with_audio(mixed_audio)
-    print(f"Saving final video to: {final_video_save_path}")
-    out_clip.write_videofile(final_video_save_path)
+    output_kwargs: Dict[str, Any] = {"vcodec": vcodec, "acodec": _AUDIO_CODEC[ext], "audio_bitrate": "192k"}
+    if ext in (".mp4", ".mov"):
+        output_kwargs["movflags"] = "+faststart"
 
-    # Cleanup
-    for clip in (narration_audio, mixed_audio, video_clip, out_clip):
-        try:
-            clip.close()
-        except Exception:
-            pass
+    print(f"Saving final video to: {final_video_save_path}")
+    out = ffmpeg.output(video_in.video, mixed_audio, final_video_save_path, **output_kwargs).overwrite_output()
+    try:
+        with timed(FFMPEG_DURATION, operation="merge"):
+            out.run(quiet=True)
+    except ffmpeg.Error as e:
+        stderr = (e.stderr or b"").decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg merge failed: {stderr[-2000:]}") from e
 
     print("Merge complete.")
+
+
+def merge_audio_tracks(
+    original_video_path: str,
+    branch_videos: List[Tuple[str, str, str]],
+    multitrack_video_save_path: str,
+) -> None:
+    """
+    Mux the original video with the (already mixed) audio track of each branch video into a
+    single multi-audio-track file. Everything is stream-copied; nothing is re-encoded.
+
+    Args:
+        original_video_path: Path to the original video file (video stream source).
+        branch_videos: (final_video_path, language_code, title) per audio track, in track order.
+            language_code is tagged on the track (e.g. "pl" or "pl-PL"), title is its display name.
+        multitrack_video_save_path: Output path; .mkv (any codec) or .mp4/.mov.
+    """
+    if not branch_videos:
+        raise ValueError("No branch videos to mux.")
+    ext = os.path.splitext(multitrack_video_save_path)[1].lower()
+    if ext not in _COPYABLE_VIDEO_CODECS:
+        raise ValueError(f"Unsupported output container {ext!r} for {multitrack_video_save_path}")
+
+    print(f"Muxing {len(branch_videos)} audio track(s) into: {multitrack_video_save_path}")
+    streams = [ffmpeg.input(original_video_path).video]
+    output_kwargs: Dict[str, Any] = {"c": "copy"}
+    for i, (path, language_code, title) in enumerate(branch_videos):
+        streams.append(ffmpeg.input(path).audio)
+        # Primary subtag only: muxers expect ISO 639 codes (ffmpeg maps 639-1 to 639-2).
+        output_kwargs[f"metadata:s:a:{i}"] = f"language={language_code.split('-')[0].lower()}"
+        # Same stream by absolute index (video is 0): kwargs keys must be unique per option.
+        output_kwargs[f"metadata:s:{i + 1}"] = f"title={title}"
+        output_kwargs[f"disposition:a:{i}"] = "default" if i == 0 else "0"
+    if ext in (".mp4", ".mov"):
+        output_kwargs["movflags"] = "+faststart"
+
+    out = ffmpeg.output(*streams, multitrack_video_save_path, **output_kwargs).overwrite_output()
+    try:
+        with timed(FFMPEG_DURATION, operation="multitrack_mux"):
+            out.run(quiet=True)
+    except ffmpeg.Error as e:
+        stderr = (e.stderr or b"").decode("utf-8", errors="replace")
+        raise RuntimeError(f"ffmpeg multitrack mux failed: {stderr[-2000:]}") from e
+    print("Multitrack mux complete.")
@@ -14,6 +14,7 @@ class VideoInfo:
     comment_count: Optional[int] = None
     webpage_url: Optional[str] = None
     downloaded_file: Optional[str] = None
+    thumbnail: Optional[str] = None  # URL of the video's thumbnail image
 
     @classmethod
     def from_dict(cls, info: Dict) -> 'VideoInfo':
@@ -29,6 +30,7 @@ class VideoInfo:
             comment_count=info.get('comment_count'),
             webpage_url=info.get('webpage_url'),
             downloaded_file=info.get('downloaded_file'),
+            thumbnail=info.get('thumbnail'),
         )
 
     def to_dict(self) -> Dict:
@@ -47,4 +49,5 @@ class VideoInfo:
             'comment_count': self.comment_count,
             'webpage_url': self.webpage_url,
             'downloaded_file': self.downloaded_file,
+            'thumbnail': self.thumbnail,
         }
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, Optional
 import os
 import uuid
 from settings import STORAGE_DIR
@@ -14,6 +14,9 @@ class VideoProcessingPaths:
     base_dir: str
     request_id: Optional[str] = None
     create: bool = True
+    # Fan-out branch key (e.g. "pl-pl-daniel"); suffixes the per-branch artifacts
+    # (translation, narration, final video) while shared artifacts stay common.
+    variant: Optional[str] = None
 
     def __post_init__(self):
         """
@@ -32,17 +35,34 @@ class VideoProcessingPaths:
         assert self.request_id is not None
         return os.path.join(self.base_dir, self.request_id, filename)
 
+    def _variant_path(self, filename: str) -> str:
+        """
+        Like _path, but inserts the branch variant before the extension when set.
+        """
+        if not self.variant:
+            return self._path(filename)
+        stem, ext = os.path.splitext(filename)
+        return self._path(f"{stem}.{self.variant}{ext}")
+
+    def for_branch(self, variant: str) -> "VideoProcessingPaths":
+        """
+        Paths for one fan-out branch of the same request (shares download/audio/CC artifacts).
+        """
+        return VideoProcessingPaths(base_dir=self.base_dir, request_id=self.request_id, create=False, variant=variant)
+
     @property
     def downloaded_video_path(self):
         return self._path("original.mkv")
 
     @property
     def video_no_audio_path(self):
+        # Produced lazily (stream copy) via flow.separate.extract_video_stream.
         return self._path("video_noaudio.mkv")
 
     @property
     def audio_no_video_path(self):
-        return self._path("audio.wav")
+        # 16 kHz mono FLAC, ready for ASR upload.
+        return self._path("audio.flac")
 
     @property
     def generated_cc_path(self):
@@ -51,15 +71,37 @@ class VideoProcessingPaths:
     @property
     def translated_cc_path(self):
         # Now an SRT, not a TXT, so we can preserve cue timings end-to-end.
-        return self._path("translated_text.srt")
+        return self._variant_path("translated_text.srt")
 
     @property
     def generated_narration_path(self):
-        return self._path("new_audio.wav")
+        return self._variant_path("new_audio.wav")
 
     @property
     def final_video_path(self):
-        return self._path("final_video.webm")
+        # The extension selects the merge container; MP4 lets the source H.264 be stream-copied.
+        return self._variant_path("final_video.mp4")
+
+    @property
+    def manifest_path(self):
+        """
+        Returns the path to the job's stage checkpoint manifest (shared by all branches).
+        """
+        return self._path("manifest.json")
+
+    @property
+    def narration_cues_dir(self):
+        """
+        Returns the directory holding per-cue narration checkpoints while narration is in progress.
+        """
+        return self._path(f"narration_cues.{self.variant}" if self.variant else "narration_cues")
+
+    @property
+    def multitrack_video_path(self):
+        """
+        Returns the path to the fan-out output carrying one audio track per branch.
+        """
+        return self._path("final_video_multitrack.mkv")
 
     @property
     def video_info_path(self):
@@ -67,3 +109,19 @@ class VideoProcessingPaths:
         Returns the path to the video info JSON file.
         """
         return self._path("info.json")
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Flattened absolute paths (plus request_id), as reported in job results.
+        """
+        return {
+            "downloaded_video_path": self.downloaded_video_path,
+            "video_no_audio_path": self.video_no_audio_path,
+            "audio_no_video_path": self.audio_no_video_path,
+            "generated_cc_path": self.generated_cc_path,
+            "translated_cc_path": self.translated_cc_path,
+            "generated_narration_path": self.generated_narration_path,
+            "final_video_path": self.final_video_path,
+            "video_info_path": self.video_info_path,
+            "request_id": self.request_id or "",
+        }
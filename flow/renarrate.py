@@ -1,19 +1,23 @@
+import hashlib
 import os
-import math
+import shutil
+import threading
 from dotenv import load_dotenv
 from google import genai
 import wave
-from typing import List, Optional
-import ffmpeg  # pip install ffmpeg-python
-from moviepy import AudioFileClip, CompositeAudioClip
-import time
-from flow.utils.srt_utils import parse_srt
-from flow.tts.gemini_tts import tts_bytes_for_text as gemini_tts_bytes_for_text
-from flow.tts.elevenlabs_tts import tts_bytes_for_text as elevenlabs_tts_bytes_for_text
+from typing import Callable, Iterable, List, Optional
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from flow.utils.srt_utils import parse_srt, SRTCue
+from flow.utils.rate_limit import get_provider_limiter
+from flow.utils.retry import TTS_RETRY_POLICY, call_with_retry
+from flow.utils.timeline import NarrationTimeline, pcm_duration_secs, pcm_to_array
+from flow.utils.time_stretch import ffmpeg_time_stretch, wsola_time_stretch
+from flow.tts.gemini_tts import tts_bytes_for_text as gemini_tts_bytes_for_text, MODEL_ID as GEMINI_TTS_MODEL_ID
+from flow.tts.elevenlabs_tts import tts_bytes_for_text as elevenlabs_tts_bytes_for_text, MODEL_ID as ELEVENLABS_TTS_MODEL_ID
+from flow.cache.tts_cache import TTSFragmentCache, get_tts_cache
 from flow.models.voices import GeminiVoice, Voice, ElevenLabsVoice
-
-RETRIES = 10
-RETRY_DELAY_S = 30
+from settings import DEBUG_TTS_FRAGMENTS, TIME_STRETCH_ENGINE, TIME_STRETCH_QUALITY
 
 
 def wave_file(
@@ -33,53 +37,264 @@ def wave_file(
         wf.writeframes(pcm)
 
 
-def _decompose_atempo_factor(f: float) -> List[float]:
+def _time_stretch_samples(
+    samples: np.ndarray,
+    target_secs: float,
+    sample_rate: int = 24000,
+    engine: str = TIME_STRETCH_ENGINE,
+) -> np.ndarray:
     """
-    Decompose a tempo factor into a product of factors inside [0.5, 2.0] so we can
-    chain 'atempo' filters when necessary.
+    Pitch-preserving time-stretch of int16 PCM to target_secs with the configured engine:
+    "wsola" runs in-process on the NumPy array, "ffmpeg" pipes through 'atempo'.
     """
-    if f <= 0 or math.isinf(f) or math.isnan(f):
-        raise ValueError(f"Invalid atempo factor: {f}")
+    if engine == "wsola":
+        return wsola_time_stretch(samples, int(round(target_secs * sample_rate)), sample_rate, TIME_STRETCH_QUALITY)
+    if engine == "ffmpeg":
+        return ffmpeg_time_stretch(samples, target_secs, sample_rate=sample_rate)
+    raise ValueError(f"Unknown time-stretch engine: {engine!r}")
+
 
-    factors: List[float] = []
-    while f > 2.0:
-        factors.append(2.0)
-        f /= 2.0
-    while f < 0.5:
-        factors.append(0.5)
-        f /= 0.5  # equivalent to f *= 2
-    if not (0.98 <= f <= 1.02):
-        factors.append(f)
-    return factors
+def _synthesize_cue_bytes(
+    text_for_tts: str,
+    voice: Voice,
+    target_secs: Optional[float],
+    cue_index: int,
+    cache: Optional[TTSFragmentCache] = None,
+) -> bytes:
+    """
+    Call the voice's TTS provider for one cue, throttled by the provider's shared limiter.
+    Rate-limited and transient failures are retried with backoff (honoring Retry-After);
+    permanent errors (bad request, auth) fail immediately.
+    If a fragment cache is given, it is consulted first and filled on success.
+    """
+    if isinstance(voice, GeminiVoice):
+        tts_bytes_for_text, model_id = gemini_tts_bytes_for_text, GEMINI_TTS_MODEL_ID
+    elif isinstance(voice, ElevenLabsVoice):
+        tts_bytes_for_text, model_id = elevenlabs_tts_bytes_for_text, ELEVENLABS_TTS_MODEL_ID
+    else:
+        raise ValueError(f"Unsupported voice provider: {voice.provider}")
 
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(voice.provider, voice.id, model_id, text_for_tts, target_secs)
+        cached = cache.get(cache_key)
+        if cached:
+            print(f"TTS cache hit for cue {cue_index}")
+            return cached
 
-def _time_stretch_wav_to_duration(
-    in_path: str, out_path: str, target_secs: float, sample_rate: int = 24000
-) -> None:
+    limiter = get_provider_limiter(voice.provider)
+
+    def _attempt() -> bytes:
+        with limiter:
+            return tts_bytes_for_text(text_for_tts, voice, target_secs)
+
+    pcm_bytes = call_with_retry(_attempt, TTS_RETRY_POLICY, description=f"TTS for cue {cue_index}")
+    if cache is not None and cache_key is not None:
+        try:
+            cache.put(cache_key, pcm_bytes)
+        except OSError as e:
+            print(f"  ! Failed to cache TTS fragment for cue {cue_index}: {e}")
+    return pcm_bytes
+
+
+def _render_cue_samples(
+    cue: SRTCue,
+    voice: Voice,
+    audio_fps: int,
+    max_pct_deviation: float,
+    min_abs_deviation: float,
+    cache: Optional[TTSFragmentCache] = None,
+    fragments_dir: Optional[str] = None,
+) -> Optional[np.ndarray]:
     """
-    Pitch-preserving time-stretch to a specific duration using FFmpeg 'atempo'.
+    Synthesize one cue into int16 samples, compressing them to the cue window when overlong.
+    Returns None for cues without speakable text. If fragments_dir is set (debug mode),
+    the final fragment is also written there as a WAV.
     """
-    if target_secs <= 0:
-        raise ValueError("target_secs must be > 0")
+    text_for_tts = cue.text.replace("\n", " ").strip()
+    if not text_for_tts:
+        return None
+    window = max(0.0, cue.end - cue.start)
+    target_secs = max(window - 0.08, 0.15) if window > 0 else None
 
-    probe = ffmpeg.probe(in_path)
-    streams = [s for s in probe.get("streams", []) if s.get("codec_type") == "audio"]
-    if not streams:
-        raise ValueError(f"No audio stream found in {in_path}")
-    src_dur_str = streams[0].get("duration") or probe.get("format", {}).get("duration")
-    if src_dur_str is None:
-        raise ValueError("Unable to determine source duration for tempo adjustment.")
-    src_dur = float(src_dur_str)
+    pcm_bytes = _synthesize_cue_bytes(text_for_tts, voice, target_secs, cue.index, cache=cache)
+    print(f"TTS cue generated {cue.index} [{cue.start:.3f}–{cue.end:.3f}s], target≈{(target_secs or 0):.2f}s, voice={voice.name}")
+    samples = pcm_to_array(pcm_bytes)
+
+    # Compress only when overlong
+    if window > 0:
+        try:
+            dur = pcm_duration_secs(pcm_bytes, audio_fps)
+            signed_diff = dur - window  # >0 means overlong
+            if (dur > window) and (abs(signed_diff) > min_abs_deviation) and (abs(signed_diff) / max(window, 1e-6) > max_pct_deviation):
+                print(f"  - Compressing cue {cue.index} ({TIME_STRETCH_ENGINE}): {dur:.3f}s -> {window:.3f}s")
+                samples = _time_stretch_samples(samples, window, sample_rate=audio_fps)
+            # If dur <= window, do nothing (no slow-down)
+        except Exception as e:
+            print(f"  ! Tempo adjustment failed for cue {cue.index}: {e}")
+
+    if fragments_dir:
+        frag_path = os.path.join(fragments_dir, f"cue_{cue.index:05d}.wav")
+        wave_file(frag_path, samples.astype("<i2", copy=False).tobytes(), channels=1, rate=audio_fps, sample_width=2)
+
+    return samples
+
+
+def _cue_checkpoint_path(checkpoint_dir: str, cue: SRTCue, voice: Voice, audio_fps: int) -> str:
+    """
+    Checkpoint file for a rendered cue; the name changes with anything that changes the audio.
+    """
+    digest = hashlib.blake2b(
+        f"{voice.provider}|{voice.id}|{audio_fps}|{cue.start:.3f}|{cue.end:.3f}|{cue.text}".encode("utf-8"),
+        digest_size=8,
+    ).hexdigest()
+    return os.path.join(checkpoint_dir, f"cue_{cue.index:05d}_{digest}.pcm")
 
-    # Tempo factor: >1.0 -> faster (shorter); <1.0 -> slower (longer)
-    atempo = src_dur / target_secs
-    chain = _decompose_atempo_factor(atempo)
 
-    stream = ffmpeg.input(in_path)
-    for f in chain:
-        stream = stream.filter("atempo", f)
-    out = ffmpeg.output(stream, out_path, acodec="pcm_s16le", ac=1, ar=sample_rate).overwrite_output()
-    out.run(quiet=True)
+def _render_cue_checkpointed(
+    checkpoint_dir: str,
+    cue: SRTCue,
+    voice: Voice,
+    audio_fps: int,
+    *render_args,
+) -> Optional[np.ndarray]:
+    """
+    _render_cue_samples, resuming from (and writing) a per-cue checkpoint of the final samples.
+    An empty checkpoint file records a cue without speakable text.
+    """
+    path = _cue_checkpoint_path(checkpoint_dir, cue, voice, audio_fps)
+    if os.path.exists(path):
+        samples = np.fromfile(path, dtype="<i2")
+        return samples if samples.size else None
+    samples = _render_cue_samples(cue, voice, audio_fps, *render_args)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        if samples is not None:
+            f.write(samples.astype("<i2", copy=False).tobytes())
+    os.replace(tmp, path)
+    return samples
+
+
+class NarrationRenderer:
+    """
+    Incremental narration: cues are submitted in any number of batches (e.g. as translation
+    streams them in) and synthesized concurrently; each finished clip is mixed into the
+    timeline as soon as it completes. finish() waits for the outstanding cues and writes the WAV.
+    The first failing cue cancels the cues not yet started, and is re-raised by the next
+    submit() or by finish(). on_cue, if given, is called with (cues rendered, cues submitted)
+    each time a cue finishes (from the TTS threads).
+    """
+    def __init__(
+        self,
+        voice: Voice,
+        audio_fps: int = 24000,
+        max_pct_deviation: float = 0.06,
+        min_abs_deviation: float = 0.06,
+        max_workers: Optional[int] = None,
+        use_cache: bool = True,
+        fragments_dir: Optional[str] = None,
+        checkpoint_dir: Optional[str] = None,
+        duration_secs: float = 0.0,
+        on_cue: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        self.voice = voice
+        self.audio_fps = audio_fps
+        self.checkpoint_dir = checkpoint_dir
+        self._render_args = (max_pct_deviation, min_abs_deviation, get_tts_cache() if use_cache else None, fragments_dir)
+        self._timeline = NarrationTimeline(duration_secs=duration_secs, sample_rate=audio_fps)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._error: Optional[BaseException] = None
+        self._submitted = 0
+        self._rendered = 0
+        self._on_cue = on_cue
+        workers = max_workers or get_provider_limiter(voice.provider).max_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        print(f"Synthesizing cues with up to {workers} concurrent TTS requests...")
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+    @property
+    def clip_count(self) -> int:
+        return self._timeline.clip_count
+
+    def submit(self, cues: Iterable[SRTCue]) -> None:
+        """
+        Queue cues for synthesis; returns immediately.
+        """
+        self._raise_if_failed()
+        cues = list(cues)
+        if self.checkpoint_dir:
+            resumed = sum(os.path.exists(_cue_checkpoint_path(self.checkpoint_dir, c, self.voice, self.audio_fps)) for c in cues)
+            if resumed:
+                print(f"Resuming narration: {resumed}/{len(cues)} cues already rendered")
+        with self._lock:
+            self._submitted += len(cues)  # before any of them can finish, so progress never reads n/n early
+        for cue in cues:
+            if self.checkpoint_dir:
+                fut = self._pool.submit(_render_cue_checkpointed, self.checkpoint_dir, cue, self.voice, self.audio_fps, *self._render_args)
+            else:
+                fut = self._pool.submit(_render_cue_samples, cue, self.voice, self.audio_fps, *self._render_args)
+            with self._lock:
+                self._futures.append(fut)
+            fut.add_done_callback(lambda f, cue=cue: self._on_done(cue, f))
+
+    def _on_done(self, cue: SRTCue, fut: Future) -> None:
+        if fut.cancelled():
+            return
+        error = fut.exception()
+        with self._lock:
+            if error is not None:
+                if self._error is None:
+                    self._error = error
+                    # Fail fast: don't keep paying for the remaining cues.
+                    for pending in self._futures:
+                        pending.cancel()
+                return
+            samples = fut.result()
+            if samples is not None:
+                # Place each clip at its start time, no trimming
+                self._timeline.add(cue.start, samples)
+            self._rendered += 1
+            rendered, submitted = self._rendered, self._submitted
+        if self._on_cue is not None:
+            try:
+                self._on_cue(rendered, submitted)
+            except Exception as e:
+                print(f"  ! Progress callback failed: {e}")
+
+    def _raise_if_failed(self) -> None:
+        with self._lock:
+            error = self._error
+        if error is not None:
+            self.close()
+            raise error
+
+    def finish(self, generated_narration_save_path: str) -> None:
+        """
+        Wait for every submitted cue, then write the narration WAV.
+        """
+        self._pool.shutdown(wait=True)
+        self._raise_if_failed()
+        cache = self._render_args[2]
+        if cache is not None:
+            stats = cache.stats()
+            print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses (process-wide hit rate {stats['hit_rate']:.0%})")
+
+        if self._timeline.clip_count == 0:
+            raise ValueError("No audio clips generated from TTS.")
+
+        print(f"Writing narration ({self._timeline.clip_count}/{self._submitted} clips, {self._timeline.duration_secs:.1f}s) to: {generated_narration_save_path}")
+        self._timeline.write_wav(generated_narration_save_path)
+        if self.checkpoint_dir:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        print("Narration generation complete.")
+
+    def close(self) -> None:
+        """
+        Abandon the narration: cancel cues that have not started.
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
 
 
 def generate_narration(
@@ -88,13 +303,29 @@ def generate_narration(
     voice: Voice,
     audio_fps: int = 24000,
     max_pct_deviation: float = 0.06,  # 6% tolerance before DSP
-    min_abs_deviation: float = 0.06   # ~60 ms absolute tolerance
+    min_abs_deviation: float = 0.06,  # ~60 ms absolute tolerance
+    max_workers: Optional[int] = None,
+    use_cache: bool = True,
+    keep_fragments: bool = DEBUG_TTS_FRAGMENTS,
+    checkpoint_dir: Optional[str] = None,
+    on_cue: Optional[Callable[[int, int], None]] = None,
 ) -> None:
     """
     Generate narration aligned to SRT timings by synthesizing one clip per cue.
     1) Prompt TTS with a per-cue pace hint ("~X seconds").
-    2) If still off, time-stretch (pitch-preserving) to the cue window using FFmpeg 'atempo'.
+    2) If still off, time-stretch (pitch-preserving) to the cue window (in-process WSOLA by default).
     3) Place each clip at cue start; do not trim overrun (compress-only policy).
+    Cues are synthesized concurrently (bounded by max_workers, defaulting to the provider's
+    configured concurrency) and throttled by the provider's shared rate limiter.
+    With use_cache, previously synthesized fragments are reused from the on-disk TTS cache,
+    so re-runs and retries only pay for cues that were never synthesized.
+    Clips are mixed in memory into a NumPy timeline and written as a single WAV;
+    per-cue WAVs are only written to tts_fragments/ when keep_fragments is set (debug).
+    With checkpoint_dir, every finished cue is saved there as it completes, so a re-run after a
+    failure (quota, worker restart) resumes with only the missing cues; the directory is
+    removed once the WAV is written.
+    on_cue, if given, is called with (cues rendered, total cues) as cues finish.
+    See NarrationRenderer for narrating cues as they stream in.
     """
     with open(translated_cc_path, "r", encoding="utf-8") as f:
         translated_srt = f.read()
@@ -102,91 +333,26 @@ def generate_narration(
     if not cues:
         raise ValueError("No SRT cues parsed from translated captions.")
 
-    tmp_dir = os.path.join(os.path.dirname(generated_narration_save_path), "tts_fragments")
-    os.makedirs(tmp_dir, exist_ok=True)
-
-    fragment_paths: List[str] = []
-    for cue in cues:
-        text_for_tts = cue.text.replace("\n", " ").strip()
-        if not text_for_tts:
-            continue
-        window = max(0.0, cue.end - cue.start)
-        target_secs = max(window - 0.08, 0.15) if window > 0 else None
-
-        attempts = 0
-        while attempts < RETRIES:
-            try:
-                if isinstance(voice, GeminiVoice):
-                    tts_bytes = gemini_tts_bytes_for_text(text_for_tts, voice, target_secs)
-                    voice_name = voice.name
-                elif isinstance(voice, ElevenLabsVoice):
-                    tts_bytes = elevenlabs_tts_bytes_for_text(text_for_tts, voice, target_secs)
-                    voice_name = voice.name
-                print(f"TTS cue generated {cue.index} [{cue.start:.3f}–{cue.end:.3f}s], target≈{(target_secs or 0):.2f}s, voice={voice_name}")
-                pcm_bytes = tts_bytes
-                break
-            except Exception as e:
-                attempts += 1
-                print(f"  ! TTS failed for cue {cue.index} (attempt {attempts}/{RETRIES}): {e}")
-                if attempts >= RETRIES:
-                    raise RuntimeError(f"TTS failed after {RETRIES} attempts for cue {cue.index}.")
-                print(f"  Retrying in {RETRY_DELAY_S} seconds...")
-                time.sleep(RETRY_DELAY_S)
-                continue
-
-        frag_path = os.path.join(tmp_dir, f"cue_{cue.index:05d}.wav")
-        wave_file(frag_path, pcm_bytes, channels=1, rate=audio_fps, sample_width=2)
-
-        # Compress only when overlong
-        if window > 0:
-            try:
-                with AudioFileClip(frag_path) as m:
-                    dur = float(m.duration)
-                signed_diff = dur - window  # >0 means overlong
-                if (dur > window) and (abs(signed_diff) > min_abs_deviation) and (abs(signed_diff) / max(window, 1e-6) > max_pct_deviation):
-                    adjusted = os.path.join(tmp_dir, f"cue_{cue.index:05d}_fit.wav")
-                    print(f"  - Compressing with ffmpeg atempo: {dur:.3f}s -> {window:.3f}s")
-                    _time_stretch_wav_to_duration(frag_path, adjusted, window, sample_rate=audio_fps)
-                    os.replace(adjusted, frag_path)
-                # If dur <= window, do nothing (no slow-down)
-            except Exception as e:
-                print(f"  ! Tempo adjustment failed for cue {cue.index}: {e}")
-
-        fragment_paths.append(frag_path)
-
-    # Composite: place each fragment at its start time, no trimming
-    print("Compositing per-cue audio onto timeline...")
-    audio_clips = []
-    idx_to_path = {}
-    for p in fragment_paths:
-        try:
-            name = os.path.basename(p)
-            idx = int(name.split('_')[1].split('.')[0])
-            idx_to_path[idx] = p
-        except Exception:
-            pass
-
-    for cue in cues:
-        p = idx_to_path.get(cue.index)
-        if not p:
-            continue
-        clip = AudioFileClip(p)
-        clip = clip.with_start(cue.start)
-        audio_clips.append(clip)
-
-    if not audio_clips:
-        raise ValueError("No audio clips generated from TTS.")
-
-    composite = CompositeAudioClip(audio_clips)
-    print(f"Writing composite narration to: {generated_narration_save_path}")
-    composite.write_audiofile(generated_narration_save_path, fps=audio_fps, nbytes=2)
-
-    # Cleanup
-    composite.close()
-    for c in audio_clips:
-        try:
-            c.close()
-        except Exception:
-            pass
+    fragments_dir = None
+    if keep_fragments:
+        fragments_dir = os.path.join(os.path.dirname(generated_narration_save_path), "tts_fragments")
+        os.makedirs(fragments_dir, exist_ok=True)
 
-    print("Narration generation complete.")
+    renderer = NarrationRenderer(
+        voice,
+        audio_fps=audio_fps,
+        max_pct_deviation=max_pct_deviation,
+        min_abs_deviation=min_abs_deviation,
+        max_workers=max_workers,
+        use_cache=use_cache,
+        fragments_dir=fragments_dir,
+        checkpoint_dir=checkpoint_dir,
+        duration_secs=max(c.end for c in cues),
+        on_cue=on_cue,
+    )
+    try:
+        renderer.submit(cues)
+        renderer.finish(generated_narration_save_path)
+    except BaseException:
+        renderer.close()
+        raise
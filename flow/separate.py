@@ -1,28 +1,75 @@
-from moviepy import VideoFileClip
+import os
+from typing import Optional
+
+import ffmpeg  # pip install ffmpeg-python
+
+from .utils.metrics import FFMPEG_DURATION, timed
+
+# ASR-ready audio: 16 kHz mono is all speech recognition needs, FLAC keeps it lossless and compact.
+ASR_SAMPLE_RATE = 16000
+ASR_CHANNELS = 1
+
+
+def _run(stream, what: str) -> None:
+    try:
+        with timed(FFMPEG_DURATION, operation=f"extract_{what}"):
+            stream.overwrite_output().run(quiet=True)
+    except ffmpeg.Error as e:
+        stderr = (e.stderr or b"").decode("utf-8", errors="replace")
+        if "matches no streams" in stderr or "does not contain any stream" in stderr:
+            raise ValueError(f"No {what} track found in video.") from e
+        raise RuntimeError(f"ffmpeg failed extracting {what}: {stderr[-2000:]}") from e
+
 
 def separate_audio(
     source_video_path: str,
     audio_no_video_path: str,
-    video_no_audio_path: str
+    video_no_audio_path: Optional[str] = None
 ) -> None:
     """
-    Separates the audio from a video file, saving the audio and the video without audio to specified paths.
+    Extracts the audio from a video file as ASR-ready audio (16 kHz mono; codec follows the
+    extension, e.g. .flac or .opus) by demuxing with ffmpeg - video frames are never decoded.
     Args:
         source_video_path (str): Path to the source video file.
         audio_no_video_path (str): Path where the extracted audio will be saved.
-        video_no_audio_path (str): Path where the video without audio will be saved.
+        video_no_audio_path (Optional[str]): If given, also write the video-only artifact eagerly
+            (stream copy). Otherwise use `extract_video_stream` when a consumer needs it.
     Returns:
         None
     Raises:
         ValueError: If the video does not contain an audio track.
     """
-    print(f"Loading video file: {source_video_path}")
-    video_clip = VideoFileClip(source_video_path)
-    if video_clip.audio is not None:
-        print(f"Extracting audio to: {audio_no_video_path}")
-        video_clip.audio.write_audiofile(audio_no_video_path)
-    else:
-        raise ValueError("No audio track found in video.")
-    print(f"Saving video without audio to: {video_no_audio_path}")
-    video_clip.without_audio().write_videofile(video_no_audio_path, codec="libx264", audio=False)
+    print(f"Extracting audio ({ASR_SAMPLE_RATE} Hz mono) from {source_video_path} to: {audio_no_video_path}")
+    audio = ffmpeg.input(source_video_path)["a:0"]
+    # Bit-exact output without container metadata, so identical audio yields identical files
+    # (the transcript cache keys on the file's content hash).
+    _run(
+        ffmpeg.output(
+            audio, audio_no_video_path,
+            ac=ASR_CHANNELS, ar=ASR_SAMPLE_RATE, sample_fmt="s16",
+            map_metadata=-1, fflags="+bitexact", flags="+bitexact",
+        ),
+        "audio",
+    )
+    if video_no_audio_path:
+        extract_video_stream(source_video_path, video_no_audio_path)
     print("Separation complete.")
+
+
+def extract_video_stream(source_video_path: str, video_no_audio_path: str, overwrite: bool = False) -> str:
+    """
+    Lazily produces the video-only artifact by stream copy (no re-encode).
+    Does nothing if it already exists unless overwrite is set.
+    Args:
+        source_video_path (str): Path to the source video file.
+        video_no_audio_path (str): Path where the video without audio will be saved.
+        overwrite (bool): Re-create the artifact even if it exists.
+    Returns:
+        str: video_no_audio_path
+    """
+    if os.path.exists(video_no_audio_path) and not overwrite:
+        return video_no_audio_path
+    print(f"Saving video without audio to: {video_no_audio_path}")
+    video = ffmpeg.input(source_video_path)["v:0"]
+    _run(ffmpeg.output(video, video_no_audio_path, vcodec="copy", an=None), "video")
+    return video_no_audio_path
@@ -1,39 +1,232 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
 from dotenv import load_dotenv
 from google import genai
-from .utils.srt_utils import clean_srt_text
+from .utils.srt_utils import SRTCue, format_srt, parse_srt, repair_srt
+from .utils.retry import GEMINI_RETRY_POLICY, call_with_retry
+from .cache.translation_memory import TranslationMemory, get_translation_memory, normalize_source_text
+from settings import TRANSLATE_CONTEXT_CUES, TRANSLATE_MAX_WORKERS, TRANSLATE_WINDOW_CUES
 load_dotenv()
 client = genai.Client()
 
-TRANSLATE_SRT_INSTRUCTION = (
-    "Translate the following SRT subtitles to the {target_lang} language while preserving the exact numbers, timestamps and linebreaks."
+TRANSLATE_WINDOW_INSTRUCTION = (
+    "Translate the SRT subtitles in the TRANSLATE section to the {target_lang} language while preserving the exact numbers, timestamps and linebreaks."
     "When translating, try to adjust the text to fit the timing (length) of the original subtitles as closely as possible, while keeping the meaning intact."
-    "Subtitles to translate:\n```srt\n{subtitles}\n```"
+    "The CONTEXT sections contain neighbouring subtitles for reference only: do not translate or output them."
+    "Output only the translated subtitles of the TRANSLATE section in SRT format.\n"
+    "CONTEXT BEFORE:\n```srt\n{context_before}\n```\n"
+    "TRANSLATE:\n```srt\n{subtitles}\n```\n"
+    "CONTEXT AFTER:\n```srt\n{context_after}\n```"
 )
+TRANSLATE_MODEL = "gemini-2.5-pro"
+WINDOW_RETRIES = 3
+TIMESTAMP_TOLERANCE_S = 0.002
+
+
+@dataclass
+class TranslationWindow:
+    index: int
+    cues: List[SRTCue]
+    context_before: List[SRTCue]
+    context_after: List[SRTCue]
+
+
+def build_windows(
+    cues: List[SRTCue],
+    window_size: int,
+    context_cues: int,
+    positions: Optional[List[int]] = None,
+) -> List[TranslationWindow]:
+    """
+    Splits the cues at `positions` (default: all of them) into consecutive windows of
+    window_size, each with up to context_cues read-only neighbours from the full cue list on
+    either side.
+    """
+    window_size = max(1, window_size)
+    positions = list(range(len(cues))) if positions is None else positions
+    windows = []
+    for start in range(0, len(positions), window_size):
+        chunk = positions[start:start + window_size]
+        first, last = chunk[0], chunk[-1]
+        windows.append(TranslationWindow(
+            index=len(windows),
+            cues=[cues[p] for p in chunk],
+            context_before=cues[max(0, first - context_cues):first],
+            context_after=cues[last + 1:last + 1 + context_cues],
+        ))
+    return windows
+
+
+def _check_window(source: List[SRTCue], translated: List[SRTCue]) -> Optional[str]:
+    """
+    Returns a description of the mismatch between a window and its translation, or None if
+    the translation has the same cue indices and timestamps.
+    """
+    if [c.index for c in translated] != [c.index for c in source]:
+        return f"cue indices {[c.index for c in translated]} != {[c.index for c in source]}"
+    for s, t in zip(source, translated):
+        if abs(s.start - t.start) > TIMESTAMP_TOLERANCE_S or abs(s.end - t.end) > TIMESTAMP_TOLERANCE_S:
+            return f"timestamps of cue {s.index} changed"
+    return None
+
+
+def _translate_window(window: TranslationWindow, target_language: str, total: int) -> List[SRTCue]:
+    """
+    Translates one window, re-prompting up to WINDOW_RETRIES times until the result has the
+    same cues and timings as the source window.
+    """
+    prompt = TRANSLATE_WINDOW_INSTRUCTION.format(
+        target_lang=target_language,
+        context_before=format_srt(window.context_before).strip(),
+        subtitles=format_srt(window.cues).strip(),
+        context_after=format_srt(window.context_after).strip(),
+    )
+    translated: List[SRTCue] = []
+    problem: Optional[str] = "empty response"
+    for attempt in range(1, WINDOW_RETRIES + 1):
+        response = call_with_retry(
+            lambda: client.models.generate_content(model=TRANSLATE_MODEL, contents=[prompt]),
+            GEMINI_RETRY_POLICY,
+            description=f"CC translation window {window.index + 1}/{total}",
+        )
+        translated, bad_blocks = repair_srt(response.text or "")
+        problem = f"{len(bad_blocks)} unparseable block(s)" if bad_blocks else _check_window(window.cues, translated)
+        if problem is None:
+            print(f"Translated window {window.index + 1}/{total} ({len(window.cues)} cues)")
+            return translated
+        print(f"  ! Window {window.index + 1}/{total} translation mismatch ({problem}), attempt {attempt}/{WINDOW_RETRIES}")
+
+    # Same cues but drifted timings: keep the text and restore the source timings.
+    if [c.index for c in translated] == [c.index for c in window.cues]:
+        print(f"  - Restoring source timestamps for window {window.index + 1}/{total}")
+        return [SRTCue(index=s.index, start=s.start, end=s.end, text=t.text) for s, t in zip(window.cues, translated)]
+    raise RuntimeError(f"Translation of window {window.index + 1}/{total} failed validation: {problem}")
+
+
+def _translate_cues(
+    cues: List[SRTCue],
+    target_language: str,
+    window_size: int,
+    context_cues: int,
+    pool: ThreadPoolExecutor,
+    memory: Optional[TranslationMemory],
+    first: int = 0,
+) -> Dict[int, str]:
+    """
+    Translates cues[first:] (earlier cues only serve as context) and returns
+    {cue position: translated text}. Translation-memory hits are reused; the misses are
+    translated in windows on `pool` and stored back into the memory.
+    """
+    translations: Dict[int, str] = {}
+    if memory is not None:
+        known = memory.lookup_many((c.text for c in cues[first:]), target_language, TRANSLATE_MODEL)
+        for pos in range(first, len(cues)):
+            hit = known.get(normalize_source_text(cues[pos].text))
+            if hit is not None:
+                translations[pos] = hit
+        print(f"Translation memory: {len(translations)}/{len(cues) - first} cues reused")
+
+    pending = [pos for pos in range(first, len(cues)) if pos not in translations]
+    if pending:
+        windows = build_windows(cues, window_size, context_cues, positions=pending)
+        print(f"Translating {len(pending)} cues to {target_language} in {len(windows)} windows...")
+        translated_windows = list(pool.map(lambda w: _translate_window(w, target_language, len(windows)), windows))
+        translated = [c for window in translated_windows for c in window]
+        for pos, c in zip(pending, translated):
+            translations[pos] = c.text
+        if memory is not None:
+            memory.store_many(((cues[pos].text, translations[pos]) for pos in pending), target_language, TRANSLATE_MODEL)
+    return translations
+
 
 def translate_transcription(
     original_cc_path: str,
     target_language: str,
-    translated_cc_save_path: str
+    translated_cc_save_path: str,
+    window_size: int = TRANSLATE_WINDOW_CUES,
+    context_cues: int = TRANSLATE_CONTEXT_CUES,
+    max_workers: int = TRANSLATE_MAX_WORKERS,
+    use_memory: bool = True,
 ) -> None:
     """
     Translates a closed caption (CC) file to the specified target language and saves the result.
+    With use_memory, each cue is first looked up in the translation memory; only the misses
+    are sent to Gemini, and their translations are stored for later jobs.
+    Cues to translate are split into windows of window_size with context_cues of read-only
+    context on either side; windows are translated concurrently (at most max_workers at a time),
+    validated to keep the same cue indices and timestamps, then stitched back in order.
     Args:
         original_cc_path (str): Path to the original CC file.
         target_language (str): Language to translate the CC into.
         translated_cc_save_path (str): Path where the translated CC file will be saved.
+        window_size (int): Cues translated per request.
+        context_cues (int): Read-only neighbour cues shown on each side of a window.
+        max_workers (int): Max concurrent window translations.
+        use_memory (bool): Reuse/populate the translation memory.
     Returns:
         None
     """
     with open(original_cc_path, "r", encoding="utf-8") as f:
         original_transcription = f.read()
+    cues = parse_srt(original_transcription)
+    memory = get_translation_memory() if use_memory else None
+
     print(f"Translating CC from {original_cc_path} to {target_language}...")
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=[TRANSLATE_SRT_INSTRUCTION.format(target_lang=target_language, subtitles=original_transcription)],
-    )
-    translated_text = clean_srt_text(response.text) if response.text else ""
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="translate") as pool:
+        translations = _translate_cues(cues, target_language, window_size, context_cues, pool, memory)
+
+    translated_text = format_srt([
+        SRTCue(index=c.index, start=c.start, end=c.end, text=translations[pos]) for pos, c in enumerate(cues)
+    ])
     print(f"Saving translated CC to: {translated_cc_save_path}")
     with open(translated_cc_save_path, "w", encoding="utf-8") as f:
         f.write(translated_text)
     print("Translation complete.")
+
+
+def stream_translation(
+    cue_batches: Iterable[List[SRTCue]],
+    target_language: str,
+    translated_cc_save_path: str,
+    window_size: int = TRANSLATE_WINDOW_CUES,
+    context_cues: int = TRANSLATE_CONTEXT_CUES,
+    max_workers: int = TRANSLATE_MAX_WORKERS,
+    use_memory: bool = True,
+) -> Iterator[List[SRTCue]]:
+    """
+    Streaming variant of translate_transcription: translates each incoming batch of source
+    cues (e.g. from generate_cc.stream_cc) as soon as it arrives and yields the translated
+    batch, with the same timings. The tail of the previous batch is shown as read-only
+    context; context after a batch is limited to what has arrived. The complete translated
+    SRT is written to translated_cc_save_path once the input is exhausted.
+    Args:
+        cue_batches (Iterable[List[SRTCue]]): Source cues, in timeline order.
+        target_language (str): Language to translate the CC into.
+        translated_cc_save_path (str): Path where the translated CC file will be saved.
+        window_size (int): Cues translated per request.
+        context_cues (int): Read-only neighbour cues shown on each side of a window.
+        max_workers (int): Max concurrent window translations.
+        use_memory (bool): Reuse/populate the translation memory.
+    Yields:
+        List[SRTCue]: The translated batch.
+    """
+    memory = get_translation_memory() if use_memory else None
+    translated_all: List[SRTCue] = []
+    previous: List[SRTCue] = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="translate") as pool:
+        for batch in cue_batches:
+            context = previous[-context_cues:] if context_cues > 0 else []
+            translations = _translate_cues(context + batch, target_language, window_size, context_cues, pool, memory, first=len(context))
+            translated = [
+                SRTCue(index=c.index, start=c.start, end=c.end, text=translations[len(context) + i]) for i, c in enumerate(batch)
+            ]
+            translated_all.extend(translated)
+            previous = batch
+            yield translated
+
+    print(f"Saving translated CC to: {translated_cc_save_path}")
+    with open(translated_cc_save_path, "w", encoding="utf-8") as f:
+        f.write(format_srt(translated_all))
+    print("Translation complete.")
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 from elevenlabs.client import ElevenLabs
 from typing import List, Optional
 from flow.models.voices import ElevenLabsVoice
+from flow.utils.metrics import TRANSFER_BYTES, TTS_REQUEST_DURATION, timed
 import os
 
 load_dotenv()
@@ -9,7 +10,8 @@ elevenlabs = ElevenLabs(
   api_key=os.getenv("ELEVENLABS_API_KEY"),
 )
 
-
+MODEL_ID = "eleven_turbo_v2_5"
+OUTPUT_FORMAT = "pcm_24000"
 
 
 def tts_bytes_for_text(text: str, voice:ElevenLabsVoice, target_secs: Optional[float]) -> bytes:
@@ -17,20 +19,22 @@ def tts_bytes_for_text(text: str, voice:ElevenLabsVoice, target_secs: Optional[f
     Call ElevenAPI TTS for a single cue of text and return PCM bytes.
     """
 
-    audio = elevenlabs.text_to_speech.convert(
-        text=text,
-        voice_id=voice.id,
-        model_id="eleven_turbo_v2_5",
-        output_format="pcm_24000",
-    )
-    # The SDK yields chunks; collect them into a single bytes object. (docs show iteration)
-    # https://elevenlabs.io/docs/cookbooks/text-to-speech/streaming
-    buf = bytearray()
-    for chunk in audio:
-        if chunk:
-            # Some versions yield memoryview objects; ensure bytes.
-            buf.extend(bytes(chunk))
+    with timed(TTS_REQUEST_DURATION, provider="elevenlabs"):
+        audio = elevenlabs.text_to_speech.convert(
+            text=text,
+            voice_id=voice.id,
+            model_id=MODEL_ID,
+            output_format=OUTPUT_FORMAT,
+        )
+        # The SDK yields chunks; collect them into a single bytes object. (docs show iteration)
+        # https://elevenlabs.io/docs/cookbooks/text-to-speech/streaming
+        buf = bytearray()
+        for chunk in audio:
+            if chunk:
+                # Some versions yield memoryview objects; ensure bytes.
+                buf.extend(bytes(chunk))
     data = bytes(buf)
+    TRANSFER_BYTES.labels(direction="download", kind="tts_audio").inc(len(data))
     if not data:
         raise RuntimeError("ElevenLabs TTS returned no audio.")
     return data
\ No newline at end of file
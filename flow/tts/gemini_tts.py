@@ -4,10 +4,13 @@ from google import genai
 from google.genai import types
 from typing import List, Optional
 from flow.models.voices import GeminiVoice
+from flow.utils.metrics import TRANSFER_BYTES, TTS_REQUEST_DURATION, timed
 
 load_dotenv()
 client = genai.Client()
 
+MODEL_ID = "gemini-2.5-flash-preview-tts"
+
 def tts_bytes_for_text(text: str, voice:GeminiVoice, target_secs: Optional[float]) -> bytes:
     """
     Call Gemini TTS for a single cue of text and return PCM bytes.
@@ -22,25 +25,27 @@ def tts_bytes_for_text(text: str, voice:GeminiVoice, target_secs: Optional[float
 
     prompt = f"{guidance}\n\n{text}"
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash-preview-tts",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name=voice.id
+    with timed(TTS_REQUEST_DURATION, provider="gemini"):
+        response = client.models.generate_content(
+            model=MODEL_ID,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                response_modalities=["AUDIO"],
+                speech_config=types.SpeechConfig(
+                    voice_config=types.VoiceConfig(
+                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                            voice_name=voice.id
+                        )
                     )
-                )
-            ),
+                ),
+            )
         )
-    )
     candidates = getattr(response, "candidates", None)
     if candidates and len(candidates) > 0 and getattr(candidates[0], "content", None):
         parts = getattr(candidates[0].content, "parts", None)
         if parts and len(parts) > 0:
             inline_data = getattr(parts[0], "inline_data", None)
             if inline_data is not None and hasattr(inline_data, "data"):
+                TRANSFER_BYTES.labels(direction="download", kind="tts_audio").inc(len(inline_data.data or b""))
                 return inline_data.data
     raise RuntimeError("Failed to synthesize TTS for a cue.")
\ No newline at end of file
@@ -0,0 +1,102 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import ffmpeg  # pip install ffmpeg-python
+
+from .metrics import FFMPEG_DURATION, timed
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(?P<t>-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(?P<t>-?\d+(?:\.\d+)?)")
+_DURATION_RE = re.compile(r"Duration:\s*(?P<h>\d+):(?P<m>\d{2}):(?P<s>\d{2}(?:\.\d+)?)")
+
+
+@dataclass
+class AudioChunk:
+    index: int
+    start: float
+    end: float
+    path: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def detect_silences(
+    audio_path: str,
+    noise_db: float = -35.0,
+    min_silence_secs: float = 0.4,
+) -> Tuple[float, List[Tuple[float, float]]]:
+    """
+    Runs ffmpeg's silencedetect over the audio (decode only, no output file).
+    Returns (total_duration_secs, [(silence_start, silence_end), ...]).
+    """
+    with timed(FFMPEG_DURATION, operation="silencedetect"):
+        _, stderr = (
+            ffmpeg.input(audio_path)
+            .filter("silencedetect", noise=f"{noise_db}dB", d=min_silence_secs)
+            .output("-", format="null")
+            .run(capture_stderr=True, quiet=True)
+        )
+    log = stderr.decode("utf-8", errors="replace")
+
+    m = _DURATION_RE.search(log)
+    duration = int(m.group("h")) * 3600 + int(m.group("m")) * 60 + float(m.group("s")) if m else 0.0
+
+    silences: List[Tuple[float, float]] = []
+    start: Optional[float] = None
+    for line in log.splitlines():
+        s = _SILENCE_START_RE.search(line)
+        if s:
+            start = max(0.0, float(s.group("t")))
+            continue
+        e = _SILENCE_END_RE.search(line)
+        if e and start is not None:
+            silences.append((start, float(e.group("t"))))
+            start = None
+    if start is not None and duration:
+        silences.append((start, duration))
+    return duration, silences
+
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    chunk_secs: float,
+    search_secs: float = 30.0,
+) -> List[AudioChunk]:
+    """
+    Splits [0, duration] into windows of about chunk_secs. Each boundary is moved to the middle
+    of the silence closest to its nominal position (within +/- search_secs) so no chunk cuts a
+    word in half; without a nearby silence it falls back to a hard cut at the nominal position.
+    """
+    if duration <= 0:
+        return []
+    midpoints = [(s + e) / 2.0 for s, e in silences]
+    chunks: List[AudioChunk] = []
+    start = 0.0
+    while duration - start > chunk_secs * 1.25:
+        nominal = start + chunk_secs
+        candidates = [t for t in midpoints if abs(t - nominal) <= search_secs and t > start + chunk_secs / 2]
+        cut = min(candidates, key=lambda t: abs(t - nominal)) if candidates else nominal
+        chunks.append(AudioChunk(index=len(chunks), start=start, end=cut))
+        start = cut
+    chunks.append(AudioChunk(index=len(chunks), start=start, end=duration))
+    return chunks
+
+
+def cut_audio_chunk(audio_path: str, chunk: AudioChunk, out_path: str) -> str:
+    """
+    Writes [chunk.start, chunk.end) of the audio to out_path (re-encoded per the extension,
+    which keeps the cut sample-accurate).
+    """
+    with timed(FFMPEG_DURATION, operation="cut_audio_chunk"):
+        (
+            ffmpeg.input(audio_path, ss=chunk.start, t=chunk.duration)
+            .output(out_path)
+            .overwrite_output()
+            .run(quiet=True)
+        )
+    chunk.path = out_path
+    return out_path
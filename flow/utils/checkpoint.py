@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock (host mode writes from one process)
+    fcntl = None  # type: ignore[assignment]
+
+_HASH_CHUNK = 1 << 20
+
+
+def file_fingerprint(path: str, previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Content fingerprint of a file: {"size", "mtime_ns", "blake2b"}, or None if it does not exist.
+    If `previous` has the same size and mtime, its hash is reused instead of re-reading the file
+    (multi-GB videos are only hashed once per change).
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if previous and previous.get("size") == st.st_size and previous.get("mtime_ns") == st.st_mtime_ns:
+        return dict(previous)
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(block)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": h.hexdigest()}
+
+
+class StageManifest:
+    """
+    Per-job record of completed pipeline stages (<job dir>/manifest.json).
+
+    Each stage entry stores the fingerprints of its input and output files and its parameters.
+    A stage is fresh - safe to skip on a re-run - when its outputs still match what was
+    recorded and its current inputs and parameters are the ones it was run with. Because a
+    stage's inputs are upstream outputs, re-running a stage that produces different bytes
+    invalidates everything downstream, while identical bytes keep downstream checkpoints valid.
+    Safe to share between threads (fan-out branches record concurrently), and between
+    processes (Celery stage tasks): record() merges into the file under an exclusive lock.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = self._read()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("stages", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"  ! Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _fingerprints(self, files: Dict[str, str], recorded: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: file_fingerprint(path, (recorded.get(name) or {}).get("fingerprint")) for name, path in files.items()}
+
+    def is_fresh(self, stage: str, inputs: Dict[str, str], outputs: Dict[str, str], params: Dict[str, Any]) -> bool:
+        """
+        True if `stage` completed before with the same params and input files, and all of its
+        output files are still present and unchanged.
+        """
+        with self._lock:
+            entry = self._stages.get(stage)
+        if not entry or entry.get("params") != params:
+            return False
+        for kind, files in (("inputs", inputs), ("outputs", outputs)):
+            recorded = entry.get(kind, {})
+            if set(recorded) != set(files):
+                return False
+            current = self._fingerprints(files, recorded)
+            for name, fp in current.items():
+                if fp is None or recorded[name].get("path") != files[name]:
+                    return False
+                if fp["blake2b"] != recorded[name]["fingerprint"]["blake2b"]:
+                    return False
+        return True
+
+    def record(
+        self,
+        stage: str,
+        inputs: Dict[str, str],
+        outputs: Dict[str, str],
+        params: Dict[str, Any],
+        duration_s: Optional[float] = None,
+    ) -> None:
+        """
+        Marks `stage` complete with the current fingerprints of its inputs and outputs
+        (and how long the run that produced them took).
+        """
+        entry = {
+            "params": params,
+            "completed_at": datetime.now(timezone.utc).isoformat(),
+            "duration_s": round(duration_s, 3) if duration_s is not None else None,
+        }
+        for kind, files in (("inputs", inputs), ("outputs", outputs)):
+            entry[kind] = {
+                name: {"path": path, "fingerprint": file_fingerprint(path)} for name, path in files.items()
+            }
+            missing = [name for name, v in entry[kind].items() if v["fingerprint"] is None]
+            if missing:
+                raise FileNotFoundError(f"Stage '{stage}' {kind} missing: {missing}")
+        with self._lock, self._file_lock():
+            # Other processes may have recorded stages since we loaded: merge, don't overwrite.
+            self._stages = {**self._stages, **self._read(), stage: entry}
+            self._write()
+
+    def stages(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return dict(self._stages)
+
+    def stage_timings(self) -> Dict[str, float]:
+        """
+        {stage: seconds} for every recorded stage with a known duration.
+        """
+        with self._lock:
+            return {name: e["duration_s"] for name, e in self._stages.items() if e.get("duration_s") is not None}
+
+    def _write(self) -> None:
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stages": self._stages}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
@@ -1,5 +1,6 @@
 from moviepy import VideoFileClip
 import os
+from .metrics import FFMPEG_DURATION, timed
 
 def convert_video(source_path: str, converted_save_path_or_ext: str) -> None:
     """
@@ -26,6 +27,7 @@ def convert_video(source_path: str, converted_save_path_or_ext: str) -> None:
         base, _ = os.path.splitext(source_path)
         save_path = f"{base}.{ext}"
     print(f"Converting {source_path} to {save_path} (format: {ext})")
-    video_clip = VideoFileClip(source_path)
-    video_clip.write_videofile(save_path)
+    with timed(FFMPEG_DURATION, operation="moviepy_convert"):
+        video_clip = VideoFileClip(source_path)
+        video_clip.write_videofile(save_path)
     print(f"Conversion complete: {save_path}")
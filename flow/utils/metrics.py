@@ -0,0 +1,137 @@
+import glob
+import os
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess, values
+
+# Process-wide Prometheus metrics for the pipeline, the workers and the API.
+# With PROMETHEUS_MULTIPROC_DIR set (Celery prefork children, API and worker containers sharing
+# the storage volume), every process writes its samples there and render_metrics() aggregates them.
+
+# Sample files are named <type>_<process id>.db. Containers sharing the directory each have
+# their own PID namespace (every worker container's Celery children get the same small pids),
+# so the id includes the host name; "_" is the collector's file name separator.
+_HOST = socket.gethostname().replace("_", "-")
+
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    values.ValueClass = values.MultiProcessValue(lambda: f"{_HOST}-{os.getpid()}")
+
+# Minutes-long stages and API calls need wider buckets than the client defaults.
+_STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, float("inf"))
+_CALL_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, float("inf"))
+
+STAGE_DURATION = Histogram(
+    "renarrate_stage_duration_seconds", "Wall time of pipeline stages that ran (not skipped).",
+    ["stage"], buckets=_STAGE_BUCKETS,
+)
+STAGE_SKIPPED = Counter("renarrate_stage_skipped_total", "Stages skipped thanks to a valid checkpoint.", ["stage"])
+STAGE_FAILURES = Counter("renarrate_stage_failures_total", "Pipeline stages that raised.", ["stage"])
+
+TTS_REQUEST_DURATION = Histogram(
+    "renarrate_tts_request_seconds", "Latency of single per-cue TTS requests (each attempt).",
+    ["provider"], buckets=_CALL_BUCKETS,
+)
+PROVIDER_RETRIES = Counter(
+    "renarrate_provider_retries_total", "Provider calls that failed and were retried or given up on.",
+    ["policy", "kind", "outcome"],
+)
+TRANSFER_BYTES = Counter(
+    "renarrate_transfer_bytes_total", "Bytes moved to or from external services.",
+    ["direction", "kind"],
+)
+FFMPEG_DURATION = Histogram(
+    "renarrate_ffmpeg_seconds", "Wall time of ffmpeg/MoviePy encode, mux and filter runs.",
+    ["operation"], buckets=_CALL_BUCKETS[:-1] + (300, 600, float("inf")),
+)
+
+QUEUE_DEPTH = Gauge("renarrate_queue_depth", "Jobs waiting in a queue.", ["queue"], multiprocess_mode="mostrecent")
+QUEUE_WAIT = Histogram(
+    "renarrate_queue_wait_seconds", "Time from enqueue until a consumer picked the job up.",
+    ["queue"], buckets=_STAGE_BUCKETS,
+)
+JOBS_FINISHED = Counter("renarrate_jobs_finished_total", "Jobs that reached a final state.", ["status"])
+
+
+# (histogram name, labels, seconds) observed by timed() during record_timings().
+Observation = Tuple[str, Dict[str, str], float]
+_recording: Optional[List[Observation]] = None
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels: str) -> Iterator[None]:
+    """
+    Observes the wall time of the block into histogram (also when the block raises).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        histogram.labels(**labels).observe(seconds)
+        if _recording is not None:
+            _recording.append((histogram.describe()[0].name, labels, seconds))
+
+
+def record_timings(fn: Callable[[], Any]) -> Tuple[Any, List[Observation]]:
+    """
+    Runs fn and also returns what timed() observed meanwhile, for a process-pool child
+    (one call at a time) to hand its samples to the parent, which replays them with
+    replay_timings(). Records nothing with PROMETHEUS_MULTIPROC_DIR set: the child's samples
+    are aggregated from there already. Observations of a call that raises are lost.
+    """
+    global _recording
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return fn(), []
+    _recording = []
+    try:
+        return fn(), _recording
+    finally:
+        _recording = None
+
+
+def replay_timings(observations: List[Observation]) -> None:
+    """
+    Observes samples recorded by record_timings() (in another process) into this process's histograms.
+    """
+    histograms = {h.describe()[0].name: h for h in globals().values() if isinstance(h, Histogram)}
+    for name, labels, seconds in observations:
+        histogram = histograms.get(name)
+        if histogram is not None:
+            histogram.labels(**labels).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Current metrics in the Prometheus text format, and their content type.
+    Aggregates every process's samples when running in multiprocess mode.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def clear_stale_files() -> int:
+    """
+    Deletes this host's sample files from PROMETHEUS_MULTIPROC_DIR, left there by a previous run
+    of the container (same host name). Run at container start, before the app records samples;
+    other containers' files are left alone. Returns the number of files removed.
+    """
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not directory:
+        return 0
+    paths = glob.glob(os.path.join(directory, f"*_{_HOST}-*.db"))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    print(f"Removed {clear_stale_files()} stale metrics file(s).")
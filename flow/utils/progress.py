@@ -0,0 +1,76 @@
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, Optional
+
+from settings import PROGRESS_MIN_INTERVAL_SECS
+
+# Progress of a running job, reported by the pipeline as it goes: a stage started, finished or
+# was skipped (valid checkpoint), and how many cues narration has rendered so far. Host mode
+# hands the events straight to the API's event broker; Celery stage tasks send them to the API
+# as "task-progress" task events. Either way clients receive them over SSE (api/events.py).
+
+PIPELINE_STAGES = ("download", "separate", "generate_cc", "translate", "narrate", "merge")
+
+
+@dataclass
+class ProgressEvent:
+    kind: str  # stage_started / stage_finished / stage_skipped / cues
+    stage: str
+    variant: Optional[str] = None  # fan-out branch key, for branch stages
+    done: Optional[int] = None  # cues: rendered so far
+    total: Optional[int] = None  # cues: submitted so far (grows while a streamed narration runs)
+    duration_s: Optional[float] = None  # stage_finished
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """
+        Rough share of the job (of its branch, for fan-out) that is done: each stage counts the
+        same, and narration advances cue by cue. None for stages outside PIPELINE_STAGES.
+        """
+        if self.stage not in PIPELINE_STAGES:
+            return None
+        within = 0.0
+        if self.kind in ("stage_finished", "stage_skipped"):
+            within = 1.0
+        elif self.kind == "cues" and self.total:
+            within = min(1.0, (self.done or 0) / self.total)
+        return (PIPELINE_STAGES.index(self.stage) + within) / len(PIPELINE_STAGES)
+
+    def to_dict(self) -> Dict[str, Any]:
+        fraction = self.fraction
+        return {**asdict(self), "fraction": round(fraction, 4) if fraction is not None else None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProgressEvent":
+        """
+        Inverse of to_dict; ignores unknown keys (e.g. the envelope fields of a task event).
+        """
+        return cls(**{f.name: data.get(f.name) for f in fields(cls)})
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+def cue_progress(
+    callback: ProgressCallback,
+    variant: Optional[str] = None,
+    min_interval: float = PROGRESS_MIN_INTERVAL_SECS,
+) -> Callable[[int, int], None]:
+    """
+    on_cue callback for narration that reports "cues" events to callback, at most once per
+    min_interval seconds (plus the last cue), however fast cached or checkpointed cues complete.
+    Safe to call from the TTS worker threads.
+    """
+    lock = threading.Lock()
+    last = [0.0]
+
+    def report(done: int, total: int) -> None:
+        now = time.monotonic()
+        with lock:
+            if done < total and now - last[0] < min_interval:
+                return
+            last[0] = now
+        callback(ProgressEvent(kind="cues", stage="narrate", variant=variant, done=done, total=total))
+
+    return report
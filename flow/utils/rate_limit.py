@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from settings import TTS_PROVIDER_LIMITS
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at `rate_per_s` up to `capacity`.
+    `acquire()` blocks until a token is available.
+    """
+    def __init__(self, rate_per_s: float, capacity: Optional[float] = None) -> None:
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be > 0")
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_s)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_s = (tokens - self._tokens) / self.rate_per_s
+            time.sleep(wait_s)
+
+
+class ProviderLimiter:
+    """
+    Combines a request-rate token bucket with a concurrency cap for one provider.
+    Use as a context manager around a single provider call:
+
+        with get_provider_limiter("gemini"):
+            ...
+    """
+    def __init__(self, name: str, max_concurrency: int, rpm: float) -> None:
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        # Allow a small burst (one slot per worker) but never more than a minute's budget.
+        self._bucket = TokenBucket(rate_per_s=rpm / 60.0, capacity=min(float(self.max_concurrency), max(1.0, rpm)))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def __enter__(self) -> "ProviderLimiter":
+        self._slots.acquire()
+        try:
+            self._bucket.acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._slots.release()
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    """
+    Returns the process-wide limiter for a provider, creating it from
+    settings.TTS_PROVIDER_LIMITS on first use so concurrent jobs share one budget.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            cfg = TTS_PROVIDER_LIMITS.get(provider, {})
+            limiter = ProviderLimiter(
+                name=provider,
+                max_concurrency=cfg.get("max_concurrency", 1),
+                rpm=cfg.get("rpm", 60.0),
+            )
+            _limiters[provider] = limiter
+        return limiter
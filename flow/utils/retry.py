@@ -0,0 +1,159 @@
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Literal, Optional, TypeVar
+
+from .metrics import PROVIDER_RETRIES
+
+T = TypeVar("T")
+
+ErrorKind = Literal["rate_limited", "transient", "permanent"]
+
+# Client-side statuses that are still worth retrying.
+_RETRYABLE_4XX = {408, 409, 425}
+_DURATION_RE = re.compile(r"^\s*(?P<secs>\d+(?:\.\d+)?)s\s*$")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+    - max_attempts: total calls, including the first one.
+    - base_delay_s / max_delay_s: backoff envelope for transient (5xx / network) errors.
+    - rate_limit_delay_s: backoff floor for 429s without a server hint.
+    - name: metrics label for calls made under this policy.
+    """
+    name: str = "default"
+    max_attempts: int = 6
+    base_delay_s: float = 0.5
+    max_delay_s: float = 60.0
+    rate_limit_delay_s: float = 5.0
+
+    def backoff(self, attempt: int, kind: ErrorKind) -> float:
+        """
+        Delay before retry number `attempt` (1-based), without any server hint.
+        """
+        base = self.rate_limit_delay_s if kind == "rate_limited" else self.base_delay_s
+        ceiling = min(self.max_delay_s, base * (2 ** (attempt - 1)))
+        if kind == "rate_limited":
+            # Never retry a 429 sooner than the floor; jitter only spreads concurrent callers.
+            return random.uniform(min(base, ceiling), ceiling)
+        return random.uniform(0.0, ceiling)
+
+
+# Text generation / file upload calls against Gemini.
+GEMINI_RETRY_POLICY = RetryPolicy(name="gemini", max_attempts=5, base_delay_s=1.0, max_delay_s=60.0, rate_limit_delay_s=10.0)
+# Per-cue TTS calls. Gemini TTS preview allows ~10 RPM, so a 429 backs off for at least ~6s.
+TTS_RETRY_POLICY = RetryPolicy(name="tts", max_attempts=10, base_delay_s=0.5, max_delay_s=60.0, rate_limit_delay_s=6.0)
+
+
+def _status_code(err: BaseException) -> Optional[int]:
+    """
+    HTTP status of a provider SDK error, if any.
+    google-genai APIError exposes `.code`, ElevenLabs ApiError exposes `.status_code`.
+    """
+    for attr in ("status_code", "code"):
+        value = getattr(err, attr, None)
+        if isinstance(value, int) and 100 <= value <= 599:
+            return value
+    response = getattr(err, "response", None)
+    value = getattr(response, "status_code", None)
+    if isinstance(value, int):
+        return value
+    return None
+
+
+def _headers(err: BaseException) -> Any:
+    headers = getattr(err, "headers", None)
+    if headers:
+        return headers
+    response = getattr(err, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+def classify_error(err: BaseException) -> ErrorKind:
+    """
+    Classifies a provider error:
+      - "rate_limited": HTTP 429 / RESOURCE_EXHAUSTED
+      - "transient": 5xx, timeouts, connection errors and unknown failures (e.g. an empty response)
+      - "permanent": any other 4xx (bad request, auth, not found) - retrying cannot help
+    """
+    code = _status_code(err)
+    if code == 429 or getattr(err, "status", None) == "RESOURCE_EXHAUSTED":
+        return "rate_limited"
+    if code is not None:
+        if code >= 500 or code in _RETRYABLE_4XX:
+            return "transient"
+        if 400 <= code < 500:
+            return "permanent"
+    if isinstance(err, (ValueError, TypeError, NotImplementedError)):
+        return "permanent"
+    return "transient"
+
+
+def retry_after_hint(err: BaseException) -> Optional[float]:
+    """
+    Seconds the provider asked us to wait, read from:
+      - a `Retry-After` header (seconds or HTTP date), as sent by ElevenLabs and Google front-ends
+      - google.rpc.RetryInfo `retryDelay` (e.g. "13s") in google-genai error details
+    """
+    headers = _headers(err)
+    raw = None
+    try:
+        raw = headers.get("retry-after") or headers.get("Retry-After")
+    except Exception:
+        raw = None
+    if raw:
+        try:
+            return max(0.0, float(raw))
+        except (TypeError, ValueError):
+            try:
+                when = parsedate_to_datetime(str(raw))
+                return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+            except Exception:
+                pass
+
+    details = getattr(err, "details", None)
+    if isinstance(details, dict):
+        inner = details.get("error", details)
+        details = inner.get("details") if isinstance(inner, dict) else None
+    if isinstance(details, list):
+        for item in details:
+            if isinstance(item, dict) and "retryDelay" in item:
+                m = _DURATION_RE.match(str(item["retryDelay"]))
+                if m:
+                    return float(m.group("secs"))
+    return None
+
+
+def call_with_retry(
+    fn: Callable[[], T],
+    policy: RetryPolicy,
+    description: str = "request",
+) -> T:
+    """
+    Calls `fn` until it succeeds, retrying rate-limited and transient errors with backoff.
+    Permanent errors are re-raised immediately; the last error is re-raised once
+    policy.max_attempts is exhausted.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            attempt += 1
+            kind = classify_error(e)
+            print(f"  ! {description} failed ({kind}, attempt {attempt}/{policy.max_attempts}): {e}")
+            if kind == "permanent" or attempt >= policy.max_attempts:
+                PROVIDER_RETRIES.labels(policy=policy.name, kind=kind, outcome="gave_up").inc()
+                raise
+            PROVIDER_RETRIES.labels(policy=policy.name, kind=kind, outcome="retried").inc()
+            delay = policy.backoff(attempt, kind)
+            hint = retry_after_hint(e)
+            if hint is not None:
+                delay = max(delay, hint)
+            print(f"  Retrying {description} in {delay:.1f} seconds...")
+            time.sleep(delay)
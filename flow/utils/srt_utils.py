@@ -1,6 +1,6 @@
 import re
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Tuple
 
 # Accept standard "HH:MM:SS,mmm" and your colon variant "HH:MM:SS:mmm",
 # plus common shortened forms without hours: "MM:SS,mmm" or "MM:SS:mmm",
@@ -104,4 +104,174 @@ def clean_srt_text(text: str) -> str:
     # Remove markdown code block lines
     text = re.sub(r"^```srt\s*$", "", text, flags=re.MULTILINE)
     text = re.sub(r"^```$", "", text, flags=re.MULTILINE)
-    return text.strip()
\ No newline at end of file
+    return text.strip()
+
+def format_timestamp(seconds: float) -> str:
+    """
+    Formats seconds as an SRT timestamp: HH:MM:SS,mmm.
+    """
+    total_ms = max(0, int(round(seconds * 1000)))
+    h, rem = divmod(total_ms, 3600_000)
+    m, rem = divmod(rem, 60_000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def format_srt(cues: List[SRTCue]) -> str:
+    """
+    Serializes cues to SRT text (cue indices are written as-is).
+    """
+    blocks = [
+        f"{c.index}\n{format_timestamp(c.start)} --> {format_timestamp(c.end)}\n{c.text}"
+        for c in cues
+    ]
+    return "\n\n".join(blocks) + ("\n" if blocks else "")
+
+
+def offset_cues(cues: List[SRTCue], offset_secs: float) -> List[SRTCue]:
+    """
+    Returns copies of the cues shifted by offset_secs.
+    """
+    return [SRTCue(index=c.index, start=c.start + offset_secs, end=c.end + offset_secs, text=c.text) for c in cues]
+
+
+def renumber_cues(cues: List[SRTCue], start: int = 1) -> List[SRTCue]:
+    """
+    Returns copies of the cues numbered consecutively from `start`.
+    """
+    return [SRTCue(index=start + i, start=c.start, end=c.end, text=c.text) for i, c in enumerate(cues)]
+
+
+# Arrow variants models emit between start and end timestamps.
+_ARROW_RE = re.compile(r"\s*(?:-->|->|—>|–>|→|=>|-- >)\s*")
+_LEADING_INDEX_RE = re.compile(r"^(?P<index>\d+)\s+(?=\d)")
+_MARKDOWN_LINE_RE = re.compile(r"^\s*(```[\w-]*|srt|SRT)\s*$")
+# One side of a timing line: only digits, separators and markdown emphasis, with at least one
+# separator between digits ("00:01:02,5", "1 00.01.02", "**00:01**"). Cue text such as
+# "Step 1 -> Step 2" does not qualify, however it splits on an arrow.
+_TIMESTAMP_LIKE_RE = re.compile(r"^[\d\s:.,;*]+$")
+_TIMESTAMP_SEP_RE = re.compile(r"\d\s*[:.,;]\s*\d")
+
+
+def _loose_ts_to_seconds(ts: str) -> float:
+    """
+    Lenient timestamp parser for model output. On top of what _ts_to_seconds accepts it handles
+    any mix of ':' ',' '.' separators, missing hours, and 1-2 digit fractions
+    ("00:01:02,5" -> 62.5s). Raises ValueError if the value cannot be interpreted.
+    """
+    ts = ts.strip().strip("*").strip()
+    if not re.fullmatch(r"\d+(?:[:,.]\d+){0,3}", ts):
+        raise ValueError(f"Invalid SRT timestamp: {ts!r}")
+    tokens = re.split(r"[:,.]", ts)
+    seps = re.findall(r"[:,.]", ts)
+    # The last token is a fraction when it follows ',' or '.', or has 3 digits after a 4th field.
+    has_fraction = bool(seps) and (seps[-1] in ",." or len(tokens) == 4 or len(tokens[-1]) == 3)
+    frac = tokens.pop() if has_fraction else "0"
+    if len(tokens) > 3 or len(frac) > 3:
+        raise ValueError(f"Invalid SRT timestamp: {ts!r}")
+    h, m, s = ([0, 0, 0] + [int(t) for t in tokens])[-3:]
+    if m >= 60 or s >= 60:
+        raise ValueError(f"Invalid SRT timestamp: {ts!r}")
+    return h * 3600 + m * 60 + s + int(frac.ljust(3, "0")) / 1000.0
+
+
+def _is_timing_line(line: str, parts: List[str]) -> bool:
+    """
+    Both sides of the arrow look like timestamps, or the line uses the SRT arrow "-->" and one
+    side does (a garbled timing line, kept so the block is reported for a model fix).
+    """
+    if len(parts) != 2:
+        return False
+    like = [bool(_TIMESTAMP_LIKE_RE.match(p) and _TIMESTAMP_SEP_RE.search(p)) for p in parts]
+    return all(like) or ("-->" in line and any(like))
+
+
+def repair_srt(srt_text: str) -> Tuple[List[SRTCue], List[str]]:
+    """
+    Deterministically parses messy model SRT output without an LLM round trip.
+    Scans line by line, so it tolerates stray markdown fences, missing blank lines between cues,
+    missing or inline cue indices, alternative arrows and loosely formatted timestamps.
+    Returns (cues, unparseable_blocks): cues keep their original order and text; every block whose
+    timing line could not be interpreted is returned verbatim so only those need a model fix.
+    Use tidy_cues() afterwards to sort, fix ranges and renumber.
+    A line is a timing line only if both sides of its arrow look like timestamps; arrows in
+    cue text stay text:
+
+    >>> cues, bad = repair_srt("1\\n00:00:01,000 --> 00:00:02,000\\nStep 1 -> Step 2\\n\\n2\\n00:00:02,500 --> 00:00:04,100\\nDone\\n")
+    >>> [(c.index, c.text) for c in cues], bad
+    ([(1, 'Step 1 -> Step 2'), (2, 'Done')], [])
+    """
+    lines = srt_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    cues: List[SRTCue] = []
+    bad_blocks: List[str] = []
+    # (index, start, end, text_lines, raw_lines); start/end are None for unparseable timing.
+    current: Optional[list] = None
+    pending_index: Optional[int] = None  # bare index seen before the first timing line
+
+    def _flush() -> None:
+        if current is None:
+            return
+        index, start, end, text_lines, raw_lines = current
+        while text_lines and not text_lines[-1].strip():
+            text_lines.pop()
+        if start is None or end is None:
+            bad_blocks.append("\n".join(raw_lines).strip())
+        elif text_lines:
+            cues.append(SRTCue(index=index or 0, start=start, end=end, text="\n".join(text_lines).strip()))
+
+    for line in lines:
+        stripped = line.strip()
+        if _MARKDOWN_LINE_RE.match(stripped):
+            continue
+        parts = _ARROW_RE.split(stripped)
+        if _is_timing_line(stripped, parts):
+            # Timing line. A bare integer just before it is this cue's index, not the previous cue's text.
+            index, pending_index = pending_index, None
+            if current is not None and current[3] and current[3][-1].strip().isdigit():
+                index = int(current[3].pop().strip())
+                current[4].pop()
+            _flush()
+            start_str, end_str = parts
+            m = _LEADING_INDEX_RE.match(start_str)
+            if m:
+                index = int(m.group("index"))
+                start_str = start_str[m.end():]
+            raw = ([str(index)] if index is not None else []) + [line]
+            try:
+                current = [index, _loose_ts_to_seconds(start_str), _loose_ts_to_seconds(end_str), [], raw]
+            except ValueError:
+                current = [index, None, None, [], raw]
+            continue
+        if current is None:
+            # Preamble before the first cue (e.g. "Here is the SRT:"), except the first cue's index.
+            pending_index = int(stripped) if stripped.isdigit() else None
+            continue
+        if not stripped:
+            if current[3]:
+                current[3].append("")
+            current[4].append(line)
+            continue
+        current[3].append(stripped)
+        current[4].append(line)
+    _flush()
+
+    # Trailing blank lines inside text are separators, not content.
+    for c in cues:
+        c.text = "\n".join(ln for ln in c.text.split("\n") if ln.strip())
+    return cues, bad_blocks
+
+
+def tidy_cues(cues: List[SRTCue], min_duration_secs: float = 0.05) -> List[SRTCue]:
+    """
+    Normalizes cue timing: swaps reversed ranges, sorts by start, trims each cue so it ends
+    no later than the next one starts, and renumbers from 1.
+    """
+    fixed = [
+        SRTCue(index=c.index, start=min(c.start, c.end), end=max(c.start, c.end), text=c.text)
+        for c in cues
+    ]
+    fixed.sort(key=lambda c: (c.start, c.end))
+    for cur, nxt in zip(fixed, fixed[1:]):
+        if cur.end > nxt.start:
+            cur.end = max(nxt.start, cur.start + min_duration_secs)
+    return renumber_cues(fixed)
@@ -0,0 +1,162 @@
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Literal
+
+import ffmpeg  # pip install ffmpeg-python
+import numpy as np
+
+from .metrics import FFMPEG_DURATION, timed
+from .timeline import pcm_to_array
+
+StretchQuality = Literal["fast", "balanced", "high"]
+
+
+@dataclass(frozen=True)
+class WSOLAParams:
+    """
+    WSOLA tuning knobs (all in milliseconds).
+    - frame_ms: analysis/synthesis frame length; output hop is half of it (50% overlap).
+    - search_ms: max shift around the nominal input position when looking for the best-aligned frame.
+    - normalized: use energy-normalized cross-correlation (more robust on level changes, slower).
+    - decimation: coarse search runs on every n-th sample, then is refined at full rate.
+    """
+    frame_ms: float
+    search_ms: float
+    normalized: bool = False
+    decimation: int = 1
+
+
+QUALITY_PRESETS: Dict[str, WSOLAParams] = {
+    "fast": WSOLAParams(frame_ms=40.0, search_ms=8.0, decimation=4),
+    "balanced": WSOLAParams(frame_ms=30.0, search_ms=10.0, decimation=2),
+    "high": WSOLAParams(frame_ms=25.0, search_ms=15.0, normalized=True),
+}
+
+
+def _correlate(region: np.ndarray, template: np.ndarray, normalized: bool) -> np.ndarray:
+    corr = np.correlate(region, template, mode="valid")
+    if normalized:
+        energy = np.convolve(region * region, np.ones(template.size, dtype=region.dtype), mode="valid")
+        corr = corr / np.sqrt(energy + 1e-9)
+    return corr
+
+
+def _best_offset(region: np.ndarray, template: np.ndarray, normalized: bool, decimation: int = 1) -> int:
+    """
+    Index in `region` where `template` aligns best (max cross-correlation).
+    With decimation > 1, a coarse search on every n-th sample is refined within +/- n samples.
+    """
+    if decimation <= 1:
+        return int(np.argmax(_correlate(region, template, normalized)))
+    coarse = decimation * int(np.argmax(_correlate(region[::decimation], template[::decimation], normalized)))
+    lo = max(0, coarse - decimation)
+    hi = min(region.size - template.size, coarse + decimation)
+    fine = _correlate(region[lo: hi + template.size], template, normalized)
+    return lo + int(np.argmax(fine))
+
+
+def wsola_time_stretch(
+    samples: np.ndarray,
+    target_len: int,
+    sample_rate: int = 24000,
+    quality: StretchQuality = "balanced",
+) -> np.ndarray:
+    """
+    Pitch-preserving time-stretch of mono int16 PCM to exactly target_len samples using
+    WSOLA (waveform-similarity overlap-add), entirely in memory.
+    Returns int16 samples.
+    """
+    if target_len <= 0:
+        raise ValueError("target_len must be > 0")
+    if samples.size == 0:
+        raise ValueError("Cannot time-stretch empty audio.")
+    params = QUALITY_PRESETS.get(quality)
+    if params is None:
+        raise ValueError(f"Unknown time-stretch quality: {quality!r}")
+
+    x = samples.astype(np.float32)
+    src_len = x.size
+    alpha = src_len / float(target_len)  # >1 compresses, <1 expands
+
+    frame = max(64, int(sample_rate * params.frame_ms / 1000.0)) & ~1
+    hop_out = frame // 2
+    search = max(1, int(sample_rate * params.search_ms / 1000.0))
+    window = np.hanning(frame).astype(np.float32)
+
+    # Pad so every candidate frame (nominal position +/- search, plus continuation) is in range.
+    pad = frame + search
+    tail = pad + 2 * frame + int(np.ceil(hop_out * alpha))
+    xp = np.concatenate([np.zeros(pad, dtype=np.float32), x, np.zeros(tail, dtype=np.float32)])
+
+    n_frames = int(np.ceil(target_len / hop_out)) + 1
+    out = np.zeros(n_frames * hop_out + frame, dtype=np.float32)
+    norm = np.zeros_like(out)
+
+    prev = pad  # input position (in xp) of the previously copied frame
+    for k in range(n_frames):
+        nominal = pad + int(round(k * hop_out * alpha))
+        if k == 0:
+            pos = nominal
+        else:
+            # The frame that would naturally follow the previous one in the source...
+            template = xp[prev + hop_out: prev + hop_out + frame]
+            # ...is matched against candidates around the nominal (tempo-scaled) position.
+            lo = max(0, nominal - search)
+            region = xp[lo: nominal + search + frame]
+            pos = lo + _best_offset(region, template, params.normalized, params.decimation)
+        o = k * hop_out
+        out[o: o + frame] += xp[pos: pos + frame] * window
+        norm[o: o + frame] += window
+        prev = pos
+
+    y = out[:target_len] / np.maximum(norm[:target_len], 1e-3)
+    if y.size < target_len:
+        y = np.concatenate([y, np.zeros(target_len - y.size, dtype=np.float32)])
+    return np.clip(y, -32768, 32767).astype("<i2")
+
+
+def _decompose_atempo_factor(f: float) -> List[float]:
+    """
+    Decompose a tempo factor into a product of factors inside [0.5, 2.0] so we can
+    chain 'atempo' filters when necessary.
+    """
+    if f <= 0 or math.isinf(f) or math.isnan(f):
+        raise ValueError(f"Invalid atempo factor: {f}")
+
+    factors: List[float] = []
+    while f > 2.0:
+        factors.append(2.0)
+        f /= 2.0
+    while f < 0.5:
+        factors.append(0.5)
+        f /= 0.5  # equivalent to f *= 2
+    if not (0.98 <= f <= 1.02):
+        factors.append(f)
+    return factors
+
+
+def ffmpeg_time_stretch(
+    samples: np.ndarray, target_secs: float, sample_rate: int = 24000
+) -> np.ndarray:
+    """
+    Pitch-preserving time-stretch of in-memory int16 PCM to a specific duration using
+    FFmpeg 'atempo'. Audio is piped through stdin/stdout; the source duration comes from
+    the sample count, so no probe or temporary files are needed.
+    """
+    if target_secs <= 0:
+        raise ValueError("target_secs must be > 0")
+    if samples.size == 0:
+        raise ValueError("Cannot time-stretch empty audio.")
+    src_dur = samples.size / float(sample_rate)
+
+    # Tempo factor: >1.0 -> faster (shorter); <1.0 -> slower (longer)
+    atempo = src_dur / target_secs
+    chain = _decompose_atempo_factor(atempo)
+
+    stream = ffmpeg.input("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+    for f in chain:
+        stream = stream.filter("atempo", f)
+    out = ffmpeg.output(stream, "pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+    with timed(FFMPEG_DURATION, operation="atempo"):
+        stretched, _ = out.run(input=samples.astype("<i2", copy=False).tobytes(), capture_stdout=True, quiet=True)
+    return pcm_to_array(stretched)
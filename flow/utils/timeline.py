@@ -0,0 +1,68 @@
+import wave
+import numpy as np
+
+INT16_MAX = np.iinfo(np.int16).max
+INT16_MIN = np.iinfo(np.int16).min
+
+
+def pcm_to_array(pcm: bytes) -> np.ndarray:
+    """
+    Decode raw little-endian 16-bit mono PCM into an int16 NumPy array (no copy).
+    """
+    usable = len(pcm) - (len(pcm) % 2)
+    return np.frombuffer(pcm[:usable], dtype="<i2")
+
+
+def pcm_duration_secs(pcm: bytes, sample_rate: int, sample_width: int = 2, channels: int = 1) -> float:
+    """
+    Duration of raw PCM audio computed from its byte length.
+    """
+    return len(pcm) / float(sample_rate * sample_width * channels)
+
+
+class NarrationTimeline:
+    """
+    In-memory mono narration track. Clips are mixed into a preallocated float32 buffer
+    at their start sample with a vectorized add; the buffer grows only if a clip overruns
+    the current duration (capacity doubles, so a timeline filled incrementally from an
+    unknown duration stays linear). The result is clipped to int16 and written as a WAV in one pass.
+    """
+    def __init__(self, duration_secs: float, sample_rate: int = 24000) -> None:
+        self.sample_rate = sample_rate
+        self._length = max(1, int(np.ceil(duration_secs * sample_rate)))
+        self._buffer = np.zeros(self._length, dtype=np.float32)
+        self._clips = 0
+
+    @property
+    def clip_count(self) -> int:
+        return self._clips
+
+    @property
+    def duration_secs(self) -> float:
+        return self._length / float(self.sample_rate)
+
+    def add(self, start_secs: float, samples: np.ndarray) -> None:
+        """
+        Mix int16 samples into the timeline starting at start_secs (no trimming).
+        """
+        if samples.size == 0:
+            return
+        offset = max(0, int(start_secs * self.sample_rate))
+        end = offset + samples.size
+        if end > len(self._buffer):
+            grown = np.zeros(max(end, 2 * len(self._buffer)), dtype=np.float32)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._length = max(self._length, end)
+        self._buffer[offset:end] += samples.astype(np.float32, copy=False)
+        self._clips += 1
+
+    def to_int16(self) -> np.ndarray:
+        return np.clip(self._buffer[:self._length], INT16_MIN, INT16_MAX).astype("<i2")
+
+    def write_wav(self, path: str) -> None:
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(self.to_int16().tobytes())
@@ -1,65 +1,556 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
 from flow.download import download_video
 from flow.separate import separate_audio
-from flow.generate_cc import generate_cc
-from flow.translate_cc import translate_transcription
-from flow.renarrate import generate_narration
-from flow.merge import merge_video_audio
+from flow.generate_cc import CC_MODEL, CC_PROMPT_VERSION, generate_cc, stream_cc
+from flow.translate_cc import TRANSLATE_MODEL, stream_translation, translate_transcription
+from flow.renarrate import NarrationRenderer, generate_narration
+from flow.merge import merge_audio_tracks, merge_video_audio
 from flow.models.video_paths import VideoProcessingPaths
 from flow.tts.gemini_voices import select_voice_by_name as select_gemini_voice
 from flow.tts.elevenlabs_voices import select_voice_by_name as select_elevenlabs_voice
 from flow.models.voices import Voice
 from flow.utils.convert import convert_video
 from flow.utils.languages import select_language_by_name
-from settings import STORAGE_DIR
+from flow.utils.checkpoint import StageManifest
+from flow.utils.metrics import STAGE_DURATION, STAGE_FAILURES, STAGE_SKIPPED
+from flow.utils.progress import ProgressCallback, ProgressEvent, cue_progress
+from flow.utils.srt_utils import SRTCue, parse_srt
+from settings import FANOUT_MAX_BRANCHES, STORAGE_DIR, STREAMING_PIPELINE, TRANSLATE_MAX_WORKERS, TRANSLATE_WINDOW_CUES
+
+
+
+def resolve_voice(tts_provider: str, voice_name: Optional[str] = None) -> Voice:
+    """
+    Resolves a provider-specific voice by display name (provider default if None).
+    """
+    if tts_provider == "gemini":
+        return select_gemini_voice(voice_name or "Orus")
+    return select_elevenlabs_voice(voice_name or "Daniel")
+
+
+def resolve_language(target_language: str) -> str:
+    """
+    Best-effort fuzzy language resolution; returns the input unchanged if it cannot be resolved.
+    """
+    try:
+        return select_language_by_name(target_language)
+    except Exception:
+        # keep whatever was supplied; translation will error if invalid
+        return target_language
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline DAG. Edges are implicit: a stage's inputs are upstream outputs.
+    `run` is a picklable partial of a module-level function, so an executor may ship it to
+    another process; `kind` tells it whether the stage is CPU-bound ("cpu": ffmpeg encodes)
+    or mostly waits on the network ("io": download, Gemini, TTS). Only "io" stages may carry
+    a progress callback (narrate's on_cue), as they always run in-process.
+    """
+    name: str
+    run: Callable[[], Any]
+    inputs: Dict[str, str]  # artifact name -> path
+    outputs: Dict[str, str]
+    params: Dict[str, Any] = field(default_factory=dict)  # anything else that changes the outputs
+    kind: str = "io"
 
 
+# Runs one stage and returns when it is done, e.g. by handing stage.run to a pool that
+# matches stage.kind. The default (None) calls stage.run() in the calling thread.
+StageExecutor = Callable[[Stage], Any]
 
-def run_pipeline(video_url: str, target_language: str, voice:Voice, original_audio_loudness:float=0.13) -> VideoProcessingPaths:
+
+def _shared_stages(video_url: str, processing_paths: VideoProcessingPaths) -> List[Stage]:
+    """
+    Stages that depend only on the source video: download, separate audio, generate CC.
+    """
+    return [
+        # Step 1: Download video
+        Stage(
+            name="download",
+            run=partial(download_video, video_url, processing_paths.downloaded_video_path, processing_paths.video_info_path),
+            inputs={},
+            outputs={"video": processing_paths.downloaded_video_path, "info": processing_paths.video_info_path},
+            params={"video_url": video_url},
+        ),
+        # Step 2: Separate audio
+        Stage(
+            name="separate",
+            run=partial(
+                separate_audio,
+                source_video_path=processing_paths.downloaded_video_path,
+                audio_no_video_path=processing_paths.audio_no_video_path,
+            ),
+            inputs={"video": processing_paths.downloaded_video_path},
+            outputs={"audio": processing_paths.audio_no_video_path},
+            kind="cpu",
+        ),
+        # Step 3: Generate CC
+        Stage(
+            name="generate_cc",
+            run=partial(generate_cc, processing_paths.audio_no_video_path, processing_paths.generated_cc_path),
+            inputs={"audio": processing_paths.audio_no_video_path},
+            outputs={"cc": processing_paths.generated_cc_path},
+            params={"model": CC_MODEL, "prompt_version": CC_PROMPT_VERSION},
+        ),
+    ]
+
+
+def _branch_stages(
+    processing_paths: VideoProcessingPaths,
+    target_language: str,
+    voice: Voice,
+    original_audio_loudness: float,
+    on_cue: Optional[Callable[[int, int], None]] = None,
+) -> List[Stage]:
+    """
+    Stages that depend on the target language/voice: translate CC, generate narration, merge.
+    on_cue is passed to generate_narration for cue progress.
+    """
+    return [
+        # Step 4: Translate CC
+        Stage(
+            name="translate",
+            run=partial(
+                translate_transcription,
+                original_cc_path=processing_paths.generated_cc_path,
+                target_language=target_language,
+                translated_cc_save_path=processing_paths.translated_cc_path
+            ),
+            inputs={"cc": processing_paths.generated_cc_path},
+            outputs={"translated_cc": processing_paths.translated_cc_path},
+            params={"target_language": target_language, "model": TRANSLATE_MODEL},
+        ),
+        # Step 5: Renarrate (resumes from per-cue checkpoints after a failure)
+        Stage(
+            name="narrate",
+            run=partial(
+                generate_narration,
+                translated_cc_path=processing_paths.translated_cc_path,
+                generated_narration_save_path=processing_paths.generated_narration_path,
+                voice=voice,
+                checkpoint_dir=processing_paths.narration_cues_dir,
+                on_cue=on_cue,
+            ),
+            inputs={"translated_cc": processing_paths.translated_cc_path},
+            outputs={"narration": processing_paths.generated_narration_path},
+            params={"provider": voice.provider, "voice_id": voice.id},
+        ),
+        # Step 6: Merge
+        Stage(
+            name="merge",
+            run=partial(
+                merge_video_audio,
+                original_video_path=processing_paths.downloaded_video_path,
+                generated_narration_path=processing_paths.generated_narration_path,
+                final_video_save_path=processing_paths.final_video_path,
+                original_audio_volume_percentage=original_audio_loudness
+            ),
+            inputs={"video": processing_paths.downloaded_video_path, "narration": processing_paths.generated_narration_path},
+            outputs={"final_video": processing_paths.final_video_path},
+            params={"original_audio_loudness": original_audio_loudness},
+            kind="cpu",
+        ),
+    ]
+
+
+def _run_stages(
+    stages: List[Stage],
+    manifest: StageManifest,
+    variant: Optional[str] = None,
+    on_stage: Optional[Callable[[str], None]] = None,
+    executor: Optional[StageExecutor] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """
+    Runs stages in order, skipping those whose manifest checkpoint is still valid and
+    recording each one that completes. on_stage, if given, is called with each stage name
+    before it runs; executor, if given, runs the stage instead of the calling thread;
+    on_progress, if given, receives stage started/finished/skipped events.
+    """
+    def report(kind: str, stage: str, duration_s: Optional[float] = None) -> None:
+        if on_progress:
+            on_progress(ProgressEvent(kind=kind, stage=stage, variant=variant, duration_s=duration_s))
+
+    for stage in stages:
+        key = f"{stage.name}.{variant}" if variant else stage.name
+        if manifest.is_fresh(key, stage.inputs, stage.outputs, stage.params):
+            print(f"Stage '{key}' is up to date, skipping.")
+            STAGE_SKIPPED.labels(stage=stage.name).inc()
+            report("stage_skipped", stage.name)
+            continue
+        if on_stage:
+            on_stage(stage.name)
+        report("stage_started", stage.name)
+        start = time.perf_counter()
+        try:
+            executor(stage) if executor else stage.run()
+        except BaseException:
+            STAGE_FAILURES.labels(stage=stage.name).inc()
+            raise
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage=stage.name).observe(elapsed)
+        print(f"Stage '{key}' finished in {elapsed:.1f}s")
+        manifest.record(key, stage.inputs, stage.outputs, stage.params, duration_s=elapsed)
+        report("stage_finished", stage.name, round(elapsed, 3))
+
+
+def _srt_batches(srt_path: str, size: int) -> Iterator[List[SRTCue]]:
+    """
+    The cues of an existing SRT file in batches of size, as a stand-in for a cue stream.
+    """
+    with open(srt_path, "r", encoding="utf-8") as f:
+        cues = parse_srt(f.read())
+    for i in range(0, len(cues), size):
+        yield cues[i:i + size]
+
+
+def _run_streamed_stages(
+    processing_paths: VideoProcessingPaths,
+    target_language: str,
+    voice: Voice,
+    stages: List[Stage],
+    manifest: StageManifest,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """
+    Runs generate_cc -> translate -> narrate overlapped instead of one after another:
+    transcribed chunks stream into translation, and each translated batch is queued for TTS
+    right away while the next chunks are still being transcribed and translated. The same
+    artifacts are written and the same manifest entries recorded as by the sequential stages,
+    so checkpoints are interchangeable between the two modes. Leading stages with a valid
+    checkpoint are skipped, and their SRT is streamed into the first stage that has to run.
+    Progress is reported as the skipped stages, the first stage that runs starting, then
+    narration's cue progress, then the stages that ran finishing.
+    """
+    # A stage is only as fresh as the stages it reads from.
+    fresh: List[Stage] = []
+    for st in stages:
+        if not manifest.is_fresh(st.name, st.inputs, st.outputs, st.params):
+            break
+        fresh.append(st)
+    to_run = stages[len(fresh):]
+
+    def report(kind: str, targets: List[Stage], duration_s: Optional[float] = None) -> None:
+        if on_progress:
+            for st in targets:
+                on_progress(ProgressEvent(kind=kind, stage=st.name, duration_s=duration_s))
+
+    if fresh:
+        print(f"Stages {', '.join(repr(st.name) for st in fresh)} are up to date, skipping.")
+        for st in fresh:
+            STAGE_SKIPPED.labels(stage=st.name).inc()
+        report("stage_skipped", fresh)
+    if not to_run:
+        return
+    print(f"Running {', '.join(st.name for st in to_run)} as a stream...")
+    report("stage_started", to_run[:1])
+    start = time.perf_counter()
+    renderer = NarrationRenderer(
+        voice,
+        checkpoint_dir=processing_paths.narration_cues_dir,
+        on_cue=cue_progress(on_progress) if on_progress else None,
+    )
+    try:
+        translated_batches: Iterable[List[SRTCue]]
+        if len(fresh) >= 2:  # transcript and translation are valid: only narration runs
+            translated_batches = _srt_batches(processing_paths.translated_cc_path, TRANSLATE_WINDOW_CUES)
+        else:
+            if fresh:  # valid transcript: translate it in batches that fill the translation pool
+                cue_batches = _srt_batches(processing_paths.generated_cc_path, TRANSLATE_WINDOW_CUES * TRANSLATE_MAX_WORKERS)
+            else:
+                cue_batches = stream_cc(processing_paths.audio_no_video_path, processing_paths.generated_cc_path)
+            translated_batches = stream_translation(cue_batches, target_language, processing_paths.translated_cc_path)
+        for translated in translated_batches:
+            renderer.submit(translated)
+        renderer.finish(processing_paths.generated_narration_path)
+    except BaseException:
+        renderer.close()
+        STAGE_FAILURES.labels(stage="stream").inc()
+        raise
+    # The streamed stages overlap, so they share one wall time.
+    elapsed = time.perf_counter() - start
+    STAGE_DURATION.labels(stage="stream").observe(elapsed)
+    for st in to_run:
+        manifest.record(st.name, st.inputs, st.outputs, st.params, duration_s=elapsed)
+    report("stage_finished", to_run, round(elapsed, 3))
+
+
+def run_pipeline(video_url: str, target_language: str, voice:Voice, original_audio_loudness:float=0.13, request_id: Optional[str] = None, streaming: bool = STREAMING_PIPELINE, stage_executor: Optional[StageExecutor] = None, on_progress: Optional[ProgressCallback] = None) -> VideoProcessingPaths:
     """
     Runs the full video processing pipeline: download, separate audio, generate CC, translate CC, generate narration, and merge.
+    Completed stages are checkpointed in the job's manifest.json: re-running with the same
+    request_id skips every stage whose artifacts are still valid and resumes narration from
+    the first missing cue.
     Args:
         video_url (str): The URL of the video to process.
         target_language (str): The language to translate the CC into.
+        request_id (Optional[str]): Job directory name; reuse it to resume a failed run.
+        streaming (bool): Overlap transcription, translation and narration (see
+            _run_streamed_stages) so the total time approaches that of the slowest stage.
+        stage_executor (Optional[StageExecutor]): Runs each sequential stage, e.g. on a
+            process pool for CPU-bound stages (the streamed stages always run in this thread).
+        on_progress (Optional[ProgressCallback]): Receives stage and narration cue progress
+            events (called from pipeline threads).
     Returns:
         str: Path to the final processed video file.
     """
-    processing_paths = VideoProcessingPaths(base_dir=STORAGE_DIR, create=True)
-
-    # Step 1: Download video
-    download_video(video_url, processing_paths.downloaded_video_path, processing_paths.video_info_path)
+    processing_paths = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=request_id, create=True)
+    manifest = StageManifest(processing_paths.manifest_path)
+    stages = _shared_stages(video_url, processing_paths) + _branch_stages(
+        processing_paths, target_language, voice, original_audio_loudness,
+        on_cue=cue_progress(on_progress) if on_progress else None,
+    )
+    if not streaming:
+        _run_stages(stages, manifest, executor=stage_executor, on_progress=on_progress)
+        return processing_paths
 
-    # Step 2: Separate audio
-    separate_audio(
-        source_video_path=processing_paths.downloaded_video_path,
-        audio_no_video_path=processing_paths.audio_no_video_path,
-        video_no_audio_path=processing_paths.video_no_audio_path
+    by_name = {st.name: st for st in stages}
+    _run_stages([by_name["download"], by_name["separate"]], manifest, executor=stage_executor, on_progress=on_progress)
+    _run_streamed_stages(
+        processing_paths, target_language, voice,
+        [by_name["generate_cc"], by_name["translate"], by_name["narrate"]], manifest, on_progress=on_progress,
     )
+    _run_stages([by_name["merge"]], manifest, executor=stage_executor, on_progress=on_progress)
+    return processing_paths
 
-    # Step 3: Generate CC
-    generate_cc(processing_paths.audio_no_video_path, processing_paths.generated_cc_path)
 
-    # Step 4: Translate CC
-    translate_transcription(
-        original_cc_path=processing_paths.generated_cc_path,
-        target_language=target_language,
-        translated_cc_save_path=processing_paths.translated_cc_path
-    )
+def run_stage(
+    stage_name: str,
+    video_url: str,
+    request_id: str,
+    target_language: Optional[str] = None,
+    voice: Optional[Voice] = None,
+    original_audio_loudness: float = 0.13,
+    variant: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> VideoProcessingPaths:
+    """
+    Runs a single stage of a job, checkpointed exactly as in run_pipeline (a no-op if its
+    manifest entry is still valid). For schedulers that dispatch stages themselves, such as
+    the Celery stage tasks; artifacts are found through the job directory, so only the job's
+    parameters need to travel between stages.
+    Args:
+        stage_name (str): download, separate, generate_cc, translate, narrate or merge.
+        video_url (str): The URL of the video to process.
+        request_id (str): Job directory name.
+        target_language (Optional[str]): Required for translate/narrate/merge.
+        voice (Optional[Voice]): Required for translate/narrate/merge.
+        original_audio_loudness (float): Linear gain of the original audio under the narration.
+        variant (Optional[str]): Fan-out branch key for branch stages.
+        on_progress (Optional[ProgressCallback]): Receives the stage's progress events.
+    Returns:
+        VideoProcessingPaths: The job's paths (the branch's, for a branch stage).
+    Raises:
+        ValueError: If the stage is unknown or a branch stage lacks its language/voice.
+    """
+    processing_paths = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=request_id, create=True)
+    manifest = StageManifest(processing_paths.manifest_path)
+    stages = {st.name: st for st in _shared_stages(video_url, processing_paths)}
+    if stage_name in stages:
+        _run_stages([stages[stage_name]], manifest, on_progress=on_progress)
+        return processing_paths
+    if target_language is None or voice is None:
+        raise ValueError(f"Stage '{stage_name}' needs a target language and voice.")
+    if variant:
+        processing_paths = processing_paths.for_branch(variant)
+    stages = {st.name: st for st in _branch_stages(
+        processing_paths, target_language, voice, original_audio_loudness,
+        on_cue=cue_progress(on_progress, variant) if on_progress else None,
+    )}
+    if stage_name not in stages:
+        raise ValueError(f"Unknown stage: {stage_name!r}")
+    _run_stages([stages[stage_name]], manifest, variant=variant, on_progress=on_progress)
+    return processing_paths
 
-    # Step 5: Renarrate
-    # select voice
-    generate_narration(
-        translated_cc_path=processing_paths.translated_cc_path,
-        generated_narration_save_path=processing_paths.generated_narration_path,
-        voice=voice
-    )
 
-    # Step 6: Merge
-    merge_video_audio(
-        original_video_path=processing_paths.downloaded_video_path,
-        generated_narration_path=processing_paths.generated_narration_path,
-        final_video_save_path=processing_paths.final_video_path,
-        original_audio_volume_percentage=original_audio_loudness
-    )
+def branch_key(target_language: str, voice: Voice) -> str:
+    """
+    Filesystem-safe branch identifier, e.g. "pl-pl-daniel".
+    """
+    return re.sub(r"[^a-z0-9]+", "-", f"{target_language}-{voice.name}".lower()).strip("-")
 
-    return processing_paths
 
+def read_stage_timings(request_id: str) -> Dict[str, float]:
+    """
+    {stage: seconds} recorded in a job directory's manifest (empty if there is none yet).
+    """
+    manifest_path = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=request_id, create=False).manifest_path
+    if not os.path.exists(manifest_path):
+        return {}
+    return StageManifest(manifest_path).stage_timings()
+
+
+@dataclass
+class NarrationBranch:
+    """
+    One output variant of a fan-out job: a target language narrated with a voice.
+    """
+    target_language: str
+    voice: Voice
+    key: str = ""
+
+    def __post_init__(self):
+        if not self.key:
+            self.key = branch_key(self.target_language, self.voice)
+
+
+@dataclass
+class FanoutResult:
+    paths: VideoProcessingPaths  # shared artifacts
+    branch_paths: Dict[str, VideoProcessingPaths] = field(default_factory=dict)  # successful branches
+    errors: Dict[str, str] = field(default_factory=dict)  # failed branches
+    multitrack_video_path: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Flattened job-level paths (plus request_id). final_video_path is the multitrack file
+        when there is one, else the first successful branch's video; per-branch translation and
+        narration paths live with each branch.
+        """
+        flat = self.paths.to_dict()
+        for key in ("translated_cc_path", "generated_narration_path"):
+            flat.pop(key)
+        first_branch = next(iter(self.branch_paths.values()))
+        flat["final_video_path"] = self.multitrack_video_path or first_branch.final_video_path
+        if self.multitrack_video_path:
+            flat["multitrack_video_path"] = self.multitrack_video_path
+        return flat
+
+
+# Called as on_branch_update(branch_key, patch) with patch keys among status/stage/error/paths.
+BranchUpdateCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def run_fanout_pipeline(
+    video_url: str,
+    branches: List[NarrationBranch],
+    original_audio_loudness: float = 0.13,
+    multitrack: bool = True,
+    max_parallel_branches: int = FANOUT_MAX_BRANCHES,
+    on_branch_update: Optional[BranchUpdateCallback] = None,
+    request_id: Optional[str] = None,
+    stage_executor: Optional[StageExecutor] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> FanoutResult:
+    """
+    Renarrates one video into several languages/voices. Download, audio separation and CC run
+    once; then a translate -> narrate -> merge branch per (language, voice) runs concurrently
+    (at most max_parallel_branches at a time) on the shared artifacts.
+    A failed branch does not stop the others; the run only fails if every branch fails.
+    Stages are checkpointed as in run_pipeline, so re-running with the same request_id only
+    redoes the failed branches.
+    Args:
+        video_url (str): The URL of the video to process.
+        branches (List[NarrationBranch]): Output variants; keys must be unique.
+        original_audio_loudness (float): Linear gain of the original audio under the narration.
+        multitrack (bool): Also mux all successful branches into one multi-audio-track MKV.
+        max_parallel_branches (int): Max branches running at once.
+        on_branch_update (Optional[BranchUpdateCallback]): Progress callback per branch
+            (called from worker threads).
+        request_id (Optional[str]): Job directory name; reuse it to resume a failed run.
+        stage_executor (Optional[StageExecutor]): Runs each stage (see run_pipeline).
+        on_progress (Optional[ProgressCallback]): Progress events (see run_pipeline); branch
+            stage events carry the branch key as their variant.
+    Returns:
+        FanoutResult: Shared paths, per-branch paths and errors, and the multitrack video path.
+    Raises:
+        ValueError: If branches is empty or has duplicate keys.
+        RuntimeError: If every branch fails.
+    """
+    if not branches:
+        raise ValueError("At least one branch is required.")
+    keys = [b.key for b in branches]
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"Duplicate branch keys: {keys}")
+
+    notify_lock = threading.Lock()
+
+    def notify(key: str, **patch: Any) -> None:
+        if on_branch_update is None:
+            return
+        with notify_lock:
+            on_branch_update(key, patch)
+
+    processing_paths = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=request_id, create=True)
+    manifest = StageManifest(processing_paths.manifest_path)
+    result = FanoutResult(paths=processing_paths)
+    try:
+        _run_stages(_shared_stages(video_url, processing_paths), manifest, executor=stage_executor, on_progress=on_progress)
+    except Exception as e:
+        for b in branches:
+            notify(b.key, status="FAILED", error=f"Shared stages failed: {e}")
+        raise
+
+    def run_branch(branch: NarrationBranch) -> VideoProcessingPaths:
+        bpaths = processing_paths.for_branch(branch.key)
+        notify(branch.key, status="RUNNING")
+        _run_stages(
+            _branch_stages(
+                bpaths, branch.target_language, branch.voice, original_audio_loudness,
+                on_cue=cue_progress(on_progress, branch.key) if on_progress else None,
+            ),
+            manifest,
+            variant=branch.key,
+            on_stage=lambda stage: notify(branch.key, stage=stage),
+            executor=stage_executor,
+            on_progress=on_progress,
+        )
+        return bpaths
+
+    print(f"Running {len(branches)} branch(es): {', '.join(keys)}")
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_branches), thread_name_prefix="branch") as pool:
+        futures = {b.key: pool.submit(run_branch, b) for b in branches}
+        for key, future in futures.items():
+            try:
+                bpaths = future.result()
+            except Exception as e:
+                print(f"  ! Branch {key} failed: {e}")
+                result.errors[key] = str(e)
+                notify(key, status="FAILED", error=str(e))
+                continue
+            result.branch_paths[key] = bpaths
+            notify(key, status="SUCCESS", stage=None, paths=bpaths.to_dict())
+
+    return finish_fanout(result, branches, multitrack)
+
+
+def finish_fanout(result: FanoutResult, branches: List[NarrationBranch], multitrack: bool = True) -> FanoutResult:
+    """
+    Completes a fan-out run once every branch has finished: fails if no branch succeeded,
+    otherwise muxes the successful branches into one multitrack video if requested.
+    Args:
+        result (FanoutResult): Shared paths plus per-branch paths and errors.
+        branches (List[NarrationBranch]): The job's branches (for track languages and titles).
+        multitrack (bool): Also mux all successful branches into one multi-audio-track MKV.
+    Returns:
+        FanoutResult: result, with multitrack_video_path set if the mux succeeded.
+    Raises:
+        RuntimeError: If every branch failed.
+    """
+    if not result.branch_paths:
+        raise RuntimeError(f"All {len(branches)} branches failed: {result.errors}")
+
+    if multitrack:
+        processing_paths = result.paths
+        by_key = {b.key: b for b in branches}
+        tracks = [
+            (bpaths.final_video_path, by_key[key].target_language, f"{by_key[key].target_language} ({by_key[key].voice.name})")
+            for key, bpaths in result.branch_paths.items()
+        ]
+        try:
+            merge_audio_tracks(processing_paths.downloaded_video_path, tracks, processing_paths.multitrack_video_path)
+            result.multitrack_video_path = processing_paths.multitrack_video_path
+        except Exception as e:
+            # The per-branch videos are complete; the combined file is a convenience.
+            print(f"  ! Multitrack mux failed, keeping per-branch videos only: {e}")
+    return result
@@ -2,5 +2,87 @@ import os
 
 # Constants for the flow
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STORAGE_DIR = os.path.join(BASE_DIR, 'storage')
+STORAGE_DIR = os.getenv('STORAGE_DIR', os.path.join(BASE_DIR, 'storage'))
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+# Per-provider TTS throughput limits (override via env).
+# Gemini TTS preview is ~10 RPM on Tier 1; ElevenLabs limits concurrent requests per tier.
+TTS_PROVIDER_LIMITS = {
+    "gemini": {
+        "max_concurrency": int(os.getenv("GEMINI_TTS_CONCURRENCY", "2")),
+        "rpm": float(os.getenv("GEMINI_TTS_RPM", "10")),
+    },
+    "elevenlabs": {
+        "max_concurrency": int(os.getenv("ELEVENLABS_TTS_CONCURRENCY", "4")),
+        "rpm": float(os.getenv("ELEVENLABS_TTS_RPM", "300")),
+    },
+}
+
+# On-disk cache of synthesized TTS fragments (PCM), LRU-evicted past the size bound.
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(STORAGE_DIR, "tts_cache"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Debug: also write each narrated cue to <job>/tts_fragments/cue_XXXXX.wav.
+DEBUG_TTS_FRAGMENTS = os.getenv("DEBUG_TTS_FRAGMENTS", "0") == "1"
+
+# Time-stretch engine for overlong cues: "wsola" (in-process NumPy) or "ffmpeg" (atempo subprocess).
+TIME_STRETCH_ENGINE = os.getenv("TIME_STRETCH_ENGINE", "wsola")
+# WSOLA quality/speed trade-off: "fast", "balanced" or "high".
+TIME_STRETCH_QUALITY = os.getenv("TIME_STRETCH_QUALITY", "balanced")
+
+# Shared store of downloaded source videos, keyed by canonical video id + format selector.
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join(STORAGE_DIR, "download_cache"))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Chunked transcription: audio longer than ~CC_CHUNK_MINUTES is split at silences and
+# transcribed with up to CC_MAX_WORKERS concurrent Gemini requests (0 disables chunking).
+CC_CHUNK_MINUTES = float(os.getenv("CC_CHUNK_MINUTES", "5"))
+CC_MAX_WORKERS = int(os.getenv("CC_MAX_WORKERS", "4"))
+
+# Windowed translation: cues per request, read-only context cues on each side, concurrent windows.
+TRANSLATE_WINDOW_CUES = int(os.getenv("TRANSLATE_WINDOW_CUES", "40"))
+TRANSLATE_CONTEXT_CUES = int(os.getenv("TRANSLATE_CONTEXT_CUES", "3"))
+TRANSLATE_MAX_WORKERS = int(os.getenv("TRANSLATE_MAX_WORKERS", "4"))
+
+# Translation memory (SQLite): per-cue translations reused across jobs and languages.
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(STORAGE_DIR, "translation_memory.sqlite3"))
+TRANSLATION_MEMORY_TTL_DAYS = float(os.getenv("TRANSLATION_MEMORY_TTL_DAYS", "180"))
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "500000"))
+
+# Validated transcripts keyed by extracted-audio content hash + ASR model/prompt version.
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join(STORAGE_DIR, "transcript_cache"))
+
+# Job records (API job store): SQLite database in WAL mode.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(STORAGE_DIR, "jobs.db"))
+# /jobs pagination: default and maximum page size.
+JOBS_PAGE_SIZE = int(os.getenv("JOBS_PAGE_SIZE", "50"))
+JOBS_PAGE_MAX = int(os.getenv("JOBS_PAGE_MAX", "200"))
+
+# Fan-out jobs: translate -> narrate -> merge branches run concurrently, at most this many at once.
+FANOUT_MAX_BRANCHES = int(os.getenv("FANOUT_MAX_BRANCHES", "3"))
+
+# Streaming pipeline: overlap transcription, translation and TTS, passing cues along in
+# chunks of ~STREAM_CC_CHUNK_MINUTES of audio (shorter chunks start narration sooner).
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "0") == "1"
+STREAM_CC_CHUNK_MINUTES = float(os.getenv("STREAM_CC_CHUNK_MINUTES", "2"))
+
+# Host-mode worker (api/queue.py): up to HOST_WORKER_CONCURRENCY jobs at once. CPU-bound stages
+# (audio extraction, merge/encode) share a process pool of HOST_CPU_WORKERS; network-bound
+# stages (download, Gemini, TTS) share a thread pool of HOST_IO_WORKERS. On shutdown, running
+# jobs get up to HOST_SHUTDOWN_TIMEOUT_SECS to finish (queued jobs are picked up on restart);
+# jobs still running then start no further stage, and the process exits once their current
+# stages return.
+HOST_WORKER_CONCURRENCY = int(os.getenv("HOST_WORKER_CONCURRENCY", "2"))
+HOST_CPU_WORKERS = int(os.getenv("HOST_CPU_WORKERS", str(os.cpu_count() or 2)))
+HOST_IO_WORKERS = int(os.getenv("HOST_IO_WORKERS", "16"))
+HOST_SHUTDOWN_TIMEOUT_SECS = float(os.getenv("HOST_SHUTDOWN_TIMEOUT_SECS", "600"))
+
+# Job progress over Server-Sent Events (/events, /jobs/{id}/events): narration reports cue
+# progress at most every PROGRESS_MIN_INTERVAL_SECS; idle streams get a keep-alive comment every
+# SSE_HEARTBEAT_SECS; a client more than SSE_CLIENT_BUFFER events behind loses the oldest ones.
+# Streams end after SSE_MAX_STREAM_SECS and clients reconnect: the server's graceful shutdown
+# waits for open responses, so no stream may stay open indefinitely.
+PROGRESS_MIN_INTERVAL_SECS = float(os.getenv("PROGRESS_MIN_INTERVAL_SECS", "1"))
+SSE_HEARTBEAT_SECS = float(os.getenv("SSE_HEARTBEAT_SECS", "15"))
+SSE_CLIENT_BUFFER = int(os.getenv("SSE_CLIENT_BUFFER", "256"))
+SSE_MAX_STREAM_SECS = float(os.getenv("SSE_MAX_STREAM_SECS", "300"))
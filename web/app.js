@@ -35,9 +35,14 @@ const fVoice = document.getElementById('f-voice');
 const formErr = document.getElementById('form-error');
 const toastEl = document.getElementById('toast');
 
-let jobs = [];
+let jobs = [];             // shown list items, newest first (the first page)
 let activeJobId = null;
 let currentFilter = '';
+let jobsSeq = null;        // change seq the list is current as of
+let jobsEtag = null;       // ETag of the last delta response (304 while nothing changed)
+let hasOlderJobs = false;  // the first page was truncated: older jobs live on later pages
+const progressByJob = {};  // job_id -> {branch key or '': latest progress event}
+let events = null;         // EventSource on /events while connected
 
 /* ---------- Jobs fetching & rendering ---------- */
 
@@ -47,9 +52,80 @@ async function fetchJobs(statusFilter = '') {
   const res = await fetch(url);
   const data = await res.json();
   jobs = data.jobs || [];
+  jobsSeq = data.seq ?? null;
+  jobsEtag = null;
+  hasOlderJobs = !!(data.cursors && data.cursors.before);
   renderJobList();
 }
 
+// Asks only for jobs changed since the last seq and patches the list in place.
+async function pollJobs() {
+  if (jobsSeq == null) return fetchJobs(currentFilter);
+  const filter = currentFilter;
+  const res = await fetch(`/jobs?since=${jobsSeq}`, { headers: jobsEtag ? { 'If-None-Match': jobsEtag } : {} });
+  if (res.status === 304 || !res.ok || filter !== currentFilter) return;
+  const data = await res.json();
+  if (data.reset) return fetchJobs(currentFilter);
+  jobsEtag = res.headers.get('ETag');
+  jobsSeq = data.seq;
+  applyJobChanges(data.jobs || []);
+  if (data.more) return pollJobs();
+}
+
+function applyJobChanges(changed) {
+  const wasEmpty = !jobs.length;
+  for (const j of changed) {
+    const i = jobs.findIndex(x => x.job_id === j.job_id);
+    const li = jobListEl.querySelector(`li[data-id="${CSS.escape(j.job_id)}"]`);
+    const visible = !currentFilter || j.status === currentFilter;
+    if (i >= 0 && !visible) {
+      jobs.splice(i, 1);
+      li?.remove();
+    } else if (i >= 0) {
+      if (JSON.stringify(jobs[i]) !== JSON.stringify(j)) li?.replaceWith(renderJobItem(j));
+      jobs[i] = j;
+    } else if (visible) {
+      let at = jobs.findIndex(x => x.submitted_at < j.submitted_at);
+      if (at < 0 && hasOlderJobs) continue;  // belongs to a later page
+      if (at < 0) at = jobs.length;
+      const next = jobs[at] && jobListEl.querySelector(`li[data-id="${CSS.escape(jobs[at].job_id)}"]`);
+      jobs.splice(at, 0, j);
+      if (!wasEmpty) jobListEl.insertBefore(renderJobItem(j), next || null);
+    }
+  }
+  if (wasEmpty || !jobs.length) renderJobList();  // placeholder row in or out
+}
+
+/* ---------- Live updates (Server-Sent Events) ---------- */
+
+function connectEvents() {
+  if (!window.EventSource) return;  // polling only
+  events = new EventSource('/events');
+  // (Re)connected: catch up on anything missed while disconnected.
+  events.addEventListener('open', () => pollJobs());
+  events.addEventListener('job', (e) => {
+    const j = JSON.parse(e.data);
+    if (j.status === 'SUCCESS' || j.status === 'FAILED') delete progressByJob[j.job_id];
+    applyJobChanges([j]);
+  });
+  events.addEventListener('progress', (e) => {
+    const p = JSON.parse(e.data);
+    const byBranch = (progressByJob[p.job_id] ||= {});
+    const prev = byBranch[p.variant || ''];
+    if (prev && prev.fraction > p.fraction) p.fraction = prev.fraction;  // overlapped stages: never step back
+    byBranch[p.variant || ''] = p;
+    const li = jobListEl.querySelector(`li[data-id="${CSS.escape(p.job_id)}"]`);
+    const j = findJob(p.job_id);
+    if (li && j) li.replaceWith(renderJobItem(j));
+  });
+}
+
+// Share of the job done (fan-out: mean over its branches), or null if unknown.
+function jobFraction(jobId) {
+  const parts = Object.values(progressByJob[jobId] || {}).map(p => p.fraction).filter(f => f != null);
+  return parts.length ? parts.reduce((a, b) => a + b, 0) / parts.length : null;
+}
+
 function renderJobList() {
   jobListEl.innerHTML = '';
   if (!jobs.length) {
@@ -58,27 +134,40 @@ function renderJobList() {
     jobListEl.appendChild(li);
     return;
   }
-  for (const j of jobs) {
-    const li = document.createElement('li');
-    li.dataset.id = j.job_id;
-
-    const title = document.createElement('div');
-    title.className = 'job-title';
-    title.textContent = j.title || '(no title yet)';
-
-    const right = document.createElement('div');
-    const badge = document.createElement('span');
-    badge.className = 'badge ' + badgeClass(j.status);
-    badge.textContent = j.status;
-    right.appendChild(badge);
-
-    li.appendChild(title);
-    li.appendChild(right);
-    li.addEventListener('click', () => selectJob(j.job_id));
-    if (j.job_id === activeJobId) li.classList.add('active');
+  for (const j of jobs) jobListEl.appendChild(renderJobItem(j));
+}
 
-    jobListEl.appendChild(li);
+function renderJobItem(j) {
+  const li = document.createElement('li');
+  li.dataset.id = j.job_id;
+
+  const title = document.createElement('div');
+  title.className = 'job-title';
+  title.textContent = j.title || '(no title yet)';
+
+  const right = document.createElement('div');
+  const badge = document.createElement('span');
+  badge.className = 'badge ' + badgeClass(j.status);
+  badge.textContent = j.status;
+  right.appendChild(badge);
+
+  li.appendChild(title);
+  li.appendChild(right);
+
+  const fraction = j.status === 'RUNNING' ? jobFraction(j.job_id) : null;
+  if (fraction != null) {
+    const latest = Object.values(progressByJob[j.job_id]).pop();
+    const bar = document.createElement('div');
+    bar.className = 'job-progress';
+    bar.title = latest.kind === 'cues' ? `${latest.stage}: ${latest.done}/${latest.total} cues` : latest.stage;
+    const fill = document.createElement('span');
+    fill.style.width = `${Math.round(fraction * 100)}%`;
+    bar.appendChild(fill);
+    li.appendChild(bar);
   }
+  li.addEventListener('click', () => selectJob(j.job_id));
+  if (j.job_id === activeJobId) li.classList.add('active');
+  return li;
 }
 
 function badgeClass(s) {
@@ -278,7 +367,7 @@ form.addEventListener('submit', async (e) => {
     const data = await res.json();
     closeModal();
     toast(`Job queued: ${data.job_id.slice(0,8)}…`);
-    await fetchJobs(currentFilter);
+    await pollJobs();
     await selectJob(data.job_id);
   } catch (err) {
     formErr.textContent = String(err.message || err);
@@ -298,13 +387,14 @@ function toast(msg) {
 function show(el) { el.classList.remove('hidden'); el.setAttribute('aria-hidden','false'); }
 function hide(el) { el.classList.add('hidden'); el.setAttribute('aria-hidden','true'); }
 
-/* ---------- Light polling to keep titles fresh ---------- */
+/* ---------- Light polling (changes only), while the event stream is down ---------- */
 setInterval(() => {
-  fetchJobs(currentFilter);
+  if (!events || events.readyState !== EventSource.OPEN) pollJobs();
 }, 8000);
 
 /* ---------- Initial load ---------- */
 fetchJobs().then(() => {
   const s = jobs.filter(j => j.status === 'SUCCESS');
-  if (s.length) selectJob(s[s.length - 1].job_id);
+  if (s.length) selectJob(s[0].job_id);  // newest first
+  connectEvents();
 });
@@ -1,5 +1,9 @@
 import os
+import time
 from celery import Celery
+from celery.signals import before_task_publish, task_prerun
+
+from flow.utils.metrics import QUEUE_WAIT
 
 # Broker / backend default to the compose service "redis"
 BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
@@ -13,9 +17,22 @@ celery = Celery(
     include=["worker.tasks"],  # <-- ensure registration
 )
 
+# One queue per kind of work, each consumed by its own, separately scaled workers
+# (see docker-compose.yml): adding encode capacity never adds TTS concurrency, and vice versa.
+PIPELINE_QUEUES = ("io", "asr", "tts", "encode")
+
 # A few sensible defaults
 celery.conf.update(
-    task_routes={"worker.tasks.run_pipeline_task": {"queue": "pipeline"}},
+    task_routes={
+        "worker.tasks.download": {"queue": "io"},
+        "worker.tasks.separate": {"queue": "encode"},
+        "worker.tasks.generate_cc": {"queue": "asr"},
+        "worker.tasks.translate": {"queue": "io"},
+        "worker.tasks.narrate": {"queue": "tts"},
+        "worker.tasks.merge": {"queue": "encode"},
+        "worker.tasks.finish_pipeline": {"queue": "io"},
+        "worker.tasks.finish_fanout": {"queue": "encode"},  # muxes the multitrack video
+    },
     task_serializer="json",
     result_serializer="json",
     accept_content=["json"],
@@ -23,6 +40,23 @@ celery.conf.update(
     worker_send_task_events=True,
     task_send_sent_event=True,
     timezone="UTC",
+    # Stage tasks run for minutes: take one message at a time so idle workers get the next one.
+    worker_prefetch_multiplier=1,
     # Optional: silence future deprecation warning seen in your logs
     broker_connection_retry_on_startup=True,
 )
+
+
+# Queue wait: stamp the publish time into the message headers, observe it when a worker starts the task.
+@before_task_publish.connect
+def _stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@task_prerun.connect
+def _observe_queue_wait(task=None, **kwargs):
+    enqueued_at = getattr(task.request, "enqueued_at", None) if task is not None else None
+    if enqueued_at:
+        queue = (task.request.delivery_info or {}).get("routing_key") or "celery"
+        QUEUE_WAIT.labels(queue=queue).observe(max(0.0, time.time() - float(enqueued_at)))
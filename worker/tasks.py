@@ -1,46 +1,283 @@
-import os
-from typing import Dict
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from celery import Task, chain, chord, group, states
 
 from worker.celery_app import celery
-from flow.tts.gemini_voices import select_voice_by_name as select_gemini_voice
-from flow.tts.elevenlabs_voices import select_voice_by_name as select_elevenlabs_voice
-from flow.models.voices import Voice
-from flow.utils.languages import select_language_by_name
-from pipeline import run_pipeline
+from flow.models.video_paths import VideoProcessingPaths
+from flow.utils.metrics import JOBS_FINISHED
+from pipeline import FanoutResult, NarrationBranch, finish_fanout, resolve_language, resolve_voice, run_stage
+from settings import STORAGE_DIR
 
-# The task returns a dict with request_id and all output paths (same shape used in host mode)
-@celery.task(name="worker.tasks.run_pipeline_task", bind=True)
-def run_pipeline_task(self, *, yt_video_url: str, target_language: str, tts_provider: str, voice_name: str | None) -> Dict[str, str]:
-    # Resolve language (fuzzy by name)
+# The pipeline runs as a chain of one task per stage, each routed (celery_app.task_routes) to
+# a queue for its kind of work, so every queue's workers can be scaled on their own:
+#   io: download, translate    asr: generate_cc    tts: narrate    encode: separate, merge, mux
+# Tasks pass a small JSON job context along the chain - job id, URL, language, voice - never
+# media: artifacts live in the shared job directory, and each stage is checkpointed there
+# (a redelivered or retried stage whose outputs are intact is a no-op).
+#
+# The job id is the id of the chain's last task, so AsyncResult(job_id) ends as SUCCESS with
+# the flattened paths (plus "video": {title, duration, thumbnail}) or FAILURE with the error.
+# Stage task ids are "{job_id}.{stage}" (plus ".{branch}" for fan-out branch stages).
+# The API follows jobs through task events over the broker's event exchange (api/reconciler.py):
+# Celery's own task-sent/started/succeeded/failed, plus two custom ones with a job_id field:
+#   task-progress  stage and narration cue progress (ProgressEvent.to_dict()), relayed to SSE clients
+#   task-branch    a fan-out branch's state: variant, status, stage, error
+
+# Per-stage task retries on top of the in-stage provider retries: (max_retries, base countdown
+# in seconds, doubled per attempt). Local ffmpeg stages fail deterministically - no retries.
+STAGE_RETRIES: Dict[str, Tuple[int, int]] = {
+    "download": (3, 30),
+    "separate": (0, 0),
+    "generate_cc": (2, 60),
+    "translate": (2, 60),
+    "narrate": (2, 120),
+    "merge": (0, 0),
+}
+
+_PATH_KEYS = (
+    "downloaded_video_path", "video_no_audio_path", "audio_no_video_path", "generated_cc_path",
+    "translated_cc_path", "generated_narration_path", "final_video_path", "video_info_path",
+)
+
+
+def _job_id_of(args: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, dict) and "job_id" in value:
+            return value["job_id"]
+    return None
+
+
+class JobTask(Task):
+    """
+    Base for pipeline tasks: a task that fails for good fails its whole job, by storing the
+    FAILURE under the job id (which the chain's last task would otherwise complete).
+    """
+    acks_late = True  # a worker lost mid-stage gets the stage redelivered (checkpoints make that safe)
+    reject_on_worker_lost = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        job_id = _job_id_of(args, kwargs)
+        if job_id and job_id != task_id:
+            self.backend.store_result(job_id, exc, states.FAILURE, traceback=str(einfo))
+        JOBS_FINISHED.labels(status="FAILED").inc()
+
+
+def _event_sender(task: Task, job_id: str) -> Callable[..., None]:
+    """
+    send(type, **fields) for the custom task events of the task's job (see the module comment).
+    Narration reports progress from its TTS threads, where task.request is not set: the task
+    id and hostname are captured here.
+    """
+    task_id, hostname = task.request.id, task.request.hostname
+
+    def send(event_type: str, **fields: Any) -> None:
+        try:
+            with celery.events.default_dispatcher(hostname=hostname) as dispatcher:
+                dispatcher.send(event_type, uuid=task_id, job_id=job_id, **fields)
+        except Exception as e:
+            print(f"  ! Could not send {event_type} event for job {job_id}: {e}")
+
+    return send
+
+
+def _run_stage_task(task: Task, stage: str, ctx: Dict[str, Any], branch: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Runs one stage for the job in ctx (branch, if given, starts a fan-out branch: it adds the
+    branch's key, language and voice to the context passed down the branch chain).
+    Fan-out branch failures are returned in ctx["error"] instead of raised, so the other
+    branches and the final mux still run.
+    """
+    ctx = {**ctx, **(branch or {})}
+    job_id, variant = ctx["job_id"], ctx.get("variant")
+    if ctx.get("error"):
+        return ctx  # an earlier stage of this branch failed
+    send = _event_sender(task, job_id)
+    if variant:
+        send("task-branch", variant=variant, status="RUNNING", stage=stage)
     try:
-        target_language = select_language_by_name(target_language)
-    except Exception:
-        # leave as-is; pipeline may raise if invalid
-        pass
-
-    # Resolve voice by provider
-    if tts_provider == "gemini":
-        voice = select_gemini_voice(voice_name or "Orus")
-    else:
-        voice = select_elevenlabs_voice(voice_name or "Daniel")
-
-    # Run the pipeline
-    paths = run_pipeline(
-        video_url=yt_video_url,
-        target_language=target_language,
-        voice=voice,
-        original_audio_loudness=0.13,
+        run_stage(
+            stage,
+            video_url=ctx["yt_video_url"],
+            request_id=job_id,
+            target_language=ctx.get("target_language"),
+            voice=resolve_voice(ctx["tts_provider"], ctx.get("voice_name")) if ctx.get("target_language") else None,
+            original_audio_loudness=ctx.get("original_audio_loudness", 0.13),
+            variant=variant,
+            on_progress=lambda event: send("task-progress", **event.to_dict()),
+        )
+    except Exception as e:
+        max_retries, countdown = STAGE_RETRIES.get(stage, (0, 0))
+        if task.request.retries < max_retries:
+            print(f"  ! Stage '{stage}' of job {job_id} failed ({e}); retry {task.request.retries + 1}/{max_retries}")
+            raise task.retry(exc=e, countdown=countdown * 2 ** task.request.retries, max_retries=max_retries)
+        if not variant:
+            raise
+        error = f"{stage}: {e}"
+        send("task-branch", variant=variant, status="FAILED", stage=stage, error=error)
+        return {**ctx, "error": error}
+    if variant and stage == "merge":
+        send("task-branch", variant=variant, status="SUCCESS", stage=None)
+    if stage == "download":
+        ctx = {**ctx, "video": read_video_summary(job_id)}
+    return ctx
+
+
+def read_video_summary(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Title, duration and thumbnail from the job's info.json (None until it is downloaded);
+    passed along the chain into the job's result, and read by the API once download succeeds.
+    """
+    info_path = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=job_id, create=False).video_info_path
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {"title": info.get("title"), "duration": info.get("duration"), "thumbnail": info.get("thumbnail")}
+
+
+@celery.task(name="worker.tasks.download", bind=True, base=JobTask)
+def download_task(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return _run_stage_task(self, "download", ctx)
+
+
+@celery.task(name="worker.tasks.separate", bind=True, base=JobTask)
+def separate_task(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return _run_stage_task(self, "separate", ctx)
+
+
+@celery.task(name="worker.tasks.generate_cc", bind=True, base=JobTask)
+def generate_cc_task(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return _run_stage_task(self, "generate_cc", ctx)
+
+
+@celery.task(name="worker.tasks.translate", bind=True, base=JobTask)
+def translate_task(self, ctx: Dict[str, Any], branch: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return _run_stage_task(self, "translate", ctx, branch)
+
+
+@celery.task(name="worker.tasks.narrate", bind=True, base=JobTask)
+def narrate_task(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return _run_stage_task(self, "narrate", ctx)
+
+
+@celery.task(name="worker.tasks.merge", bind=True, base=JobTask)
+def merge_task(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return _run_stage_task(self, "merge", ctx)
+
+
+# The task returns a dict with request_id and all output paths (same shape used in host mode)
+@celery.task(name="worker.tasks.finish_pipeline", bind=True, base=JobTask)
+def finish_pipeline_task(self, ctx: Dict[str, Any]) -> Dict[str, str]:
+    paths = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=ctx["job_id"], create=False)
+    JOBS_FINISHED.labels(status="SUCCESS").inc()
+    return {**{key: getattr(paths, key) for key in _PATH_KEYS}, "request_id": paths.request_id or "", "video": ctx.get("video")}
+
+
+# Fan-out result: the flattened job paths plus the final "branches" map.
+@celery.task(name="worker.tasks.finish_fanout", bind=True, base=JobTask)
+def finish_fanout_task(self, branch_ctxs: List[Dict[str, Any]], ctx: Dict[str, Any]) -> Dict[str, Any]:
+    paths = VideoProcessingPaths(base_dir=STORAGE_DIR, request_id=ctx["job_id"], create=False)
+    result = FanoutResult(paths=paths)
+    branches: List[NarrationBranch] = []
+    states_by_key: Dict[str, Dict[str, Any]] = {}
+    for b in branch_ctxs:
+        branch = NarrationBranch(
+            target_language=b["target_language"], voice=resolve_voice(b["tts_provider"], b.get("voice_name")), key=b["variant"],
+        )
+        branches.append(branch)
+        state: Dict[str, Any] = {"target_language": branch.target_language, "voice_name": branch.voice.name}
+        if b.get("error"):
+            result.errors[branch.key] = b["error"]
+            state.update(status="FAILED", error=b["error"])
+        else:
+            result.branch_paths[branch.key] = paths.for_branch(branch.key)
+            state.update(status="SUCCESS", paths=result.branch_paths[branch.key].to_dict())
+        states_by_key[branch.key] = state
+    finish_fanout(result, branches, multitrack=ctx.get("multitrack", True))
+    JOBS_FINISHED.labels(status="SUCCESS").inc()
+    return {**result.to_dict(), "branches": states_by_key, "video": ctx.get("video") or read_video_summary(ctx["job_id"])}
+
+
+def _stage(task: Task, job_id: str, stage: str, *args: Any, variant: Optional[str] = None, **kwargs: Any):
+    task_id = f"{job_id}.{stage}.{variant}" if variant else f"{job_id}.{stage}"
+    return task.s(*args, **kwargs).set(task_id=task_id)
+
+
+def _shared_chain(ctx: Dict[str, Any]):
+    job_id = ctx["job_id"]
+    return chain(
+        _stage(download_task, job_id, "download", ctx),
+        _stage(separate_task, job_id, "separate"),
+        _stage(generate_cc_task, job_id, "generate_cc"),
     )
 
-    # Flatten paths for API convenience
-    return {
-        "downloaded_video_path": paths.downloaded_video_path,
-        "video_no_audio_path": paths.video_no_audio_path,
-        "audio_no_video_path": paths.audio_no_video_path,
-        "generated_cc_path": paths.generated_cc_path,
-        "translated_cc_path": paths.translated_cc_path,
-        "generated_narration_path": paths.generated_narration_path,
-        "final_video_path": paths.final_video_path,
-        "video_info_path": paths.video_info_path,
-        "request_id": paths.request_id or "",
+
+def enqueue_pipeline(job_id: str, yt_video_url: str, target_language: str, tts_provider: str, voice_name: Optional[str]) -> None:
+    """
+    Enqueues a single-language job as a chain of stage tasks; AsyncResult(job_id) tracks it.
+    Re-enqueueing a failed job with the same id resumes it from its last completed stage.
+    """
+    resolve_voice(tts_provider, voice_name)  # fail fast on an unknown voice, before anything is queued
+    ctx = {
+        "job_id": job_id,
+        "yt_video_url": yt_video_url,
+        "target_language": resolve_language(target_language),
+        "tts_provider": tts_provider,
+        "voice_name": voice_name,
+        "original_audio_loudness": 0.13,
     }
+    chain(
+        _shared_chain(ctx),
+        _stage(translate_task, job_id, "translate"),
+        _stage(narrate_task, job_id, "narrate"),
+        _stage(merge_task, job_id, "merge"),
+        finish_pipeline_task.s().set(task_id=job_id),
+    ).apply_async()
+
+
+def resolve_branches(branches: List[Dict[str, Any]]) -> List[NarrationBranch]:
+    """
+    NarrationBranch per {"target_language", "tts_provider", "voice_name"}.
+    Raises:
+        ValueError: If a voice cannot be resolved.
+    """
+    return [
+        NarrationBranch(
+            target_language=resolve_language(b["target_language"]),
+            voice=resolve_voice(b.get("tts_provider", "elevenlabs"), b.get("voice_name")),
+        )
+        for b in branches
+    ]
+
+
+def enqueue_fanout(job_id: str, yt_video_url: str, branches: List[Dict[str, Any]], multitrack: bool = True) -> List[NarrationBranch]:
+    """
+    Enqueues a fan-out job: the shared stages as a chain, then a chord of one
+    translate -> narrate -> merge chain per branch, whose callback (id job_id) muxes the results.
+    Args:
+        branches: [{"target_language", "tts_provider", "voice_name"}, ...].
+    Returns:
+        List[NarrationBranch]: The resolved branches (keys match the branch task ids and events).
+    """
+    resolved = list(zip(branches, resolve_branches(branches)))
+    ctx = {"job_id": job_id, "yt_video_url": yt_video_url, "multitrack": multitrack, "original_audio_loudness": 0.13}
+    branch_chains = []
+    for params, nb in resolved:
+        branch = {
+            "variant": nb.key,
+            "target_language": nb.target_language,
+            "tts_provider": params.get("tts_provider", "elevenlabs"),
+            "voice_name": params.get("voice_name"),
+        }
+        branch_chains.append(chain(
+            _stage(translate_task, job_id, "translate", branch=branch, variant=nb.key),
+            _stage(narrate_task, job_id, "narrate", variant=nb.key),
+            _stage(merge_task, job_id, "merge", variant=nb.key),
+        ))
+    chain(
+        _shared_chain(ctx),
+        chord(group(branch_chains), finish_fanout_task.s(ctx).set(task_id=job_id)),
+    ).apply_async()
+    return [nb for _, nb in resolved]